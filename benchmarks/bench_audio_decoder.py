@@ -0,0 +1,110 @@
+"""Benchmark the mp3 decoders of audio_decoder at the sample rates of the piano solo detector and of transcription,
+and the decoded audio cache.
+
+A 10-minute stereo 44.1 kHz mp3 is synthesized with soundfile unless --audio_path is given. Decoders whose
+dependencies or executables are missing are skipped.
+
+Usage:
+    python benchmarks/bench_audio_decoder.py --duration=600 --repeats=3
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from giantmidi_piano.audio_decoder import DECODERS, AudioCache, decode_audio  # noqa: E402
+
+SAMPLE_RATES = [32000, 16000]
+
+
+def synthesize_mp3(mp3_path, duration, sample_rate=44100):
+    import soundfile
+
+    rng = np.random.RandomState(1234)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    freqs = 440 * 2 ** (rng.randint(-24, 24, size=(2, int(duration * 4) + 1)) / 12)
+    wav = 0.3 * np.sin(2 * np.pi * freqs[:, (t * 4).astype(int)] * t).T + 0.01 * rng.randn(len(t), 2)
+
+    soundfile.write(mp3_path, wav.astype(np.float32), sample_rate, format='MP3')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--audio_path', type=str, default=None)
+    parser.add_argument('--duration', type=float, default=600.0)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--ffmpeg_command', type=str, default='ffmpeg')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        audio_path = args.audio_path
+
+        if not audio_path:
+            audio_path = os.path.join(tmp_dir, 'audio.mp3')
+            synthesize_mp3(audio_path, args.duration)
+
+        for sample_rate in SAMPLE_RATES:
+            reference = None
+
+            for decoder in DECODERS:
+                try:
+                    # The first call also imports the modules of the decoder
+                    audio = decode_audio(audio_path, sample_rate, decoder, args.ffmpeg_command)
+                except (ImportError, OSError) as e:
+                    print(f'{decoder}, {sample_rate} Hz: skipped, {e}', file=sys.stderr)
+                    continue
+
+                elapsed = []
+
+                for _ in range(args.repeats):
+                    bgn_time = time.time()
+                    decode_audio(audio_path, sample_rate, decoder, args.ffmpeg_command)
+                    elapsed.append(time.time() - bgn_time)
+
+                tracemalloc.start()
+                decode_audio(audio_path, sample_rate, decoder, args.ffmpeg_command)
+                (_, peak) = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                line = (
+                    f'{decoder}, {sample_rate} Hz: {min(elapsed):.3f} s, '
+                    f'{len(audio) / sample_rate / min(elapsed):.0f}x real time, '
+                    f'peak memory: {peak / 2**20:.1f} MB, output: {audio.nbytes / 2**20:.1f} MB'
+                )
+
+                if reference is None:
+                    reference = (decoder, audio)
+                else:
+                    n = min(len(audio), len(reference[1]))
+                    line += (
+                        f', {len(audio) - len(reference[1]):+d} samples, '
+                        f'max abs difference to {reference[0]}: {np.max(np.abs(audio[:n] - reference[1][:n])):.2e}'
+                    )
+
+                print(line, file=sys.stderr)
+
+        # Cache, the detection stage decodes at 32 kHz, and the transcription stage loads 16 kHz resampled from it
+        cache = AudioCache(os.path.join(tmp_dir, 'audio_cache'))
+        references = {sample_rate: decode_audio(audio_path, sample_rate, 'soundfile') for sample_rate in SAMPLE_RATES}
+
+        for name, sample_rate in [('miss', 32000), ('hit', 32000), ('16 kHz from 32 kHz', 16000), ('hit', 16000)]:
+            bgn_time = time.time()
+            audio = decode_audio(audio_path, sample_rate, 'soundfile', cache=cache)
+            elapsed = time.time() - bgn_time
+
+            difference = np.max(np.abs(audio - references[sample_rate]))
+            print(
+                f'cache {name}, {sample_rate} Hz: {elapsed:.3f} s, max abs difference to soundfile: {difference:.2e}',
+                file=sys.stderr,
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark the html crawler against a local http fixture server.
+
+Usage:
+    python benchmarks/bench_crawler.py --pages=500 --latency=0.02
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from giantmidi_piano.crawler import AsyncCrawler  # noqa: E402
+from giantmidi_piano.rate_limit import RateLimitController  # noqa: E402
+
+
+def make_handler(latency):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):  # noqa: N802
+            time.sleep(latency)
+            body = (f'<html><body>{self.path}</body></html>' * 200).encode()
+            etag = f'"{hashlib.md5(body).hexdigest()}"'  # noqa: S324
+
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureHandler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02, help='Server latency of each request in seconds.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    for concurrency in args.concurrency:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            jobs = [
+                (f'{base_url}/wiki/Category:Composer_{n}', os.path.join(tmp_dir, f'{n}.html'))
+                for n in range(args.pages)
+            ]
+            validators_path = os.path.join(tmp_dir, '_validators.jsonl')
+
+            for run in ['cold', 'refresh']:
+                crawler = AsyncCrawler(validators_path, concurrency=concurrency, rate_limiter=RateLimitController())
+                bgn_time = time.time()
+                stats = crawler.crawl(jobs)
+                elapsed = time.time() - bgn_time
+                print(
+                    f'concurrency: {concurrency}, {run}: {args.pages / elapsed:.1f} pages/s, '
+                    f"downloaded: {stats['downloaded']}, not modified: {stats['not_modified']}",
+                    file=sys.stderr,
+                )
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
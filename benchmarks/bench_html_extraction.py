@@ -0,0 +1,109 @@
+"""Benchmark the extraction of music names from IMSLP composer pages.
+
+The repository does not ship IMSLP pages, so pages are synthesized unless --htmls_dir points to the htmls directory
+of a workspace. The BeautifulSoup path used before is included when bs4 is installed.
+
+Usage:
+    python benchmarks/bench_html_extraction.py --htmls_dir=./workspace/htmls --workers=8
+"""
+
+import argparse
+import os
+import pathlib
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from giantmidi_piano.imslp import parse_category_page  # noqa: E402
+
+
+def parse_beautifulsoup(text):
+    """Music names extraction of create_meta_csv before the fast path, without fetching following pages."""
+    from bs4 import BeautifulSoup
+
+    obj = re.search(r"</div><script>if\(typeof catpagejs=='undefined'\)", text)
+    text = text[: obj.start()] if obj else text
+
+    soup = BeautifulSoup(text, 'html.parser')
+    music_names = []
+
+    for _link in soup.find_all('a'):
+        link = str(_link)
+        if 'categorypagelink' in link:
+            bgn = re.search('title=', link).end()
+            link = link[bgn + 1 :]
+            fin = re.search('>', link).start()
+            music_names.append(link[: fin - 1])
+
+    return music_names
+
+
+def synthesize_page(n, pieces_num=200):
+    header = '<html><head><title>Category</title></head><body>' + '<div class="nav"><a href="/x">x</a></div>' * 300
+    links = ''.join(
+        f'<li><a class="categorypagelink" href="/wiki/Piece_{n}_{k}" title="Piece No.{k} in C major (Composer, {n})">'
+        f'Piece No.{k} in C major (Composer, {n})</a></li>'
+        for k in range(pieces_num)
+    )
+    paging = '<a class="categorypaginglink" href="/index.php?title=Category:X&amp;pagefrom=Y#mw-pages">next 200</a>'
+    footer = "</div><script>if(typeof catpagejs=='undefined')</script>" + '<p>footer</p>' * 300
+    return f'{header}{paging}<ul>{links}</ul>{paging}{footer}</body></html>'
+
+
+def load_texts(htmls_dir, pages_num):
+    if htmls_dir:
+        html_names = sorted(os.listdir(htmls_dir))[:pages_num]
+        return [pathlib.Path(os.path.join(htmls_dir, html_name)).read_text() for html_name in html_names]
+
+    return [synthesize_page(n) for n in range(pages_num)]
+
+
+def _parse_fast(text):
+    return parse_category_page(text, 'fast')[0]
+
+
+def _parse_html_parser(text):
+    return parse_category_page(text, 'html.parser')[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--htmls_dir', type=str, default=None)
+    parser.add_argument('--pages_num', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    texts = load_texts(args.htmls_dir, args.pages_num)
+
+    backends = {'fast': _parse_fast, 'html.parser': _parse_html_parser}
+    try:
+        import bs4  # noqa: F401
+
+        backends['beautifulsoup'] = parse_beautifulsoup
+    except ImportError:
+        print('bs4 is not installed, skip the BeautifulSoup path.', file=sys.stderr)
+
+    results = {}
+
+    for name, parse in backends.items():
+        bgn_time = time.time()
+        results[name] = [parse(text) for text in texts]
+        elapsed = time.time() - bgn_time
+        print(f'{name}: {len(texts) / elapsed:.1f} pages/s', file=sys.stderr)
+
+    names_num = sum(len(music_names) for music_names in results['fast'])
+    matched = results['fast'] == results['html.parser']
+    print(f'Music names: {names_num}, fast matches html.parser: {matched}', file=sys.stderr)
+
+    bgn_time = time.time()
+    with ProcessPoolExecutor(args.workers) as executor:
+        list(executor.map(_parse_fast, texts, chunksize=16))
+    elapsed = time.time() - bgn_time
+    print(f'fast with {args.workers} processes: {len(texts) / elapsed:.1f} pages/s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Benchmark load time, save time and memory of meta csvs: the dict of str lists used before, the shims of
+read_csv_to_meta_dict / write_meta_dict_to_csv, and the columnar MetaTable, without and with the binary sidecar.
+
+A csv with the columns of full_music_pieces_youtube_similarity_pianosoloprob_split.csv is synthesized unless
+--csv_path is given.
+
+Usage:
+    python benchmarks/bench_meta_table.py --rows=144000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from giantmidi_piano.dataset import read_csv_to_meta_dict, read_meta_table, write_meta_dict_to_csv  # noqa: E402
+from giantmidi_piano.meta_table import MetaTable, get_sidecar_path, read_csv_columns  # noqa: E402
+
+KEYS = [
+    'surname',
+    'firstname',
+    'music',
+    'nationality',
+    'birth',
+    'death',
+    'youtube_title',
+    'youtube_id',
+    'similarity',
+    'piano_solo_prob',
+    'audio_name',
+    'audio_duration',
+    'giant_midi_piano',
+    'split',
+    'surname_in_youtube_title',
+]
+
+
+def read_csv_to_meta_dict_before(csv_path):
+    """read_csv_to_meta_dict before the columnar meta table."""
+    lines = []
+    with open(csv_path) as fr:
+        for line in fr:
+            _line = line.split('\n')[0].split('\t')
+            lines.append(_line)
+
+    meta_dict = {key: [] for key in lines[0]}
+
+    lines = lines[1:]
+    for line in lines:
+        for k, key in enumerate(meta_dict.keys()):
+            meta_dict[key].append(line[k])
+
+    return meta_dict
+
+
+def write_meta_dict_to_csv_before(meta_dict, out_csv_path):
+    """write_meta_dict_to_csv before the columnar meta table."""
+    with open(out_csv_path, 'w') as fw:
+        line = '\t'.join(list(meta_dict.keys()))
+        fw.write(f'{line}\n')
+
+        for n in range(len(meta_dict['firstname'])):
+            line = '\t'.join([str(meta_dict[key][n]) for key in meta_dict.keys()])
+            fw.write(f'{line}\n')
+
+
+def synthesize_csv(csv_path, rows):
+    rng = random.Random(1234)
+
+    with open(csv_path, 'w') as fw:
+        fw.write('\t'.join(KEYS) + '\n')
+
+        for n in range(rows):
+            downloaded = rng.random() < 0.4
+            prob = rng.random()
+            row = [
+                f'Surname{n // 30}',
+                f'Firstname{n // 30}',
+                f'Piece No.{n} in C major, Op.{n % 97}',
+                'German',
+                '1810',
+                '1849',
+                f'Surname{n // 30}: Piece No.{n} in C major - performed by someone',
+                f'{n:011d}',
+                repr(rng.random()),
+                repr(prob) if downloaded else '',
+                f'Surname{n // 30}, Firstname{n // 30}, Piece No.{n}, {n:011d}' if downloaded else '',
+                repr(rng.uniform(30, 1200)) if downloaded else '',
+                ('1' if prob >= 0.5 else '0') if downloaded else '',  # noqa: PLR2004
+                rng.choice(['train', 'validation', 'test']) if downloaded and prob >= 0.5 else '',  # noqa: PLR2004
+                rng.choice(['0', '1']) if downloaded else '',
+            ]
+            fw.write('\t'.join(row) + '\n')
+
+
+def measure(func, *args):
+    """Time a call, then call again under tracemalloc to measure memory, which slows python code down."""
+    bgn_time = time.time()
+    func(*args)
+    elapsed = time.time() - bgn_time
+
+    tracemalloc.start()
+    result = func(*args)
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--csv_path', type=str, default=None)
+    parser.add_argument('--rows', type=int, default=144000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = args.csv_path
+
+        if not csv_path:
+            csv_path = os.path.join(tmp_dir, 'meta.csv')
+            synthesize_csv(csv_path, args.rows)
+
+        readers = {
+            'before': read_csv_to_meta_dict_before,
+            'read_csv_to_meta_dict': lambda path: read_csv_columns(path, cache=False),
+            'read_meta_table': lambda path: MetaTable.read_csv(path, cache=False),
+        }
+        results = {}
+
+        for name, read in readers.items():
+            (results[name], elapsed, current, peak) = measure(read, csv_path)
+            print(
+                f'load {name}: {elapsed:.3f} s, memory: {current / 2**20:.1f} MB, peak: {peak / 2**20:.1f} MB',
+                file=sys.stderr,
+            )
+
+        print(f"Shim matches before: {results['read_csv_to_meta_dict'] == results['before']}", file=sys.stderr)
+
+        writers = {
+            'before': (write_meta_dict_to_csv_before, results['before']),
+            'write_meta_dict_to_csv': (write_meta_dict_to_csv, results['before']),
+            'MetaTable.write_csv': (lambda table, path: table.write_csv(path), results['read_meta_table']),
+        }
+
+        for name, (write, data) in writers.items():
+            (_, elapsed, _, _) = measure(write, data, os.path.join(tmp_dir, f'{name}.csv'))
+            print(f'save {name}: {elapsed:.3f} s', file=sys.stderr)
+
+        # Selection of GiantMIDI-Piano pieces whose surnames are in YouTube titles
+        meta_dict = results['before']
+        bgn_time = time.time()
+        indexes = [
+            n
+            for n in range(len(meta_dict['audio_name']))
+            if meta_dict['audio_name'][n] != ''
+            and int(meta_dict['giant_midi_piano'][n]) == 1
+            and int(meta_dict['surname_in_youtube_title'][n]) == 1
+        ]
+        print(f'filter before: {time.time() - bgn_time:.4f} s', file=sys.stderr)
+
+        bgn_time = time.time()
+        table_indexes = np.flatnonzero(results['read_meta_table'].piano_solo_mask(surname_in_youtube_title=True))
+        print(f'filter read_meta_table: {time.time() - bgn_time:.4f} s', file=sys.stderr)
+        print(f'Filters match: {indexes == table_indexes.tolist()}', file=sys.stderr)
+
+        # Sidecar, the first read writes it and the following reads load the accessed columns from it
+        sidecar_path = get_sidecar_path(csv_path)
+        if os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
+
+        bgn_time = time.time()
+        read_csv_to_meta_dict(csv_path)
+        print(f'load read_csv_to_meta_dict, write sidecar: {time.time() - bgn_time:.3f} s', file=sys.stderr)
+
+        bgn_time = time.time()
+        meta_dict = read_csv_to_meta_dict(csv_path)
+        meta_dict['audio_name'][0]
+        print(f'load read_csv_to_meta_dict from sidecar, 1 column: {time.time() - bgn_time:.3f} s', file=sys.stderr)
+
+        bgn_time = time.time()
+        matched = dict(read_csv_to_meta_dict(csv_path)) == results['before']
+        print(f'load read_csv_to_meta_dict from sidecar, all columns: {time.time() - bgn_time:.3f} s', file=sys.stderr)
+        print(f'Sidecar matches before: {matched}', file=sys.stderr)
+
+        bgn_time = time.time()
+        read_meta_table(csv_path).piano_solo_mask(surname_in_youtube_title=True)
+        print(f'load read_meta_table from sidecar and filter: {time.time() - bgn_time:.3f} s', file=sys.stderr)
+        print(f'Sidecar size: {os.path.getsize(sidecar_path) / 2**20:.1f} MB', file=sys.stderr)
+        os.remove(sidecar_path)
+
+
+if __name__ == '__main__':
+    main()
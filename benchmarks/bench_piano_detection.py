@@ -0,0 +1,143 @@
+"""Benchmark the front ends of PianoSoloDetector.predict on a 10-minute recording.
+
+A recording of piano-like tones, noise and silence is synthesized unless --audio_path is given. The per-segment
+librosa front end used before is compared with the batched NumPy front end and the torch.stft front end, both in
+spectrograms and, with the checkpoint of resources/piano_solo_model_32k.pth, in probabilities.
+
+Usage:
+    python benchmarks/bench_piano_detection.py --duration=600
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from giantmidi_piano import piano_detection_model  # noqa: E402
+from giantmidi_piano.piano_detection_model import (  # noqa: E402
+    DIM_T,
+    SR,
+    iterate_segment_spectrograms,
+    iterate_segment_spectrograms_torch,
+    wav2spec,
+)
+
+CHECKPOINT_PATH = os.path.join(os.path.dirname(__file__), '..', 'resources', 'piano_solo_model_32k.pth')
+
+
+def iterate_segment_spectrograms_before(wav, scale=1.0, batch_size=32):
+    """Per-segment front end of PianoSoloDetector.predict before the batched front end."""
+    wav = wav * scale
+    segs_num = int(len(wav) / SR)
+    mag_segs = []
+    segs_rms = []
+
+    for i in np.arange(segs_num):
+        wav_seg = wav[i * SR : (i + 1) * SR + 1000]
+        segs_rms.append(np.sqrt(np.mean(wav_seg**2)))
+
+        mag, _ = wav2spec(wav_seg)
+        mag_segs.append(mag[..., :DIM_T])
+
+        if len(mag_segs) == batch_size or i == segs_num - 1:
+            yield np.array(segs_rms), np.transpose(np.array(mag_segs), (0, 1, 3, 2))
+            mag_segs = []
+            segs_rms = []
+
+
+def iterate_segment_spectrograms_torch_host(wav, scale=1.0, batch_size=32, device='cpu'):
+    """torch.stft front end, copied to host to be compared with the other front ends."""
+    for segs_rms, x in iterate_segment_spectrograms_torch(wav, scale, batch_size, device):
+        if x.is_cuda:
+            torch.cuda.synchronize()
+        yield segs_rms.cpu().numpy(), x.cpu().numpy()
+
+
+def synthesize_audio(duration, seed=1234):
+    rng = np.random.RandomState(seed)
+    t = np.arange(int(duration * SR)) / SR
+    wav = 0.01 * rng.randn(len(t))
+
+    # A note of random pitch every 0.25 s, and a silent second every 30 s
+    for bgn in np.arange(0, duration, 0.25):
+        idx = slice(int(bgn * SR), int((bgn + 0.25) * SR))
+        freq = 440 * 2 ** (rng.randint(-24, 24) / 12)
+        wav[idx] += 0.3 * np.sin(2 * np.pi * freq * t[idx]) * np.exp(-8 * (t[idx] - bgn))
+
+    for bgn in np.arange(15, duration, 30):
+        wav[int(bgn * SR) : int((bgn + 1) * SR)] = 0
+
+    return wav.astype(np.float32)
+
+
+def run_front_end(iterate, wav, scale, **kwargs):
+    bgn_time = time.time()
+    results = list(iterate(wav, scale=scale, **kwargs))
+    elapsed = time.time() - bgn_time
+
+    segs_rms = np.concatenate([segs_rms for segs_rms, _ in results])
+    x = np.concatenate([x for _, x in results])
+
+    return segs_rms, x, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--audio_path', type=str, default=None)
+    parser.add_argument('--duration', type=float, default=600.0)
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    if args.audio_path:
+        import librosa
+
+        (wav, _) = librosa.core.load(args.audio_path, sr=SR, mono=True)
+    else:
+        wav = synthesize_audio(args.duration)
+
+    scale = 1 / np.sqrt(np.mean(wav**2)) / 20
+    print(f'Audio duration: {len(wav) / SR:.1f} s', file=sys.stderr)
+
+    (rms_before, x_before, elapsed) = run_front_end(iterate_segment_spectrograms_before, wav, scale)
+    print(f'front end before: {elapsed:.3f} s, {len(x_before) / elapsed:.1f} segments/s', file=sys.stderr)
+
+    front_ends = {
+        'batched': (iterate_segment_spectrograms, {}),
+        f'torch.stft on {args.device}': (iterate_segment_spectrograms_torch_host, {'device': args.device}),
+    }
+    xs = {'before': x_before}
+
+    for name, (iterate, kwargs) in front_ends.items():
+        (segs_rms, xs[name], elapsed) = run_front_end(iterate, wav, scale, **kwargs)
+        print(f'front end {name}: {elapsed:.3f} s, {len(xs[name]) / elapsed:.1f} segments/s', file=sys.stderr)
+
+        error = np.max(np.abs(x_before - xs[name])) / np.max(np.abs(x_before))
+        print(f'Spectrogram max error relative to max magnitude: {error:.2e}', file=sys.stderr)
+        print(f'Silent segments match: {np.array_equal(rms_before < 0.001, segs_rms < 0.001)}', file=sys.stderr)
+
+    if not os.path.isfile(CHECKPOINT_PATH):
+        print(f'{CHECKPOINT_PATH} does not exist, skip the comparison of probabilities.', file=sys.stderr)
+        return
+
+    model = piano_detection_model.PianoDetection()
+    model.load(CHECKPOINT_PATH)
+
+    probs = {}
+
+    for name, x in xs.items():
+        bgn_time = time.time()
+        probs[name] = np.concatenate([model.predict_on_batch(x[n : n + 32])[:, 1] for n in range(0, len(x), 32)])
+        print(f'model on {name} spectrograms: {time.time() - bgn_time:.3f} s', file=sys.stderr)
+
+    for name in front_ends:
+        difference = np.max(np.abs(probs['before'] - probs[name]))
+        print(f'Probability max abs difference of {name}: {difference:.2e}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark the CPU throughput of the piano solo CNN in segments per second.
+
+PianoDetection.predict_on_batch used before is compared with PianoDetectionInference, with BatchNorms folded into
+convs, in the channels last memory format, scripted or compiled, and in int8 or bf16. Inputs are spectrograms of a
+synthesized recording.
+
+Usage:
+    python benchmarks/bench_piano_detection_model.py --segments=1024 --batch_size=32
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_piano_detection import CHECKPOINT_PATH, synthesize_audio  # noqa: E402
+
+from giantmidi_piano.piano_detection_model import (  # noqa: E402
+    PianoDetection,
+    PianoDetectionInference,
+    iterate_segment_spectrograms,
+)
+
+
+def get_inputs(segments_num):
+    wav = synthesize_audio(segments_num + 1)
+    scale = 1 / np.sqrt(np.mean(wav**2)) / 20
+    x = np.concatenate([x for _, x in iterate_segment_spectrograms(wav, scale)])
+
+    return x[:segments_num]
+
+
+def run(predict, x, batch_size, warmup_batches=2):
+    for n in range(warmup_batches):
+        predict(x[n * batch_size : (n + 1) * batch_size])
+
+    bgn_time = time.time()
+    probs = np.concatenate([predict(x[n : n + batch_size]) for n in range(0, len(x), batch_size)])
+    elapsed = time.time() - bgn_time
+
+    return probs, len(x) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--segments', type=int, default=1024)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--skip_compile', action='store_true', default=False)
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    x = get_inputs(args.segments)
+    print(f'Segments: {len(x)}, threads: {args.threads}', file=sys.stderr)
+
+    model = PianoDetection()
+    model.load(CHECKPOINT_PATH)
+
+    (probs_before, speed) = run(lambda x: model.predict_on_batch(x)[:, 1], x, args.batch_size)
+    print(f'PianoDetection.predict_on_batch: {speed:.1f} segments/s', file=sys.stderr)
+
+    variants = {
+        'fused': {},
+        'fused, channels last': {'channels_last': True},
+        'fused, torchscript': {'compile_mode': 'torchscript'},
+        'fused, channels last, torchscript': {'channels_last': True, 'compile_mode': 'torchscript'},
+        'int8': {'precision': 'int8'},
+        'int8, channels last': {'precision': 'int8', 'channels_last': True},
+        'bf16': {'precision': 'bf16'},
+        'bf16, channels last': {'precision': 'bf16', 'channels_last': True},
+    }
+
+    if not args.skip_compile:
+        variants['fused, torch.compile'] = {'compile_mode': 'compile'}
+
+    for name, kwargs in variants.items():
+        try:
+            inference = PianoDetectionInference(CHECKPOINT_PATH, device='cpu', **kwargs)
+            (probs, speed) = run(lambda x: inference(x).numpy(), x, args.batch_size)  # noqa: B023
+        except Exception as e:  # noqa: BLE001
+            print(f'{name}: failed, {e}', file=sys.stderr)
+            continue
+
+        difference = np.max(np.abs(probs - probs_before))
+        print(f'{name}: {speed:.1f} segments/s, probability max abs difference: {difference:.2e}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
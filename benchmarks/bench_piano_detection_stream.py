@@ -0,0 +1,70 @@
+"""Benchmark the peak memory of PianoSoloDetector.predict and of PianoSoloDetector.predict_stream on recordings of
+increasing durations.
+
+Recordings are synthesized and written as raw float32 files, which predict_stream reads as memory maps. Memory of
+NumPy arrays is traced with tracemalloc, and the memory of a recording loaded by predict is included.
+
+Usage:
+    python benchmarks/bench_piano_detection_stream.py --durations 300 1200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_piano_detection import CHECKPOINT_PATH, synthesize_audio  # noqa: E402
+
+from giantmidi_piano.piano_detection_model import PianoSoloDetector  # noqa: E402
+
+
+def measure(func):
+    tracemalloc.start()
+    bgn_time = time.time()
+    result = func()
+    elapsed = time.time() - bgn_time
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--durations', type=float, nargs='+', default=[300, 1200])
+    args = parser.parse_args()
+
+    detector = PianoSoloDetector(checkpoint_path=CHECKPOINT_PATH)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for duration in args.durations:
+            raw_path = os.path.join(tmp_dir, f'{duration}.f32')
+            synthesize_audio(duration).astype('<f4').tofile(raw_path)
+
+            def _predict(raw_path=raw_path):
+                return detector.predict(np.fromfile(raw_path, dtype='<f4'))
+
+            def _predict_stream(raw_path=raw_path):
+                wav = np.memmap(raw_path, dtype='<f4', mode='r')
+                return np.concatenate(list(detector.predict_stream(wav)))
+
+            (probs, elapsed, peak) = measure(_predict)
+            print(f'{duration:.0f} s, predict: {elapsed:.1f} s, peak memory: {peak / 2**20:.1f} MB', file=sys.stderr)
+
+            (stream_probs, elapsed, peak) = measure(_predict_stream)
+            difference = np.max(np.abs(stream_probs - probs))
+            print(
+                f'{duration:.0f} s, predict_stream: {elapsed:.1f} s, peak memory: {peak / 2**20:.1f} MB, '
+                f'probability max abs difference: {difference:.2e}',
+                file=sys.stderr,
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark calculate_piano_solo_prob on a workspace of synthesized recordings.
+
+Mp3s decoded and predicted one by one before are compared with the pool of decode processes and the cross-file batches
+of calculate_piano_solo_prob. Recordings are written as wav data with the .mp3 suffix, which librosa decodes by their
+headers, unless --mp3s_dir and --workspace of real data are given.
+
+Usage:
+    python benchmarks/bench_piano_solo_pipeline.py --files=16 --workers=4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_piano_detection import CHECKPOINT_PATH, synthesize_audio  # noqa: E402
+
+from giantmidi_piano.audios_to_midis import calculate_piano_solo_prob  # noqa: E402
+from giantmidi_piano.dataset import read_csv_to_meta_dict, write_meta_dict_to_csv  # noqa: E402
+from giantmidi_piano.piano_detection_model import SR, PianoSoloDetector  # noqa: E402
+
+
+def synthesize_workspace(workspace, mp3s_dir, files_num):
+    import soundfile
+
+    rng = np.random.RandomState(1234)
+    meta_dict = {'surname': [], 'firstname': [], 'music': [], 'youtube_id': []}
+
+    for n in range(files_num):
+        meta_dict['surname'].append(f'Surname{n}')
+        meta_dict['firstname'].append(f'Firstname{n}')
+        meta_dict['music'].append(f'Piece No.{n}')
+        meta_dict['youtube_id'].append(f'{n:011d}')
+
+        wav = synthesize_audio(rng.uniform(30, 300), seed=n)
+        mp3_name = f'Surname{n}, Firstname{n}, Piece No.{n}, {n:011d}.mp3'
+        soundfile.write(os.path.join(mp3s_dir, mp3_name), wav, SR, format='WAV')
+
+    write_meta_dict_to_csv(meta_dict, os.path.join(workspace, 'full_music_pieces_youtube_similarity.csv'))
+
+
+def calculate_piano_solo_prob_before(workspace, mp3s_dir):
+    """Decoding and prediction of one mp3 after another, the loop of calculate_piano_solo_prob before the pipeline."""
+    import librosa
+
+    meta_dict = read_csv_to_meta_dict(os.path.join(workspace, 'full_music_pieces_youtube_similarity.csv'))
+    piano_solo_detector = PianoSoloDetector(checkpoint_path=CHECKPOINT_PATH)
+    probs = []
+
+    for n in range(len(meta_dict['surname'])):
+        mp3_name = f"{meta_dict['surname'][n]}, {meta_dict['firstname'][n]}, {meta_dict['music'][n]}, {meta_dict['youtube_id'][n]}.mp3"  # noqa: E501
+        (audio, _) = librosa.core.load(os.path.join(mp3s_dir, mp3_name), sr=SR, mono=True)
+        probs.append(np.mean(piano_solo_detector.predict(audio)))
+
+    return np.array(probs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workspace', type=str, default=None)
+    parser.add_argument('--mp3s_dir', type=str, default=None)
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        (workspace, mp3s_dir) = (args.workspace, args.mp3s_dir)
+
+        if not workspace:
+            (workspace, mp3s_dir) = (tmp_dir, os.path.join(tmp_dir, 'mp3s'))
+            os.makedirs(mp3s_dir)
+            synthesize_workspace(workspace, mp3s_dir, args.files)
+
+        bgn_time = time.time()
+        probs_before = calculate_piano_solo_prob_before(workspace, mp3s_dir)
+        print(f'before: {time.time() - bgn_time:.2f} s', file=sys.stderr)
+
+        bgn_time = time.time()
+        calculate_piano_solo_prob(workspace, mp3s_dir, mini_data=False, workers=args.workers)
+        print(f'pipeline, {args.workers} workers: {time.time() - bgn_time:.2f} s', file=sys.stderr)
+
+        meta_dict = read_csv_to_meta_dict(
+            os.path.join(workspace, 'full_music_pieces_youtube_similarity_pianosoloprob.csv')
+        )
+        probs = np.array([float(prob) for prob in meta_dict['piano_solo_prob'] if prob != ''])
+        difference = np.max(np.abs(probs - probs_before), initial=0)
+        print(f'Probability max abs difference: {difference:.2e}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
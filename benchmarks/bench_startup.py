@@ -0,0 +1,65 @@
+"""Benchmark the startup time of the command line interface.
+
+Each command is run in a fresh interpreter, and the heavy modules imported by the command are reported.
+
+Usage:
+    python benchmarks/bench_startup.py --repeats=5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+HEAVY_MODULES = ['nltk', 'bs4', 'torch', 'librosa', 'matplotlib', 'pandas', 'piano_transcription_inference']
+SUBCOMMANDS = ['convert', 'download', 'meta', 'split', 'stats', 'transcribe']
+
+# Print the heavy modules imported after the command finishes
+PROBE = f"""
+import atexit, sys
+atexit.register(lambda: print(
+    ','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules), file=sys.stderr))
+sys.argv = ['giantmidi-piano'] + sys.argv[1:]
+from giantmidi_piano.cli.main import main
+main()
+"""
+
+
+def run(args, repeats):
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC_DIR))
+    times = []
+
+    for _ in range(repeats):
+        bgn_time = time.time()
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, *args], env=env, capture_output=True, text=True, check=False
+        )
+        times.append(time.time() - bgn_time)
+
+    lines = result.stderr.strip().splitlines()
+    imported = lines[-1] if lines else ''
+
+    return statistics.median(times), result.returncode, imported
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    commands = [['--help']] + [[subcommand, '--help'] for subcommand in SUBCOMMANDS]
+
+    for command in commands:
+        (elapsed, returncode, imported) = run(command, args.repeats)
+        print(
+            f"giantmidi-piano {' '.join(command)}: {elapsed * 1000:.0f} ms, exit code: {returncode}, "
+            f"heavy modules: {imported or 'none'}",
+            file=sys.stderr,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark the transcription throughput of a corpus of short pieces in pieces per second.
+
+PianoTranscription.transcribe, which forwards one 10 s segment at a time, is compared with BatchTranscriber, which
+packs segments of consecutive pieces into full batches, in frame outputs and note events. Pieces of piano-like tones
+are synthesized with durations uniform in [--min_duration, --max_duration]. The checkpoint of
+piano_transcription_inference is downloaded on the first run, unless --checkpoint_path is given.
+
+Usage:
+    python benchmarks/bench_transcription_batching.py --pieces=32 --min_duration=15 --max_duration=60
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bench_piano_detection import synthesize_audio  # noqa: E402
+
+from giantmidi_piano.piano_detection_model import SR  # noqa: E402
+from giantmidi_piano.transcription_engine import BatchTranscriber  # noqa: E402
+
+# Outputs of the model, the post-processing adds binarized outputs and their shifts to output_dict
+MODEL_OUTPUTS = [
+    'reg_onset_output',
+    'reg_offset_output',
+    'frame_output',
+    'velocity_output',
+    'reg_pedal_onset_output',
+    'reg_pedal_offset_output',
+    'pedal_frame_output',
+]
+
+
+def synthesize_corpus(pieces, min_duration, max_duration, sample_rate):
+    rng = np.random.RandomState(1234)
+    audios = []
+
+    for n in range(pieces):
+        duration = rng.uniform(min_duration, max_duration)
+        wav = synthesize_audio(duration, seed=n)
+        audios.append(wav[:: SR // sample_rate].copy())
+
+    return audios
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pieces', type=int, default=32)
+    parser.add_argument('--min_duration', type=float, default=15.0)
+    parser.add_argument('--max_duration', type=float, default=60.0)
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--checkpoint_path', type=str, default=None)
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    import piano_transcription_inference
+
+    transcriptor = piano_transcription_inference.PianoTranscription(
+        checkpoint_path=args.checkpoint_path, device=args.device
+    )
+    audios = synthesize_corpus(
+        args.pieces, args.min_duration, args.max_duration, piano_transcription_inference.sample_rate
+    )
+    duration = sum(len(audio) for audio in audios) / piano_transcription_inference.sample_rate
+    print(f'Pieces: {len(audios)}, audio duration: {duration:.1f} s, device: {args.device}', file=sys.stderr)
+
+    bgn_time = time.time()
+    results_before = [transcriptor.transcribe(audio, None) for audio in audios]
+    elapsed = time.time() - bgn_time
+    print(f'transcribe: {len(audios) / elapsed:.3f} pieces/s, {duration / elapsed:.1f} audio s/s', file=sys.stderr)
+
+    for batch_size in args.batch_sizes:
+        engine = BatchTranscriber(transcriptor, batch_size)
+
+        bgn_time = time.time()
+        results = [result for _, result, _ in engine.transcribe_files(enumerate(audios))]
+        elapsed = time.time() - bgn_time
+
+        difference = max(
+            np.max(np.abs(before['output_dict'][key] - result['output_dict'][key]))
+            for before, result in zip(results_before, results)
+            for key in MODEL_OUTPUTS
+        )
+        notes_match = all(
+            len(before['est_note_events']) == len(result['est_note_events'])
+            for before, result in zip(results_before, results)
+        )
+        print(
+            f'BatchTranscriber, batch size {batch_size}: {len(audios) / elapsed:.3f} pieces/s, '
+            f'{duration / elapsed:.1f} audio s/s, output max abs difference: {difference:.2e}, '
+            f'note counts match: {notes_match}',
+            file=sys.stderr,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Compare the regex matcher of get_composer_info_from_wikipedia with the NLTK tokenizer and POS tagger used before.
+
+Usage:
+    python benchmarks/bench_wikipedia_info.py --wikipedias_dir=./workspace/wikipedias --workers=8
+"""
+
+import argparse
+import os
+import pathlib
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from giantmidi_piano.config import nationalities  # noqa: E402
+from giantmidi_piano.dataset import get_composer_info_from_wikipedia, get_composers_info_from_wikipedia  # noqa: E402
+
+
+def get_composer_info_nltk(wikipedia_path):
+    """get_composer_info_from_wikipedia before the regex matcher."""
+    import nltk
+
+    nationality = None
+    years = []
+
+    text = pathlib.Path(wikipedia_path).read_text()
+    text = text.replace(': ', ':')
+    text = text.replace('", "', '","')
+    bgn = re.search(r'wgCategories":\[', text)
+
+    if not bgn:
+        return 'unknown', 'unknown', 'unknown'
+
+    text = text[bgn.end() + 1 :]
+    text = text[: re.search(r'\]', text).start() - 1]
+    sentence = ' '.join(text.split('","'))
+
+    for word, tag in nltk.pos_tag(nltk.word_tokenize(sentence)):
+        if tag == 'JJ':
+            if not nationality and word in nationalities:
+                nationality = word
+        elif tag == 'CD':
+            try:
+                year = int(word[:4])
+                if 1000 <= year <= 9999:  # noqa: PLR2004
+                    years.append(year)
+            except ValueError:
+                pass
+
+    years = sorted(years)
+    (birth, death) = (str(years[0]), str(years[1])) if len(years) >= 2 else ('unknown', 'unknown')  # noqa: PLR2004
+
+    return nationality or 'unknown', birth, death
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--wikipedias_dir', type=str, required=True)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    paths = [os.path.join(args.wikipedias_dir, name) for name in sorted(os.listdir(args.wikipedias_dir))]
+
+    bgn_time = time.time()
+    infos = [get_composer_info_from_wikipedia(path) for path in paths]
+    print(f'regex: {len(paths) / (time.time() - bgn_time):.1f} pages/s', file=sys.stderr)
+
+    bgn_time = time.time()
+    get_composers_info_from_wikipedia(paths, args.workers)
+    print(f'regex with {args.workers} processes: {len(paths) / (time.time() - bgn_time):.1f} pages/s', file=sys.stderr)
+
+    try:
+        import nltk  # noqa: F401
+    except ImportError:
+        print('nltk is not installed, skip the comparison.', file=sys.stderr)
+        return
+
+    bgn_time = time.time()
+    nltk_infos = [get_composer_info_nltk(path) for path in paths]
+    print(f'nltk: {len(paths) / (time.time() - bgn_time):.1f} pages/s', file=sys.stderr)
+
+    mismatches = [(path, a, b) for path, a, b in zip(paths, infos, nltk_infos) if a != b]
+    print(f'Mismatches: {len(mismatches)} / {len(paths)}', file=sys.stderr)
+
+    for path, a, b in mismatches[:20]:
+        print(f'{os.path.basename(path)}: regex {a}, nltk {b}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""Decoders of downloaded mp3s to float32 mono audio at the sample rate of a model, e.g., 32 kHz for the piano solo
+detector and 16 kHz for piano transcription.
+
+- librosa: librosa.core.load, soundfile or audioread, and then soxr_hq resampling.
+- audioread: piano_transcription_inference.load_audio, ffmpeg through audioread, and then kaiser_best resampling.
+- soundfile: libsndfile (mp3 since 1.1.0) read into one buffer, and then soxr_hq resampling if needed.
+- ffmpeg: f32le mono audio at the target sample rate streamed from a ffmpeg pipe into one buffer.
+
+Decoded audios can be cached on disk by AudioCache, so that re-runs of a stage, and the transcription stage after the
+piano solo detection stage, do not decode mp3s again.
+"""
+
+import glob
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+DECODERS = ['librosa', 'audioread', 'soundfile', 'ffmpeg']
+
+# Bytes read from the ffmpeg pipe at a time
+PIPE_CHUNK = 1 << 20
+
+
+def decode_audio(audio_path, sample_rate, decoder='librosa', ffmpeg_command='ffmpeg', cache=None):
+    """Decode an audio file to mono.
+
+    Args:
+      audio_path: str
+      sample_rate: int
+      decoder: str, one of DECODERS.
+      ffmpeg_command: str, ffmpeg compatible executable of the ffmpeg decoder.
+      cache: AudioCache | None, load the audio from the cache if it is cached, otherwise decode and cache it.
+
+    Returns:
+      audio: (samples_num,), float32
+    """
+    if cache is None:
+        return _decode_audio(audio_path, sample_rate, decoder, ffmpeg_command)
+
+    key = cache.get_key(audio_path)
+    audio = cache.load(key, sample_rate)
+
+    if audio is None:
+        audio = _decode_audio(audio_path, sample_rate, decoder, ffmpeg_command)
+        cache.save(key, sample_rate, audio)
+
+    return audio
+
+
+def _decode_audio(audio_path, sample_rate, decoder, ffmpeg_command):
+    if decoder == 'librosa':
+        import librosa
+
+        (audio, _) = librosa.core.load(audio_path, sr=sample_rate, mono=True)
+        return audio
+
+    if decoder == 'audioread':
+        import piano_transcription_inference
+
+        (audio, _) = piano_transcription_inference.load_audio(audio_path, sr=sample_rate, mono=True)
+        return audio
+
+    if decoder == 'soundfile':
+        return _decode_soundfile(audio_path, sample_rate)
+
+    if decoder == 'ffmpeg':
+        return _decode_ffmpeg(audio_path, sample_rate, ffmpeg_command)
+
+    raise ValueError(f'Unknown decoder {decoder}, expected one of {DECODERS}.')
+
+
+def decode_audio_timed(audio_path, sample_rate, decoder='librosa', ffmpeg_command='ffmpeg', cache=None):
+    """Decode an audio file to mono, see decode_audio.
+
+    Returns:
+      audio: (samples_num,), float32
+      decode_time: float, in seconds, including the time of cache lookups.
+    """
+    bgn_time = time.time()
+    audio = decode_audio(audio_path, sample_rate, decoder, ffmpeg_command, cache)
+
+    return audio, time.time() - bgn_time
+
+
+def decode_audio_to_file(audio_path, out_path, sample_rate, ffmpeg_command='ffmpeg'):
+    """Decode an audio file to raw float32 mono PCM on disk with ffmpeg, so that a long recording is never held in
+    memory, e.g., for PianoSoloDetector.predict_stream.
+
+    Returns:
+      audio: np.memmap, (samples_num,), float32
+    """
+    result = subprocess.run(
+        [
+            ffmpeg_command,
+            '-nostdin',
+            '-loglevel',
+            'error',
+            '-y',
+            '-i',
+            audio_path,
+            '-f',
+            'f32le',
+            '-ac',
+            '1',
+            '-ar',
+            str(sample_rate),
+            out_path,
+        ],
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+
+    if result.returncode != 0:
+        raise OSError(f'{ffmpeg_command} failed to decode {audio_path}: {result.stderr.strip()}')
+
+    if os.path.getsize(out_path) == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    return np.memmap(out_path, dtype='<f4', mode='r')
+
+
+def _decode_soundfile(audio_path, sample_rate):
+    import soundfile
+
+    with soundfile.SoundFile(audio_path) as f:
+        # Mp3s are read at once, reads of libsndfile 1.2 in blocks are discontinuous at some block boundaries. Reads of
+        # libsndfile stop at its number of frames, so the buffer holds every frame that can be read
+        buffer = np.empty((max(f.frames, 0), f.channels), dtype=np.float32)
+        audio = f.read(out=buffer)
+        orig_sr = f.samplerate
+
+    audio = audio[:, 0] if audio.shape[1] == 1 else np.mean(audio, axis=1, dtype=np.float32)
+
+    if orig_sr != sample_rate:
+        import soxr
+
+        audio = soxr.resample(audio, orig_sr, sample_rate, quality='HQ')
+
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def _decode_ffmpeg(audio_path, sample_rate, ffmpeg_command='ffmpeg'):
+    command = [
+        ffmpeg_command,
+        '-nostdin',
+        '-loglevel',
+        'error',
+        '-i',
+        audio_path,
+        '-f',
+        'f32le',
+        '-ac',
+        '1',
+        '-ar',
+        str(sample_rate),
+        '-',
+    ]
+
+    # stderr goes to a file, a pipe of stderr would fill up with the errors of the bad packets of a corrupt mp3 while
+    # stdout is read, and block ffmpeg
+    with tempfile.TemporaryFile() as stderr_file:
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file) as process:
+            # Start from one chunk and double the buffer when it is full, so that short audios do not allocate the
+            # buffer of a long one, and a long audio is copied O(1) times per sample
+            buffer = np.empty(PIPE_CHUNK // 4, dtype=np.float32)
+            nbytes = 0
+
+            while True:
+                if nbytes + PIPE_CHUNK > buffer.nbytes:
+                    buffer.resize(2 * len(buffer) + PIPE_CHUNK // 4, refcheck=False)
+
+                with memoryview(buffer).cast('B') as view:
+                    read = process.stdout.readinto(view[nbytes : nbytes + PIPE_CHUNK])
+
+                if not read:
+                    break
+
+                nbytes += read
+
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors='replace').strip()
+            raise OSError(f'{ffmpeg_command} failed to decode {audio_path}: {stderr}')
+
+    # Shrink the buffer in place instead of keeping a view of it
+    buffer.resize(nbytes // 4, refcheck=False)
+
+    return buffer
+
+
+class AudioCache:
+    def __init__(self, cache_dir, max_bytes=50 * 2**30):
+        """On disk cache of decoded audios, shared by processes and stages.
+
+        An audio is cached as float16 in cache_dir/<sample_rate>/<audio name>.<hash of the mp3>.npy and loaded as a
+        memory map. Unlike int16 PCM, float16 keeps the samples of decoders beyond [-1, 1]. When the cache exceeds
+        max_bytes, the least recently used audios are removed. An audio missing at a sample rate is resampled from
+        the same audio cached at a higher sample rate instead of decoded again.
+
+        The size of the cache is scanned by the first save of a process, and then counted on each save until it
+        exceeds max_bytes, so that a save does not stat the whole cache. Audios saved by other processes since the
+        last scan are not counted, so several processes may exceed max_bytes by what they saved between scans.
+
+        Args:
+          cache_dir: str
+          max_bytes: int, size cap of the cache.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = None
+
+    def get_key(self, audio_path):
+        """Get the cache key of an audio, the audio name and the hash of the file content."""
+        blake = hashlib.blake2b(digest_size=8)
+
+        with open(audio_path, 'rb') as fr:
+            for chunk in iter(lambda: fr.read(PIPE_CHUNK), b''):
+                blake.update(chunk)
+
+        audio_name = os.path.splitext(os.path.basename(audio_path))[0]
+
+        # Keep the file names of long audio names within 255 bytes
+        return audio_name.encode('utf-8')[:200].decode('utf-8', errors='ignore'), blake.hexdigest()
+
+    def get_path(self, key, sample_rate):
+        (audio_name, content_hash) = key
+        return os.path.join(self.cache_dir, str(sample_rate), f'{audio_name}.{content_hash}.npy')
+
+    def load(self, key, sample_rate):
+        """Load a cached audio.
+
+        Returns:
+          audio: (samples_num,), float32 | None, None if the audio is not cached.
+        """
+        cached = self._load_cached(self.get_path(key, sample_rate))
+
+        if cached is not None:
+            return cached.astype(np.float32)
+
+        # Resample the audio cached at the lowest sample rate higher than sample_rate
+        (audio_name, content_hash) = key
+        pattern = os.path.join(glob.escape(self.cache_dir), '*', f'{glob.escape(audio_name)}.{content_hash}.npy')
+        sample_rates = sorted(
+            int(os.path.basename(os.path.dirname(path)))
+            for path in glob.glob(pattern)
+            if os.path.basename(os.path.dirname(path)).isdigit()
+        )
+        higher_rates = [rate for rate in sample_rates if rate > sample_rate]
+        cached = self._load_cached(self.get_path(key, higher_rates[0])) if higher_rates else None
+
+        if cached is None:
+            return None
+
+        import soxr
+
+        audio = soxr.resample(cached.astype(np.float32), higher_rates[0], sample_rate, quality='HQ').astype(np.float32)
+        self.save(key, sample_rate, audio)
+
+        return audio
+
+    def _load_cached(self, path):
+        """Load a cached audio as a memory map, None if it is missing, unreadable or not float16. A cached audio of
+        another dtype, e.g., int16 of an earlier version of the cache, is removed, so that it is decoded again."""
+        try:
+            cached = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        if cached.dtype != np.float16:
+            del cached
+
+            try:
+                os.remove(path)
+            except OSError:  # Removed by another process
+                pass
+
+            return None
+
+        try:
+            os.utime(path)  # The mtime of a cached audio is its last use
+        except OSError:
+            return None
+
+        return cached
+
+    def save(self, key, sample_rate, audio):
+        """Cache an audio, and remove the least recently used audios if the cache exceeds its size cap."""
+        path = self.get_path(key, sample_rate)
+        tmp_path = f'{path}.tmp{os.getpid()}_{threading.get_ident()}'
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as fw:
+                np.save(fw, np.asarray(audio, dtype=np.float16))
+            replaced_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+
+        except OSError as e:
+            print(f'Failed to cache {path}: {e}')
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        if self.total_bytes is not None:
+            self.total_bytes += os.path.getsize(path) - replaced_bytes
+
+        if self.total_bytes is None or self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Scan the size of the cache, and remove the least recently used audios until the cache is within its size
+        cap."""
+        entries = []
+
+        for path in glob.glob(os.path.join(glob.escape(self.cache_dir), '*', '*.npy')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:  # Removed by another process
+                pass
+
+            total -= size
+
+        self.total_bytes = total
@@ -1,41 +1,201 @@
+import collections
+import glob
+import multiprocessing
 import os
+import socket
 import time
+from concurrent.futures import ProcessPoolExecutor
 
-import librosa
 import numpy as np
-import piano_transcription_inference
-import torch
 
-from . import piano_detection_model
-from .dataset import read_csv_to_meta_dict, write_meta_dict_to_csv
+from .cpu_planner import calibrate_instances, pin_process, plan_cpus
+from .dataset import read_csv_to_meta_dict, read_meta_table, write_meta_dict_to_csv
+from .journal import Journal, make_key, read_journal
+from .midi_manifest import MidiManifest, hash_file, write_atomic
+from .stage_metrics import MetricsWriter, get_metrics_dir
+from .transcription_engine import BatchTranscriber, write_midi
 from .utilities import get_filename
+from .work_queue import DONE, PENDING, WorkQueue
 
+TRANSCRIPTION_CSV_PATH = './resources/full_music_pieces_youtube_similarity_pianosoloprob_split.csv'
 
-def calculate_piano_solo_prob(
+# Seconds of decoded audios waiting for the detector, about 240 MB of spectrograms per hour
+MAX_PENDING_AUDIO_SECONDS = 3600
+
+
+def _get_piano_solo_key(meta_dict, n):
+    return make_key(
+        meta_dict['surname'][n], meta_dict['firstname'][n], meta_dict['music'][n], meta_dict['youtube_id'][n]
+    )
+
+
+def _read_piano_solo_journals(journals_dir):
+    """Read and merge the journals of all shards. Records of predicted mp3s overwrite records of missing mp3s, which
+    are written again when a missing mp3 is downloaded and predicted by another shard."""
+    records = {}
+
+    for journal_path in sorted(glob.glob(os.path.join(glob.escape(journals_dir), '*.jsonl'))):
+        for key, record in read_journal(journal_path).items():
+            if key not in records or record['audio_name'] or not records[key]['audio_name']:
+                records[key] = record
+
+    return records
+
+
+def _format_piano_solo_prob(prob):
+    """Format a probability as the csvs of earlier releases, i.e., the str of a float32 mean of segment probabilities,
+    or '0' for a recording without probabilities. Journals written before record floats."""
+    return str(prob) if isinstance(prob, int) else str(np.float32(prob))
+
+
+def _load_piano_solo_input(mp3_path, spectrograms, decoder, audio_cache):
+    """Decode an mp3 in a decode process.
+
+    Returns:
+      duration: float, in seconds.
+      segs: (segs_rms, x) of compute_segment_spectrograms if spectrograms is True, otherwise the decoded audio.
+        Spectrograms that fail to compute are no segments, so that the mp3 is predicted as 0.
+      times: dict, seconds of 'decode_time', and 'features_time' if spectrograms is True.
+    """
+    from . import piano_detection_model
+    from .audio_decoder import decode_audio_timed
+
+    (audio, decode_time) = decode_audio_timed(mp3_path, piano_detection_model.SR, decoder, cache=audio_cache)
+    duration = len(audio) / piano_detection_model.SR
+
+    if spectrograms:
+        bgn_time = time.time()
+
+        try:
+            segs = piano_detection_model.compute_segment_spectrograms(audio)
+        except Exception as e:  # noqa: BLE001
+            print(f'Failed to compute the spectrograms of {mp3_path}: {e}')
+            segs = (
+                np.zeros(0),
+                np.zeros((0, 1, piano_detection_model.DIM_T, piano_detection_model.DIM_F), np.float32),
+            )
+
+        return duration, segs, {'decode_time': decode_time, 'features_time': time.time() - bgn_time}
+
+    return duration, audio, {'decode_time': decode_time}
+
+
+def _iterate_in_order(executor, func, args_list, max_running, get_seconds, max_pending_seconds):
+    """Like executor.map, but tasks are submitted as results are consumed: at most max_running tasks are not
+    finished, and no task is submitted while finished results that are not consumed hold max_pending_seconds of audio
+    or more, so that the memory of decoded audios is bounded when the consumer is slower than the pool.
+
+    Args:
+      get_seconds: function, result -> seconds of audio held by the result.
+    """
+    pending = collections.deque()
+    args_iter = iter(args_list)
+
+    def _submit():
+        while True:
+            finished = [future for future in pending if future.done()]
+            pending_seconds = sum(get_seconds(future.result()) for future in finished if future.exception() is None)
+
+            if len(pending) - len(finished) >= max_running or pending_seconds >= max_pending_seconds:
+                return
+
+            args = next(args_iter, None)
+
+            if args is None:
+                return
+
+            pending.append(executor.submit(func, *args))
+
+    _submit()
+
+    while pending:
+        result = pending.popleft().result()
+        _submit()
+
+        yield result
+
+
+def calculate_piano_solo_prob(  # noqa: PLR0913
     workspace: str,
     mp3s_dir: str,
     mini_data: bool,
+    front_end: str = 'numpy',
+    channels_last: bool = False,
+    compile_mode: str = 'none',
+    precision: str = 'fp32',
+    sequential: bool = False,
+    workers: int = 0,
+    decoder: str = 'librosa',
+    audio_cache_dir: str = None,
+    audio_cache_size: float = 50,
+    begin_index: int = 0,
+    end_index: int = 0,
 ):
-    """Calculate the piano solo probability of all downloaded mp3s, and append the probability to the meta csv file."""
+    """Calculate the piano solo probability of all downloaded mp3s, and append the probability to the meta csv file.
+
+    The result of each mp3 is appended to a journal keyed by the mp3 name as soon as it is predicted, so a restarted
+    run skips finished mp3s. Each [begin_index, end_index) shard writes its own journal, and the csv is built from all
+    journals once every mp3 is finished, see merge_piano_solo_prob. Seconds of decoding, spectrograms, inference and
+    of waiting for decode processes of each mp3 are written to workspace/_tmp/metrics, see stage_metrics.
+
+    Mp3s are decoded by a pool of `workers` processes while the detector predicts the mp3s decoded before. With the
+    numpy front end, the decode processes also compute spectrograms, and the detector predicts full batches of
+    segments across the boundaries of mp3s. Decoding pauses while MAX_PENDING_AUDIO_SECONDS of decoded audios wait
+    for the detector.
+
+    Args:
+      workspace: str
+      mp3s_dir: str
+      mini_data: bool
+      front_end: str, 'numpy' | 'torch', spectrograms are computed on host or on the device of the detector.
+      channels_last: bool, run the detector in the channels last memory format.
+      compile_mode: str, 'none' | 'torchscript' | 'compile'
+      precision: str, 'fp32' | 'int8' | 'bf16', see PianoDetectionInference.
+      sequential: bool, estimate the probability from a stratified sample of segments, and stop once it is clearly
+        above or below 0.5, see PianoSoloDetector.predict_sequential. The number of predicted segments is written to
+        the column piano_solo_segs_num.
+      workers: int, number of decode processes, 0 uses all cores.
+      decoder: str, 'librosa' | 'audioread' | 'soundfile' | 'ffmpeg', see audio_decoder.
+      audio_cache_dir: str | None, directory of the decoded audio cache shared with transcribe_piano, None disables
+        the cache.
+      audio_cache_size: float, size cap of the decoded audio cache in GB.
+      begin_index: int
+      end_index: int, exclusive, 0 predicts to the end of the csv.
+    """
+    from . import piano_detection_model
+    from .audio_decoder import AudioCache
+
     # Arguments & parameters
-    sample_rate = piano_detection_model.SR
     prefix = 'minidata_' if mini_data else ''
+    batch_size = 32
+
+    # Cross-file batches need spectrograms computed by the decode processes
+    cross_file = front_end == 'numpy' and not sequential
+    audio_cache = AudioCache(audio_cache_dir, int(audio_cache_size * 2**30)) if audio_cache_dir else None
 
     # Paths
     similarity_csv_path = os.path.join(workspace, f'{prefix}full_music_pieces_youtube_similarity.csv')
 
-    piano_prediction_path = os.path.join(workspace, f'{prefix}full_music_pieces_youtube_similarity_pianosoloprob.csv')
+    journals_dir = os.path.join(workspace, '_tmp', f'{prefix}piano_solo_prob_journals')
 
     # Meta info
     meta_dict = read_csv_to_meta_dict(similarity_csv_path)
 
-    meta_dict['piano_solo_prob'] = []
-    meta_dict['audio_name'] = []
-    meta_dict['audio_duration'] = []
+    audios_num = len(meta_dict['surname'])
+    end_index = min(end_index, audios_num) if end_index else audios_num
+
+    journal = Journal(os.path.join(journals_dir, f'{begin_index}_{end_index}.jsonl'))
+    finished = _read_piano_solo_journals(journals_dir)
 
-    piano_solo_detector = piano_detection_model.PianoSoloDetector()
+    piano_solo_detector = piano_detection_model.PianoSoloDetector(
+        front_end, channels_last=channels_last, compile_mode=compile_mode, precision=precision
+    )
 
-    for n in range(len(meta_dict['surname'])):
+    mp3_paths = {}
+
+    for n in range(begin_index, end_index):
+        key = _get_piano_solo_key(meta_dict, n)
+        record = finished.get(key)
         mp3_path = os.path.join(
             mp3s_dir,
             f"{meta_dict['surname'][n]}, {meta_dict['firstname'][n]}, {meta_dict['music'][n]}, {meta_dict['youtube_id'][n]}.mp3".replace(  # noqa: E501
@@ -43,23 +203,168 @@ def calculate_piano_solo_prob(
             ),
         )
 
+        # Mp3s missing in an earlier run may be downloaded since then
+        if record is not None and (record['audio_name'] or not os.path.exists(mp3_path)):
+            continue
+
         if os.path.exists(mp3_path):
-            (audio, _) = librosa.core.load(mp3_path, sr=sample_rate, mono=True)
-
-            try:
-                probs = piano_solo_detector.predict(audio)
-                prob = np.mean(probs)
-            except:
-                prob = 0
-
-            print(n, mp3_path, prob)
-            meta_dict['audio_name'].append(get_filename(mp3_path))
-            meta_dict['piano_solo_prob'].append(prob)
-            meta_dict['audio_duration'].append(len(audio) / sample_rate)
+            mp3_paths[n] = mp3_path
         else:
-            meta_dict['piano_solo_prob'].append('')
-            meta_dict['audio_name'].append('')
-            meta_dict['audio_duration'].append('')
+            journal.append(key, {'piano_solo_prob': '', 'audio_name': '', 'audio_duration': ''})
+
+    print(f'{len(mp3_paths)} mp3s to predict in [{begin_index}, {end_index})')
+
+    metrics = MetricsWriter(
+        os.path.join(get_metrics_dir(workspace), f'{prefix}piano_solo_prob_{begin_index}_{end_index}.jsonl')
+    )
+
+    workers = workers or os.cpu_count()
+    durations = {}
+    stage_times = {}
+
+    # Seconds the detector waits for decode processes, since the last mp3 is predicted
+    decode_wait_time = 0.0
+
+    def _iterate_inputs(executor):
+        nonlocal decode_wait_time
+
+        tasks = [(mp3_path, cross_file, decoder, audio_cache) for mp3_path in mp3_paths.values()]
+        results = _iterate_in_order(
+            executor,
+            _load_piano_solo_input,
+            tasks,
+            workers + 1,
+            lambda result: result[0],
+            MAX_PENDING_AUDIO_SECONDS,
+        )
+
+        for n in mp3_paths:
+            bgn_time = time.time()
+            (duration, segs, times) = next(results)
+            decode_wait_time += time.time() - bgn_time
+
+            durations[n] = duration
+            stage_times[n] = times
+            yield n, segs
+
+    def _iterate_probs(executor):
+        """Yield the index, probability and number of predicted segments of each mp3, and the inference seconds of
+        the mp3 if the detector predicts several mp3s at once. An mp3 whose prediction fails is predicted as 0, as in
+        earlier releases."""
+        if cross_file:
+            items = ((n, segs_rms, x) for n, (segs_rms, x) in _iterate_inputs(executor))
+
+            for n, probs, inference_time in piano_solo_detector.predict_files(items, batch_size):
+                # Recordings shorter than a segment have no probabilities
+                yield n, np.mean(probs) if len(probs) else 0, len(probs), inference_time
+
+        elif sequential:
+            for n, audio in _iterate_inputs(executor):
+                try:
+                    (prob, segs_num) = piano_solo_detector.predict_sequential(audio, batch_size=batch_size)
+                except ValueError:  # Shorter than a segment
+                    (prob, segs_num) = (0, 0)
+                except Exception as e:  # noqa: BLE001
+                    print(f'Failed to predict {mp3_paths[n]}: {e}')
+                    (prob, segs_num) = (0, 0)
+
+                yield n, prob, segs_num, None
+
+        else:
+            for n, audio in _iterate_inputs(executor):
+                try:
+                    probs = piano_solo_detector.predict(audio)
+                except Exception as e:  # noqa: BLE001
+                    print(f'Failed to predict {mp3_paths[n]}: {e}')
+                    probs = np.zeros(0)
+
+                yield n, np.mean(probs) if len(probs) else 0, len(probs), None
+
+    # Forking a process whose torch thread pools are running is not safe. Decode processes are forked from a server
+    # process which imports the modules of decoding once, or spawned where there is no fork server, e.g., Windows.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('forkserver')
+        mp_context.set_forkserver_preload(
+            ['librosa', 'giantmidi_piano.audio_decoder', 'giantmidi_piano.piano_detection_model']
+        )
+    else:
+        mp_context = multiprocessing.get_context('spawn')
+
+    with ProcessPoolExecutor(workers, mp_context=mp_context) as executor:
+        predict_time = time.time()
+
+        for n, prob, segs_num, inference_time in _iterate_probs(executor):
+            # Cross-file batches are split between their mp3s in proportion to their segments
+            if inference_time is None:
+                inference_time = time.time() - predict_time - decode_wait_time
+            times = stage_times.pop(n)
+            print(n, mp3_paths[n], prob, f"decode time: {times['decode_time']:.3f} s")
+
+            record = {
+                'piano_solo_prob': _format_piano_solo_prob(prob),
+                'audio_name': get_filename(mp3_paths[n]),
+                'audio_duration': durations.pop(n),
+            }
+
+            if sequential:
+                record['piano_solo_segs_num'] = segs_num
+
+            journal.append(_get_piano_solo_key(meta_dict, n), record)
+            metrics.write(
+                'piano_solo_prob',
+                record['audio_name'],
+                record['audio_duration'],
+                inference_time=inference_time,
+                decode_wait_time=decode_wait_time,
+                **times,
+            )
+
+            decode_wait_time = 0.0
+            predict_time = time.time()
+
+    merge_piano_solo_prob(workspace, mini_data)
+
+
+def merge_piano_solo_prob(
+    workspace: str,
+    mini_data: bool = False,
+):
+    """Build the piano solo probability meta csv from the journals of all calculate_piano_solo_prob shards."""
+    # Arguments & parameters
+    prefix = 'minidata_' if mini_data else ''
+
+    # Paths
+    similarity_csv_path = os.path.join(workspace, f'{prefix}full_music_pieces_youtube_similarity.csv')
+
+    journals_dir = os.path.join(workspace, '_tmp', f'{prefix}piano_solo_prob_journals')
+
+    piano_prediction_path = os.path.join(workspace, f'{prefix}full_music_pieces_youtube_similarity_pianosoloprob.csv')
+
+    meta_dict = read_csv_to_meta_dict(similarity_csv_path)
+    finished = _read_piano_solo_journals(journals_dir)
+
+    audios_num = len(meta_dict['surname'])
+    records = [finished.get(_get_piano_solo_key(meta_dict, n)) for n in range(audios_num)]
+    unfinished_num = sum(record is None for record in records)
+
+    if unfinished_num > 0:
+        print(f'{unfinished_num} out of {audios_num} mp3s are not finished! Skip writing {piano_prediction_path}')
+        return
+
+    keys = ['piano_solo_prob', 'audio_name', 'audio_duration']
+
+    # Sequential runs also record the number of predicted segments
+    if any('piano_solo_segs_num' in record for record in records):
+        keys.append('piano_solo_segs_num')
+
+    meta_dict = dict(meta_dict)
+
+    for key in keys:
+        meta_dict[key] = [record.get(key, '') for record in records]
+
+    meta_dict['piano_solo_prob'] = [
+        _format_piano_solo_prob(prob) if isinstance(prob, float) else prob for prob in meta_dict['piano_solo_prob']
+    ]
 
     write_meta_dict_to_csv(meta_dict, piano_prediction_path)
     print(f'Write out to {piano_prediction_path}')
@@ -72,42 +377,318 @@ def transcribe_piano(
     begin_index: int,
     end_index: int,
     mini_data: bool,
+    decoder: str = 'audioread',
+    audio_cache_dir: str = None,
+    audio_cache_size: float = 50,
+    verify: bool = False,
+    batch_size: int = 1,
 ):
-    """Transcribe piano solo mp3s to midi files."""
+    """Transcribe piano solo mp3s to midi files. Mp3s are decoded by `decoder`, see audio_decoder, the default
+    'audioread' is piano_transcription_inference.load_audio. Decoded audios are cached in audio_cache_dir, if it is
+    not None, with a size cap of audio_cache_size GB, see calculate_piano_solo_prob.
+
+    Midi files are written atomically and recorded in a manifest with the hash of their mp3s, see midi_manifest, so
+    that re-runs only transcribe new or changed mp3s. If verify is True, midi files are checked by their hashes and
+    chunk structures instead of transcribed, and corrupt midi files are removed to be transcribed by the next run.
+
+    If batch_size > 1, 10 s segments of consecutive mp3s are transcribed in batches of batch_size segments by
+    BatchTranscriber, see transcription_engine, instead of one segment at a time by PianoTranscription.transcribe.
+
+    Seconds of decoding, inference, post-processing and midi writing of each mp3 are written to
+    workspace/_tmp/metrics if workspace is not None, see stage_metrics."""
+    if verify:
+        verify_midis(midis_dir, begin_index, end_index)
+        return
+
+    import piano_transcription_inference
+    import torch
+
+    from .audio_decoder import AudioCache, decode_audio_timed
+
     # Arguments & parameters
     device = 'cuda' if torch.cuda.is_available() else 'cpu'
 
     # Paths
-    csv_path = os.path.join('./resources/full_music_pieces_youtube_similarity_pianosoloprob_split.csv')
+    csv_path = os.path.join(TRANSCRIPTION_CSV_PATH)
 
     os.makedirs(midis_dir, exist_ok=True)
 
     # Meta info
     meta_dict = read_csv_to_meta_dict(csv_path)
 
+    audio_cache = AudioCache(audio_cache_dir, int(audio_cache_size * 2**30)) if audio_cache_dir else None
+    manifest = MidiManifest(midis_dir, f'{begin_index}_{end_index}')
+
     # Transcriptor
     transcriptor = piano_transcription_inference.PianoTranscription(device=device)
 
+    metrics = MetricsWriter(
+        os.path.join(get_metrics_dir(workspace), f'transcribe_{begin_index}_{end_index}.jsonl') if workspace else None
+    )
+
     count = 0
+    skipped_count = 0
     transcribe_time = time.time()
     audios_num = len(meta_dict['surname'])
 
-    for n in range(begin_index, min(end_index, audios_num)):
-        if meta_dict['giant_midi_piano'][n] and int(meta_dict['giant_midi_piano'][n]) == 1:
-            count += 1
+    # audio_name -> (mp3_hash, audio_duration, decode_time) of mp3s to transcribe
+    pending = {}
 
-            mp3_path = os.path.join(mp3s_dir, f"{meta_dict['audio_name'][n]}.mp3")
-            print(n, mp3_path)
-            midi_path = os.path.join(midis_dir, f"{meta_dict['audio_name'][n]}.mid")
+    def _iterate_audios():
+        nonlocal count, skipped_count
 
-            (audio, _) = piano_transcription_inference.load_audio(
-                mp3_path, sr=piano_transcription_inference.sample_rate, mono=True
-            )
+        for n in range(begin_index, min(end_index, audios_num)):
+            if meta_dict['giant_midi_piano'][n] and int(meta_dict['giant_midi_piano'][n]) == 1:
+                audio_name = meta_dict['audio_name'][n]
+                mp3_path = os.path.join(mp3s_dir, f'{audio_name}.mp3')
+                midi_path = os.path.join(midis_dir, f'{audio_name}.mid')
+                mp3_hash = hash_file(mp3_path)
+
+                if manifest.is_done(audio_name, mp3_hash, midi_path):
+                    skipped_count += 1
+                    continue
+
+                count += 1
+                print(n, mp3_path)
+
+                (audio, decode_time) = decode_audio_timed(
+                    mp3_path, piano_transcription_inference.sample_rate, decoder, cache=audio_cache
+                )
+                print(f'Decode time: {decode_time:.3f} s')
 
-            try:
-                # Transcribe
-                transcriptor.transcribe(audio, midi_path)
-            except:
-                print('Failed for this audio!')
+                pending[audio_name] = (mp3_hash, len(audio) / piano_transcription_inference.sample_rate, decode_time)
+                yield audio_name, audio
 
+    def _iterate_transcribed():
+        """Yield the name, transcribed_dict and inference and post-processing seconds of each mp3."""
+        if batch_size > 1:
+            engine = BatchTranscriber(transcriptor, batch_size)
+            yield from engine.transcribe_files(_iterate_audios())
+
+        else:
+            for audio_name, audio in _iterate_audios():
+                bgn_time = time.time()
+
+                try:
+                    # Transcribe, the inference time includes post-processing
+                    transcribed_dict = transcriptor.transcribe(audio, None)
+                except Exception:  # noqa: BLE001
+                    transcribed_dict = None
+
+                times = {'inference_time': time.time() - bgn_time, 'postprocess_time': None}
+                yield audio_name, transcribed_dict, times
+
+    for audio_name, transcribed_dict, times in _iterate_transcribed():
+        midi_path = os.path.join(midis_dir, f'{audio_name}.mid')
+        (mp3_hash, audio_duration, decode_time) = pending.pop(audio_name)
+
+        if transcribed_dict is None:
+            print('Failed for this audio!')
+            continue
+
+        bgn_time = time.time()
+
+        try:
+            write_atomic(lambda path: write_midi(transcribed_dict, path), midi_path)  # noqa: B023
+        except Exception:  # noqa: BLE001
+            print('Failed for this audio!')
+            continue
+
+        write_time = time.time() - bgn_time
+        manifest.add(audio_name, mp3_hash, midi_path)
+        metrics.write(
+            'transcribe', audio_name, audio_duration, decode_time=decode_time, write_time=write_time, **times
+        )
+
+    print(f'Transcribed: {count}, skipped existing midi files: {skipped_count}')
     print(f'Time: {time.time() - transcribe_time:.3f} s')
+
+
+def verify_midis(midis_dir: str, begin_index: int, end_index: int):
+    """Verify the midi files of GiantMIDI-Piano mp3s in [begin_index, end_index) of the split csv by their hashes in
+    the manifest and their chunk structures, without transcribing. Corrupt midi files are removed, so that the next
+    run of transcribe_piano transcribes them again."""
+    meta_table = read_meta_table(TRANSCRIPTION_CSV_PATH)
+    end_index = min(end_index, len(meta_table)) if end_index else len(meta_table)
+    indexes = np.flatnonzero(meta_table.flag('giant_midi_piano')[begin_index:end_index]) + begin_index
+
+    manifest = MidiManifest(midis_dir, f'verify_{begin_index}_{end_index}')
+    missing_num = 0
+    corrupt_num = 0
+
+    for n in indexes:
+        audio_name = meta_table['audio_name'][n]
+        midi_path = os.path.join(midis_dir, f'{audio_name}.mid')
+        error = manifest.verify(audio_name, midi_path)
+
+        if error == 'missing':
+            missing_num += 1
+        elif error is not None:
+            corrupt_num += 1
+            print(f'Corrupt {midi_path}: {error}, removed.')
+            os.remove(midi_path)
+
+    print(f'Verified: {len(indexes)}, missing: {missing_num}, corrupt: {corrupt_num}')
+
+
+def create_transcription_queue(
+    queue_path: str,
+    csv_path: str = TRANSCRIPTION_CSV_PATH,
+):
+    """Add a transcription job of each GiantMIDI-Piano mp3 of the split csv to a work queue. Jobs are weighted by
+    audio durations, so that the longest mp3s are transcribed first. Jobs already in the queue are kept."""
+    meta_table = read_meta_table(csv_path)
+    indexes = np.flatnonzero(meta_table.flag('giant_midi_piano'))
+    durations = np.nan_to_num(np.asarray(meta_table['audio_duration'][indexes], dtype=np.float64))
+
+    queue = WorkQueue(queue_path)
+    added_num = queue.add_jobs(
+        (meta_table['audio_name'][n], {'index': int(n), 'audio_name': meta_table['audio_name'][n]}, duration)
+        for n, duration in zip(indexes, durations)
+    )
+
+    print(f'Add {added_num} out of {len(indexes)} jobs, {np.sum(durations) / 3600:.1f} hours of audio.')
+    print(f'Jobs: {queue.counts()}')
+
+
+def _transcription_worker(  # noqa: PLR0913
+    queue_path, mp3s_dir, midis_dir, decoder, audio_cache, lease_seconds, max_attempts, metrics_dir, cpus
+):
+    """Transcribe jobs of a work queue until the queue is empty, with torch threads pinned to cpus."""
+    import piano_transcription_inference
+    import torch
+
+    from .audio_decoder import decode_audio_timed
+
+    pin_process(cpus)
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+    queue = WorkQueue(queue_path, lease_seconds, max_attempts)
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    manifest = MidiManifest(midis_dir, f'{socket.gethostname()}_{os.getpid()}')
+    metrics = MetricsWriter(
+        os.path.join(metrics_dir, f'transcribe_{socket.gethostname()}_{os.getpid()}.jsonl') if metrics_dir else None
+    )
+    transcriptor = piano_transcription_inference.PianoTranscription(device=device)
+
+    while True:
+        job = queue.acquire(owner)
+
+        if job is None:
+            break
+
+        audio_name = job.payload['audio_name']
+        mp3_path = os.path.join(mp3s_dir, f'{audio_name}.mp3')
+        midi_path = os.path.join(midis_dir, f'{audio_name}.mid')
+        print(owner, job.payload['index'], mp3_path)
+
+        try:
+            with queue.keep_alive(job, owner):
+                mp3_hash = hash_file(mp3_path)
+
+                if not manifest.is_done(audio_name, mp3_hash, midi_path):
+                    (audio, decode_time) = decode_audio_timed(
+                        mp3_path, piano_transcription_inference.sample_rate, decoder, cache=audio_cache
+                    )
+                    print(f'Decode time: {decode_time:.3f} s')
+
+                    bgn_time = time.time()
+                    transcribed_dict = transcriptor.transcribe(audio, None)
+                    inference_time = time.time() - bgn_time
+
+                    write_atomic(lambda path: write_midi(transcribed_dict, path), midi_path)  # noqa: B023
+                    write_time = time.time() - bgn_time - inference_time
+
+                    manifest.add(audio_name, mp3_hash, midi_path)
+                    metrics.write(
+                        'transcribe',
+                        audio_name,
+                        len(audio) / piano_transcription_inference.sample_rate,
+                        decode_time=decode_time,
+                        inference_time=inference_time,
+                        postprocess_time=None,
+                        write_time=write_time,
+                    )
+
+        except Exception as e:  # noqa: BLE001
+            print(f'Failed for {mp3_path}, attempt {job.attempts}: {e}')
+            queue.fail(job, owner, e)
+            continue
+
+        queue.complete(job, owner)
+
+
+def transcribe_piano_queue(  # noqa: PLR0913
+    queue_path: str,
+    mp3s_dir: str,
+    midis_dir: str,
+    workers: int = 1,
+    decoder: str = 'audioread',
+    audio_cache_dir: str = None,
+    audio_cache_size: float = 50,
+    lease_seconds: float = 1800,
+    max_attempts: int = 3,
+    workspace: str = None,
+):
+    """Transcribe the jobs of a work queue created by create_transcription_queue with `workers` processes, which lease
+    jobs until the queue is empty, so that no worker waits for a shard of other workers. Commands on other GPUs of the
+    same machine can work on the same queue.
+
+    Args:
+      queue_path: str
+      mp3s_dir: str
+      midis_dir: str
+      workers: int, number of worker processes, each pinned to its own cores, see cpu_planner. 0 picks the number
+        by a calibration run on CPU, and uses 1 worker on GPU.
+      decoder: str, see transcribe_piano.
+      audio_cache_dir: str | None, see transcribe_piano.
+      audio_cache_size: float, see transcribe_piano.
+      lease_seconds: float, a job of a worker which is killed is transcribed again after its lease expires.
+      max_attempts: int, a job which fails max_attempts times is marked as failed.
+      workspace: str | None, per-file metrics are written to workspace/_tmp/metrics if it is not None, see
+        stage_metrics.
+    """
+    import torch
+
+    from .audio_decoder import AudioCache
+
+    os.makedirs(midis_dir, exist_ok=True)
+
+    audio_cache = AudioCache(audio_cache_dir, int(audio_cache_size * 2**30)) if audio_cache_dir else None
+    queue = WorkQueue(queue_path)
+
+    if workers == 0 and torch.cuda.is_available():
+        workers = 1
+
+    elif workers == 0:
+        (workers, speeds) = calibrate_instances()
+        (pending_num, pending_seconds) = queue.counts().get(PENDING, (0, 0.0))
+
+        if pending_num and pending_seconds:
+            pieces_per_hour = speeds[workers] * 3600 / (pending_seconds / pending_num)
+            print(f'Estimated: {pieces_per_hour:.1f} pieces/hour with {workers} workers')
+
+    plan = plan_cpus(workers)
+    metrics_dir = get_metrics_dir(workspace) if workspace else None
+    args = (queue_path, mp3s_dir, midis_dir, decoder, audio_cache, lease_seconds, max_attempts, metrics_dir)
+    done_num = queue.counts().get(DONE, (0, 0.0))[0]
+    transcribe_time = time.time()
+
+    if len(plan) == 1:
+        _transcription_worker(*args, plan[0])
+    else:
+        mp_context = multiprocessing.get_context('spawn')
+        processes = [mp_context.Process(target=_transcription_worker, args=(*args, cpus)) for cpus in plan]
+
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+
+    elapsed = time.time() - transcribe_time
+    counts = queue.counts()
+    finished_num = counts.get(DONE, (0, 0.0))[0] - done_num
+
+    print(f'Time: {elapsed:.3f} s, {finished_num * 3600 / elapsed:.1f} pieces/hour with {len(plan)} workers')
+    print(f'Jobs: {counts}')
@@ -5,7 +5,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
-from .dataset import read_csv_to_meta_dict
+from .dataset import read_csv_to_meta_dict, read_meta_table
 from .utilities import TargetProcessor, read_midi
 
 note_names = [
@@ -151,26 +151,13 @@ def meta_info(
     os.makedirs(os.path.dirname(statistics_path), exist_ok=True)
 
     # Read csv file
-    meta_dict = read_csv_to_meta_dict(csv_path)
-
-    audios_num = len(meta_dict['audio_name'])
-
-    solo_piano_works_indexes = []
+    meta_table = read_meta_table(csv_path)
 
-    for n in range(audios_num):
-        if meta_dict['audio_name'][n] != '' and int(meta_dict['giant_midi_piano'][n]):
-            if surname_in_youtube_title:
-                if int(meta_dict['surname_in_youtube_title'][n]) == 1:
-                    solo_piano_works_indexes.append(n)
-            else:
-                solo_piano_works_indexes.append(n)
+    solo_piano_works_indexes = np.flatnonzero(meta_table.piano_solo_mask(surname_in_youtube_title))
 
     print(f'Music pieces num: {len(solo_piano_works_indexes)}')
 
-    solo_piano_composer_names = []
-
-    for index in solo_piano_works_indexes:
-        solo_piano_composer_names.append('{}, {}'.format(meta_dict['surname'][index], meta_dict['firstname'][index]))
+    solo_piano_composer_names = meta_table.composer_names(solo_piano_works_indexes)
 
     unique_solo_piano_composer_names = np.array(list(set(solo_piano_composer_names)))
     print(f'Composers num: {len(unique_solo_piano_composer_names)}')
@@ -178,9 +165,8 @@ def meta_info(
     # Durations of solo piano works.
     durations_dict = {composer: 0 for composer in unique_solo_piano_composer_names}
 
-    for index in solo_piano_works_indexes:
-        composer = '{}, {}'.format(meta_dict['surname'][index], meta_dict['firstname'][index])
-        durations_dict[composer] += float(meta_dict['audio_duration'][index])
+    for composer, duration in zip(solo_piano_composer_names, meta_table['audio_duration'][solo_piano_works_indexes]):
+        durations_dict[composer] += float(duration)
 
     return durations_dict
 
@@ -237,43 +223,28 @@ def plot_composer_works_num(
     os.makedirs(os.path.dirname(fig_path), exist_ok=True)
 
     # Read csv file.
-    meta_dict = read_csv_to_meta_dict(csv_path)
-
-    for key in meta_dict.keys():
-        meta_dict[key] = np.array(meta_dict[key])
-
-    complete_works_indexes = []
-    solo_piano_works_indexes = []
+    meta_table = read_meta_table(csv_path)
 
-    for n in range(len(meta_dict['youtube_title'])):
-        if meta_dict['audio_name'][n] == '':
-            flag = False
-        elif surname_in_youtube_title and int(meta_dict['surname_in_youtube_title'][n]) == 0:
-            flag = False
-        else:
-            flag = True
+    complete_works_mask = ~meta_table.is_missing('audio_name')
 
-        if flag:
-            complete_works_indexes.append(n)
+    if surname_in_youtube_title:
+        complete_works_mask &= meta_table.flag('surname_in_youtube_title')
 
-            if int(meta_dict['giant_midi_piano'][n]) == 1:
-                solo_piano_works_indexes.append(n)
+    complete_works_indexes = np.flatnonzero(complete_works_mask)
+    solo_piano_works_indexes = np.flatnonzero(complete_works_mask & meta_table.flag('giant_midi_piano'))
 
     # Get solo piano composer names.
-    solo_piano_composer_names = []
-
-    for idx in solo_piano_works_indexes:
-        solo_piano_composer_names.append('{}, {}'.format(meta_dict['surname'][idx], meta_dict['firstname'][idx]))
+    solo_piano_composer_names = meta_table.composer_names(solo_piano_works_indexes)
 
     unique_solo_piano_composer_names = sorted(list(set(solo_piano_composer_names)))
 
     # Get composer works number.
     composer_complete_works_nums, _ = _get_composer_works_num(
-        meta_dict, complete_works_indexes, unique_solo_piano_composer_names
+        meta_table, complete_works_indexes, unique_solo_piano_composer_names
     )
 
     composer_solo_piano_works_nums, sorted_indexes = _get_composer_works_num(
-        meta_dict, solo_piano_works_indexes, unique_solo_piano_composer_names
+        meta_table, solo_piano_works_indexes, unique_solo_piano_composer_names
     )
 
     # Plot
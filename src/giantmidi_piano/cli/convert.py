@@ -1,20 +1,61 @@
 import typer
 
-from giantmidi_piano import audios_to_midis
-
 app = typer.Typer(
     name='convert',
 )
 
+_decoder_help = "Mp3 decoder, 'librosa', 'audioread', 'soundfile' or 'ffmpeg'."
+_audio_cache_dir_option = typer.Option(None, help='Directory of the decoded audio cache shared by both stages.')
+_audio_cache_size_option = typer.Option(50, help='Size cap of the decoded audio cache in GB.')
+
 
 @app.command()
-def calculate_piano_solo_prob(
+def calculate_piano_solo_prob(  # noqa: PLR0913
     workspace: str = typer.Option(..., help='Directory of your workspace.'),
     mp3s_dir: str = typer.Option(..., help='Directory of the downloaded YouTube mp3s.'),
     mini_data: bool = typer.Option(False, help='Use mini data or not.'),
+    front_end: str = typer.Option('numpy', help="Spectrogram front end, 'numpy' or 'torch' (on the model device)."),
+    channels_last: bool = typer.Option(False, help='Run the detector in the channels last memory format.'),
+    compile_mode: str = typer.Option('none', help="Compile the detector, 'none', 'torchscript' or 'compile'."),
+    precision: str = typer.Option('fp32', help="Detector precision, 'fp32', 'int8' (CPU only) or 'bf16'."),
+    sequential: bool = typer.Option(False, help='Stop predicting segments once the probability is clearly decided.'),
+    workers: int = typer.Option(0, help='Number of mp3 decoding processes, 0 uses all cores.'),
+    decoder: str = typer.Option('librosa', help=_decoder_help),
+    audio_cache_dir: str = _audio_cache_dir_option,
+    audio_cache_size: float = _audio_cache_size_option,
+    begin_index: int = typer.Option(0, help='Beginning index of the shard.'),
+    end_index: int = typer.Option(0, help='Ending index (exclusive) of the shard, 0 predicts to the end.'),
 ):
     """Calculate the piano solo probability of all downloaded mp3s, and append the probability to the meta csv file."""
-    audios_to_midis.calculate_piano_solo_prob(workspace, mp3s_dir, mini_data)
+    from giantmidi_piano import audios_to_midis
+
+    audios_to_midis.calculate_piano_solo_prob(
+        workspace,
+        mp3s_dir,
+        mini_data,
+        front_end,
+        channels_last,
+        compile_mode,
+        precision,
+        sequential,
+        workers,
+        decoder,
+        audio_cache_dir,
+        audio_cache_size,
+        begin_index,
+        end_index,
+    )
+
+
+@app.command()
+def merge_piano_solo_prob(
+    workspace: str = typer.Option(..., help='Directory of your workspace.'),
+    mini_data: bool = typer.Option(False, help='Use mini data or not.'),
+):
+    """Merge the journals of piano solo probability shards to the meta csv."""
+    from giantmidi_piano import audios_to_midis
+
+    audios_to_midis.merge_piano_solo_prob(workspace, mini_data)
 
 
 @app.command()
@@ -25,6 +66,11 @@ def transcribe_piano(  # noqa: PLR0913
     begin_index: int = typer.Option(None, help='Beginning index of mp3s to transcribe.'),
     end_index: int = typer.Option(None, help='Ending index (exclusive) of mp3s to transcribe.'),
     mini_data: bool = typer.Option(False, help='Use mini data or not.'),
+    decoder: str = typer.Option('audioread', help=_decoder_help),
+    audio_cache_dir: str = _audio_cache_dir_option,
+    audio_cache_size: float = _audio_cache_size_option,
+    verify: bool = typer.Option(False, help='Verify midi files instead of transcribing, remove corrupt ones.'),
+    batch_size: int = typer.Option(1, help='Segments per forward, batched across mp3s if larger than 1.'),
 ):
     """Transcribe piano solo mp3s to midi files.
 
@@ -35,5 +81,64 @@ def transcribe_piano(  # noqa: PLR0913
         begin_index (int): Beginning index of mp3s to transcribe.
         end_index (int): Ending index (exclusive) of mp3s to transcribe.
         mini_data (bool): Use mini data or not.
+        decoder (str): Mp3 decoder, 'librosa', 'audioread', 'soundfile' or 'ffmpeg'.
+        audio_cache_dir (str): Directory of the decoded audio cache shared by both stages.
+        audio_cache_size (float): Size cap of the decoded audio cache in GB.
+        verify (bool): Verify existing midi files by their hashes and chunk structures instead of transcribing.
+        batch_size (int): Number of 10 s segments per forward, batched across mp3s if larger than 1.
     """
-    audios_to_midis.transcribe_piano(workspace, mp3s_dir, midis_dir, begin_index, end_index, mini_data)
+    from giantmidi_piano import audios_to_midis
+
+    audios_to_midis.transcribe_piano(
+        workspace,
+        mp3s_dir,
+        midis_dir,
+        begin_index,
+        end_index,
+        mini_data,
+        decoder,
+        audio_cache_dir,
+        audio_cache_size,
+        verify,
+        batch_size,
+    )
+
+
+@app.command()
+def create_transcription_queue(
+    queue_path: str = typer.Option(..., help='Path of the SQLite work queue, created if it does not exist.'),
+):
+    """Add a duration-weighted transcription job of each GiantMIDI-Piano mp3 of the split csv to a work queue."""
+    from giantmidi_piano import audios_to_midis
+
+    audios_to_midis.create_transcription_queue(queue_path)
+
+
+@app.command()
+def transcribe_piano_queue(  # noqa: PLR0913
+    queue_path: str = typer.Option(..., help='Path of the SQLite work queue created by create-transcription-queue.'),
+    mp3s_dir: str = typer.Option(..., help='Directory of the downloaded YouTube mp3s.'),
+    midis_dir: str = typer.Option(..., help='Directory to save the transcribed midi files.'),
+    workers: int = typer.Option(1, help='Number of worker processes pinned to their own cores, 0 calibrates it.'),
+    decoder: str = typer.Option('audioread', help=_decoder_help),
+    audio_cache_dir: str = _audio_cache_dir_option,
+    audio_cache_size: float = _audio_cache_size_option,
+    lease_seconds: float = typer.Option(1800, help='Seconds after which a job of a killed worker is leased again.'),
+    max_attempts: int = typer.Option(3, help='Attempts of a job before it is marked as failed.'),
+    workspace: str = typer.Option(None, help='Directory of your workspace, to write per-file metrics to.'),
+):
+    """Transcribe the jobs of a work queue until the queue is empty."""
+    from giantmidi_piano import audios_to_midis
+
+    audios_to_midis.transcribe_piano_queue(
+        queue_path,
+        mp3s_dir,
+        midis_dir,
+        workers,
+        decoder,
+        audio_cache_dir,
+        audio_cache_size,
+        lease_seconds,
+        max_attempts,
+        workspace,
+    )
@@ -1,59 +1,128 @@
 import typer
 
-from giantmidi_piano import dataset
-
 app = typer.Typer(name='download')
 
 _workspace_option = typer.Option(None, '--workspace', '-w', help='Working directory')
+_concurrency_option = typer.Option(16, help='Number of html requests in flight.')
+_fetch_workers_option = typer.Option(4, help='Number of concurrent youtube-dl processes.')
+_transcode_workers_option = typer.Option(2, help='Number of concurrent ffmpeg processes.')
+_requests_per_second_option = typer.Option(
+    0, help='Initial requests per second to YouTube, adapted after HTTP 429. 0 is unlimited.'
+)
+_downloader_option = typer.Option('youtube-dl', help='youtube-dl compatible executable, e.g., a local stub for tests.')
 
 
 @app.command()
 def download_imslp_htmls(
     workspace: str = _workspace_option,
+    concurrency: int = _concurrency_option,
 ):
     """Download IMSLP htmls."""
-    dataset.download_imslp_htmls(workspace)
+    from giantmidi_piano import dataset
+
+    dataset.download_imslp_htmls(workspace, concurrency)
 
 
 @app.command()
 def download_wikipedia_htmls(
     workspace: str = _workspace_option,
+    concurrency: int = _concurrency_option,
 ):
     """Download Wikipedia htmls."""
-    dataset.download_wikipedia_htmls(workspace)
+    from giantmidi_piano import dataset
+
+    dataset.download_wikipedia_htmls(workspace, concurrency)
 
 
 @app.command()
 def create_meta_csv(
     workspace: str = _workspace_option,
+    workers: int = typer.Option(0, help='Number of parsing processes, 0 uses all cores.'),
+    backend: str = typer.Option('fast', help="Html parsing backend, 'fast' or 'html.parser'."),
 ):
     """Create meta csv."""
-    dataset.create_meta_csv(workspace)
+    from giantmidi_piano import dataset
+
+    dataset.create_meta_csv(workspace, workers, backend)
 
 
 @app.command()
-def search_youtube(workspace: str = _workspace_option, mini_data: bool = False):
+def search_youtube(
+    workspace: str = _workspace_option,
+    mini_data: bool = False,
+    requests_per_second: float = _requests_per_second_option,
+    begin_index: int = 0,
+    end_index: int = typer.Option(0, help='Ending index (exclusive) of the shard, 0 searches to the end.'),
+):
     """Search YouTube."""
-    dataset.search_youtube(workspace, mini_data)
+    from giantmidi_piano import dataset
+
+    dataset.search_youtube(workspace, mini_data, requests_per_second, begin_index, end_index)
+
+
+@app.command()
+def merge_search_youtube(workspace: str = _workspace_option, mini_data: bool = False):
+    """Merge the journals of search YouTube shards to the meta csv."""
+    from giantmidi_piano import dataset
+
+    dataset.merge_search_youtube(workspace, mini_data)
 
 
 @app.command()
 def calculate_similarity(workspace: str = _workspace_option, mini_data: bool = False):
     """Calculate similarity."""
+    from giantmidi_piano import dataset
+
     dataset.calculate_similarity(workspace, mini_data)
 
 
 @app.command()
-def download_youtube(
-    workspace: str = _workspace_option, begin_index: int = 0, end_index: int = 0, mini_data: bool = False
+def download_youtube(  # noqa: PLR0913
+    workspace: str = _workspace_option,
+    begin_index: int = 0,
+    end_index: int = 0,
+    mini_data: bool = False,
+    fetch_workers: int = _fetch_workers_option,
+    transcode_workers: int = _transcode_workers_option,
+    requests_per_second: float = _requests_per_second_option,
+    downloader: str = _downloader_option,
 ):
     """Download YouTube."""
-    dataset.download_youtube(workspace, begin_index, end_index, mini_data)
+    from giantmidi_piano import dataset
+
+    dataset.download_youtube(
+        workspace,
+        begin_index,
+        end_index,
+        mini_data,
+        fetch_workers,
+        transcode_workers,
+        requests_per_second,
+        downloader,
+    )
 
 
 @app.command()
-def download_youtube_piano_solo(
-    workspace: str = _workspace_option, begin_index: int = 0, end_index: int = 0, mini_data: bool = False
+def download_youtube_piano_solo(  # noqa: PLR0913
+    workspace: str = _workspace_option,
+    begin_index: int = 0,
+    end_index: int = 0,
+    mini_data: bool = False,
+    fetch_workers: int = _fetch_workers_option,
+    transcode_workers: int = _transcode_workers_option,
+    requests_per_second: float = _requests_per_second_option,
+    downloader: str = _downloader_option,
 ):
     """Download YouTube piano solo."""
-    dataset.download_youtube_piano_solo(workspace, begin_index, end_index, mini_data)
+    from giantmidi_piano import dataset
+
+    dataset.download_youtube_piano_solo(
+        workspace,
+        begin_index,
+        end_index,
+        mini_data,
+        fetch_workers,
+        transcode_workers,
+        requests_per_second,
+        downloader,
+    )
@@ -1,6 +1,6 @@
-import typer
+from typing import List
 
-from giantmidi_piano import evaluate_meta
+import typer
 
 app = typer.Typer(name='meta')
 
@@ -12,6 +12,8 @@ def create_subset200_eval_csv(
     workspace: str = _workspace_option,
 ):
     """Create subset of 200 evaluation csv."""
+    from giantmidi_piano import evaluate_meta
+
     evaluate_meta.create_subset200_eval_csv(workspace)
 
 
@@ -21,14 +23,42 @@ def plot_piano_solo_p_r_f1(
     surname_in_youtube_title: bool = typer.Option(False, help='Whether to check surname in youtube title.'),
 ):
     """Plot precision, recall, F1 score for piano solo."""
+    from giantmidi_piano import evaluate_meta
+
     evaluate_meta.plot_piano_solo_p_r_f1(subset200_eval_with_labels_path, surname_in_youtube_title)
 
 
+@app.command()
+def piano_solo_precision_drift(
+    subset200_eval_with_labels_path: str,
+    mp3s_dir: str = typer.Option(..., help='Directory of the downloaded YouTube mp3s.'),
+    precisions: List[str] = typer.Option(['int8', 'bf16'], help="Precisions compared with fp32, 'int8' or 'bf16'."),
+    channels_last: bool = typer.Option(False, help='Run all detectors in the channels last memory format.'),
+):
+    """Compare reduced precision piano solo detectors with the fp32 detector on the labelled subset."""
+    from giantmidi_piano import evaluate_meta
+
+    evaluate_meta.piano_solo_precision_drift(subset200_eval_with_labels_path, mp3s_dir, precisions, channels_last)
+
+
+@app.command()
+def piano_solo_sequential_agreement(
+    subset200_eval_with_labels_path: str,
+    mp3s_dir: str = typer.Option(..., help='Directory of the downloaded YouTube mp3s.'),
+):
+    """Compare sequential piano solo probabilities with probabilities of all segments on the labelled subset."""
+    from giantmidi_piano import evaluate_meta
+
+    evaluate_meta.piano_solo_sequential_agreement(subset200_eval_with_labels_path, mp3s_dir)
+
+
 @app.command()
 def create_subset200_piano_solo_eval_csv(
     workspace: str = _workspace_option,
 ):
     """Create subset of 200 piano solo evaluation csv."""
+    from giantmidi_piano import evaluate_meta
+
     evaluate_meta.create_subset200_piano_solo_eval_csv(workspace)
 
 
@@ -38,6 +68,8 @@ def piano_solo_meta_accuracy(
     surname_in_youtube_title: bool = typer.Option(False, help='Whether to check surname in youtube title.'),
 ):
     """Calculate piano solo meta accuracy."""
+    from giantmidi_piano import evaluate_meta
+
     evaluate_meta.piano_solo_meta_accuracy(subset200_piano_solo_eval_with_labels_path, surname_in_youtube_title)
 
 
@@ -47,6 +79,8 @@ def piano_solo_performed_ratio(
     surname_in_youtube_title: bool = typer.Option(False, help='Whether to check surname in youtube title.'),
 ):
     """Calculate piano solo performance ratio."""
+    from giantmidi_piano import evaluate_meta
+
     evaluate_meta.piano_solo_performed_ratio(subset200_piano_solo_eval_with_labels_path, surname_in_youtube_title)
 
 
@@ -58,4 +92,6 @@ def individual_composer_piano_solo_meta_accuracy(
     surname_in_youtube_title: bool = typer.Option(False, help='Whether to check surname in youtube title.'),
 ):
     """Calculate individual composer piano solo meta accuracy."""
+    from giantmidi_piano import evaluate_meta
+
     evaluate_meta.individual_composer_piano_solo_meta_accuracy(workspace, surname, firstname, surname_in_youtube_title)
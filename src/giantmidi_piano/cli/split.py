@@ -1,7 +1,5 @@
 import typer
 
-from giantmidi_piano import create_split
-
 app = typer.Typer(name='split')
 
 
@@ -10,6 +8,8 @@ def create_piano_split(
     workspace: str = typer.Option(..., help='Directory of your workspace.'),
 ):
     """Create piano split."""
+    from giantmidi_piano import create_split
+
     create_split.create_piano_split(workspace)
 
 
@@ -18,4 +18,6 @@ def create_surname_checked_subset(
     workspace: str = typer.Option(..., help='Directory of your workspace.'),
 ):
     """Create surname checked subset."""
+    from giantmidi_piano import create_split
+
     create_split.create_surname_checked_subset(workspace)
@@ -1,7 +1,5 @@
 import typer
 
-from giantmidi_piano import calculate_statistics
-
 app = typer.Typer(name='stats')
 
 
@@ -11,6 +9,8 @@ def meta_info(
     surname_in_youtube_title: bool = False,
 ):
     """Get meta info."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.meta_info(workspace, surname_in_youtube_title)
 
 
@@ -20,6 +20,8 @@ def plot_composer_works_num(
     surname_in_youtube_title: bool = False,
 ):
     """Plot composer works num."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_composer_works_num(workspace, surname_in_youtube_title)
 
 
@@ -29,6 +31,8 @@ def plot_composer_durations(
     surname_in_youtube_title: bool = False,
 ):
     """Plot composer durations."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_composer_durations(workspace, surname_in_youtube_title)
 
 
@@ -37,6 +41,8 @@ def plot_nationalities(
     workspace: str,
 ):
     """Plot nationalities."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_nationalities(workspace)
 
 
@@ -45,6 +51,8 @@ def calculate_music_events_from_midi(
     workspace: str,
 ):
     """Calculate music events from midi."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.calculate_music_events_from_midi(workspace)
 
 
@@ -54,6 +62,8 @@ def plot_note_histogram(
     surname_in_youtube_title: bool = False,
 ):
     """Plot note histogram."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_note_histogram(workspace, surname_in_youtube_title)
 
 
@@ -63,6 +73,8 @@ def plot_mean_std_notes(
     surname_in_youtube_title: bool = False,
 ):
     """Plot mean std notes."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_mean_std_notes(workspace, surname_in_youtube_title)
 
 
@@ -72,6 +84,8 @@ def plot_notes_per_second_mean_std(
     surname_in_youtube_title: bool = False,
 ):
     """Plot notes per second mean std."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_notes_per_second_mean_std(workspace, surname_in_youtube_title)
 
 
@@ -89,6 +103,8 @@ def plot_selected_composers_note_histogram(
     surname_in_youtube_title: bool = False,
 ):
     """Plot selected composers note histogram."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_selected_composers_note_histogram(workspace, surname_in_youtube_title)
 
 
@@ -98,6 +114,8 @@ def plot_selected_composers_chroma(
     surname_in_youtube_title: bool = False,
 ):
     """Plot selected composers chroma."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_selected_composers_chroma(workspace, surname_in_youtube_title)
 
 
@@ -107,6 +125,8 @@ def plot_selected_composers_intervals(
     surname_in_youtube_title: bool = False,
 ):
     """Plot selected composers intervals."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_selected_composers_intervals(workspace, surname_in_youtube_title)
 
 
@@ -117,6 +137,8 @@ def plot_selected_composers_chords(
     surname_in_youtube_title: bool = False,
 ):
     """Plot selected composers chords."""
+    from giantmidi_piano import calculate_statistics
+
     calculate_statistics.plot_selected_composers_chords(workspace, n_chords, surname_in_youtube_title)
 
 
@@ -126,3 +148,16 @@ def note_intervals(
 ):
     """Note intervals."""
     raise NotImplementedError
+
+
+@app.command()
+def stage_metrics(
+    workspace: str,
+    stage: str = None,
+    slowest_num: int = 10,
+):
+    """Summarize per-file stage metrics of piano solo detection and transcription: percentiles and slowest files."""
+    # Aliased, the module would shadow this command
+    from giantmidi_piano import stage_metrics as metrics_module
+
+    metrics_module.summarize_metrics(workspace, stage, slowest_num)
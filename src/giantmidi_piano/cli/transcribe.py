@@ -1,7 +1,5 @@
 import typer
 
-from giantmidi_piano import evaluate_transcribed_midis
-
 app = typer.Typer(name='transcribe')
 
 
@@ -13,6 +11,8 @@ def align(
     ),
 ):
     """Align groundtruth csv with transcribed midis."""
+    from giantmidi_piano import evaluate_transcribed_midis
+
     evaluate_transcribed_midis.align()
 
 
@@ -21,4 +21,6 @@ def plot_box_plot(
     fig_path: str = typer.Argument('results/transcribed_metrics_box_plot.pdf', help='figure path to save'),
 ):
     """Plot box plot of aligned results."""
+    from giantmidi_piano import evaluate_transcribed_midis
+
     evaluate_transcribed_midis.plot_box_plot()
@@ -0,0 +1,235 @@
+"""CPU execution planner of transcription. One model instance with all cores scales poorly, so N instances run with
+disjoint sets of cores, each set within one NUMA node when possible, and torch threads pinned to the set. N is chosen
+by a short calibration run of each candidate N."""
+
+import glob
+import multiprocessing
+import os
+import queue
+import re
+import tempfile
+import time
+
+import numpy as np
+
+# Seconds of audio transcribed by each instance in a calibration run
+CALIBRATION_SECONDS = 30
+
+# Peak resident bytes of a PianoTranscription instance on cpu, which caps the number of instances
+INSTANCE_MEMORY_BYTES = 1536 * 1024 * 1024
+
+
+def _parse_cpulist(cpulist):
+    """Parse a cpu list of sysfs, e.g., '0-3,8-11' -> [0, 1, 2, 3, 8, 9, 10, 11]."""
+    cpus = []
+
+    for part in cpulist.strip().split(','):
+        if '-' in part:
+            (bgn, end) = part.split('-')
+            cpus.extend(range(int(bgn), int(end) + 1))
+        elif part:
+            cpus.append(int(part))
+
+    return cpus
+
+
+def get_usable_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+
+    return list(range(os.cpu_count()))
+
+
+def get_numa_cpus():
+    """Get the usable cpus of each NUMA node, or one group of all usable cpus if NUMA nodes are unknown.
+
+    Returns:
+      nodes: list of list of int
+    """
+    usable = get_usable_cpus()
+    nodes = []
+    paths = glob.glob('/sys/devices/system/node/node[0-9]*/cpulist')
+
+    for path in sorted(paths, key=lambda path: int(re.findall(r'node(\d+)', path)[-1])):
+        with open(path) as fr:
+            node_cpus = set(_parse_cpulist(fr.read()))
+
+        node = [cpu for cpu in usable if cpu in node_cpus]
+
+        if node:
+            nodes.append(node)
+
+    return nodes or [usable]
+
+
+def plan_cpus(instances_num, nodes=None):
+    """Split the usable cpus into disjoint sets of instances_num instances. Instances are spread over NUMA nodes in
+    proportion to their cpus, so that no instance spans two nodes, unless there are fewer instances than nodes.
+
+    Args:
+      instances_num: int, capped by the number of cpus.
+      nodes: list of list of int | None, see get_numa_cpus.
+
+    Returns:
+      plan: list of list of int, cpus of each instance.
+    """
+    nodes = nodes or get_numa_cpus()
+    cpus_num = sum(len(node) for node in nodes)
+    instances_num = max(1, min(instances_num, cpus_num))
+
+    if instances_num < len(nodes):
+        all_cpus = [cpu for node in nodes for cpu in node]
+        return [cpus.tolist() for cpus in np.array_split(all_cpus, instances_num)]
+
+    # At least one instance per node, the rest in proportion to the cpus of nodes
+    counts = [1] * len(nodes)
+
+    for _ in range(instances_num - len(nodes)):
+        n = max(
+            (n for n in range(len(nodes)) if counts[n] < len(nodes[n])), key=lambda n: len(nodes[n]) / counts[n]
+        )
+        counts[n] += 1
+
+    return [cpus.tolist() for node, count in zip(nodes, counts) for cpus in np.array_split(node, count)]
+
+
+def get_available_memory():
+    """Get the bytes of memory available to new processes, or None if unknown."""
+    try:
+        with open('/proc/meminfo') as fr:
+            for line in fr:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def pin_process(cpus):
+    """Pin the current process to cpus, and run torch with one intra-op thread per cpu and one inter-op thread."""
+    import torch
+
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+    torch.set_num_threads(len(cpus))
+
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:  # Inter-op threads can only be set before any parallel work
+        pass
+
+
+def _calibration_worker(cpus, audio_seconds, barrier, results):
+    import piano_transcription_inference
+
+    pin_process(cpus)
+
+    sample_rate = piano_transcription_inference.sample_rate
+    transcriptor = piano_transcription_inference.PianoTranscription(device='cpu')
+    audio = np.random.RandomState(1234).uniform(-0.1, 0.1, int(audio_seconds * sample_rate)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        midi_path = os.path.join(tmp_dir, 'calibration.mid')
+
+        # Warm up, then start all instances at once
+        transcriptor.transcribe(audio[: 10 * sample_rate], midi_path)
+        barrier.wait()
+
+        bgn_time = time.time()
+        transcriptor.transcribe(audio, midi_path)
+        results.put(time.time() - bgn_time)
+
+
+def get_candidates(cpus_num):
+    """Powers of two up to cpus_num, and cpus_num."""
+    return sorted({2**n for n in range(int(np.log2(cpus_num)) + 1)} | {cpus_num})
+
+
+def _get_results(processes, results, timeout):
+    """Get a result of each process.
+
+    Returns:
+      results: list | None, None if a process exits with an error or timeout seconds pass.
+    """
+    deadline = time.time() + timeout
+    values = []
+
+    while len(values) < len(processes):
+        try:
+            values.append(results.get(timeout=1))
+        except queue.Empty:
+            if time.time() > deadline or any(process.exitcode not in (None, 0) for process in processes):
+                return None
+
+    return values
+
+
+def calibrate_instances(candidates=None, audio_seconds=CALIBRATION_SECONDS, timeout=1800):
+    """Run each candidate number of instances on audio_seconds of audio per instance, and get the fastest one.
+    Candidates are capped by the available memory, see INSTANCE_MEMORY_BYTES, and the calibration stops at the first
+    candidate whose instances fail, e.g., are killed for lack of memory.
+
+    Args:
+      candidates: list of int | None, None for get_candidates of the usable cpus.
+      audio_seconds: float
+      timeout: float, seconds to wait for an instance.
+
+    Returns:
+      instances_num: int
+      speeds: dict, instances_num -> audio seconds transcribed per second.
+    """
+    nodes = get_numa_cpus()
+    candidates = candidates or get_candidates(sum(len(node) for node in nodes))
+    available = get_available_memory()
+
+    if available:
+        max_instances = max(1, available // INSTANCE_MEMORY_BYTES)
+        candidates = sorted({min(n, max_instances) for n in candidates})
+    mp_context = multiprocessing.get_context('spawn')
+    speeds = {}
+
+    for instances_num in candidates:
+        plan = plan_cpus(instances_num, nodes)
+
+        if len(plan) in speeds:
+            continue
+
+        barrier = mp_context.Barrier(len(plan), timeout=timeout)
+        results = mp_context.Queue()
+        processes = [
+            mp_context.Process(target=_calibration_worker, args=(cpus, audio_seconds, barrier, results))
+            for cpus in plan
+        ]
+
+        try:
+            for process in processes:
+                process.start()
+
+            elapsed = _get_results(processes, results, timeout)
+
+        finally:
+            for process in processes:
+                if process.pid is not None:
+                    if process.is_alive():
+                        process.terminate()
+                    process.join()
+
+        if elapsed is None:
+            print(f'Calibration of {len(plan)} instances failed')
+            break
+
+        speeds[len(plan)] = len(plan) * audio_seconds / max(elapsed)
+        threads = '/'.join(sorted({str(len(cpus)) for cpus in plan}))
+        print(f'Calibration, {len(plan)} instances x {threads} threads: {speeds[len(plan)]:.2f} audio s/s')
+
+    if not speeds:
+        raise RuntimeError('Calibration failed with one instance')
+
+    instances_num = max(speeds, key=speeds.get)
+
+    return instances_num, speeds
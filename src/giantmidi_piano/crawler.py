@@ -0,0 +1,219 @@
+"""Asynchronous html crawler. Pages are fetched through pooled keep-alive connections with a configurable concurrency,
+refreshed with conditional requests (ETag / If-Modified-Since), and written atomically."""
+
+import asyncio
+import gzip
+import http.client
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urljoin, urlsplit
+
+from .journal import Journal
+from .rate_limit import get_rate_limit_controller
+
+USER_AGENT = 'GiantMIDI-Piano crawler'
+MAX_REDIRECTS = 5
+SAFE_CHARS = "/%:@!$&'()*+,;=~-._"  # Non-ascii characters in urls, e.g., 'Dvořák', are percent-encoded
+
+
+class ConnectionPool:
+    def __init__(self, max_connections_per_host=16, timeout=60):
+        """Thread-safe pool of keep-alive http connections, one queue per (scheme, host).
+
+        Args:
+          max_connections_per_host: int, idle connections kept for each host.
+          timeout: float, socket timeout in seconds.
+        """
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.idle = {}
+
+    def _get(self, scheme, host):
+        with self.lock:
+            idle = self.idle.setdefault((scheme, host), queue.LifoQueue())
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            return connection_class(host, timeout=self.timeout)
+
+    def _put(self, scheme, host, connection):
+        idle = self.idle[(scheme, host)]
+        if idle.qsize() < self.max_connections_per_host:
+            idle.put(connection)
+        else:
+            connection.close()
+
+    def request(self, url, headers=None):
+        """Send a GET request and follow redirects.
+
+        Returns:
+          response: dict, {'url': str, 'status': int, 'headers': dict, 'body': bytes}
+        """
+        headers = dict(headers or {})
+        headers.setdefault('User-Agent', USER_AGENT)
+        headers.setdefault('Accept-Encoding', 'gzip')
+
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            path = quote(parts.path or '/', safe=SAFE_CHARS)
+            if parts.query:
+                path = f'{path}?{quote(parts.query, safe=SAFE_CHARS)}'
+
+            (status, response_headers, body) = self._request_once(parts.scheme, parts.netloc, path, headers)
+
+            if status in [301, 302, 303, 307, 308] and 'location' in response_headers:
+                url = urljoin(url, response_headers['location'])
+                continue
+
+            if response_headers.get('content-encoding') == 'gzip':
+                body = gzip.decompress(body)
+
+            return {'url': url, 'status': status, 'headers': response_headers, 'body': body}
+
+        raise http.client.HTTPException(f'Too many redirects: {url}')
+
+    def _request_once(self, scheme, host, path, headers):
+        # A pooled connection may have been closed by the server, so retry once with a new connection
+        for retry in range(2):
+            connection = self._get(scheme, host)
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.CannotSendRequest):
+                connection.close()
+                if retry == 1:
+                    raise
+                continue
+            except Exception:
+                connection.close()
+                raise
+
+            response_headers = {key.lower(): value for key, value in response.getheaders()}
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._put(scheme, host, connection)
+
+            return response.status, response_headers, body
+
+        raise AssertionError('unreachable')
+
+    def close(self):
+        with self.lock:
+            for idle in self.idle.values():
+                while not idle.empty():
+                    idle.get_nowait().close()
+
+
+def write_atomic(path, data):
+    """Write bytes to a temporary file in the same directory and rename it, so readers never see partial files."""
+    tmp_path = f'{path}.tmp{os.getpid()}_{threading.get_ident()}'
+    with open(tmp_path, 'wb') as fw:
+        fw.write(data)
+    os.replace(tmp_path, path)
+
+
+class AsyncCrawler:
+    def __init__(self, validators_path, concurrency=16, pool=None, rate_limiter=None):
+        """Crawl many pages concurrently.
+
+        Args:
+          validators_path: str, journal of the ETag and Last-Modified of downloaded pages.
+          concurrency: int, number of requests in flight.
+          pool: ConnectionPool
+          rate_limiter: RateLimitController shared by all network stages.
+        """
+        self.validators = Journal(validators_path)
+        self.concurrency = concurrency
+        self.pool = pool if pool else ConnectionPool(max_connections_per_host=concurrency)
+        self.rate_limiter = rate_limiter if rate_limiter else get_rate_limit_controller()
+        self.stats = {'downloaded': 0, 'not_modified': 0, 'failed': 0}
+
+    def fetch(self, url, out_path):
+        """Download a page to out_path. A page that has not changed since the last download is not fetched again.
+
+        Returns:
+          status: str, 'downloaded' | 'not_modified' | 'failed'
+        """
+        host = urlsplit(url).netloc
+        headers = {}
+        validator = self.validators.get(out_path)
+
+        if validator and validator['url'] == url and os.path.isfile(out_path):
+            if validator.get('etag'):
+                headers['If-None-Match'] = validator['etag']
+            if validator.get('last_modified'):
+                headers['If-Modified-Since'] = validator['last_modified']
+
+        while True:
+            self.rate_limiter.acquire(host, stage='crawl')
+            try:
+                response = self.pool.request(url, headers)
+            except (OSError, http.client.HTTPException) as e:
+                print(f'Failed to download {url}: {e}')
+                return 'failed'
+
+            if response['status'] == 429:  # noqa: PLR2004
+                backoff = self.rate_limiter.report_throttled(host, stage='crawl')
+                print(f'Too many requests! Back off {host} for {backoff:.1f} s ...')
+                continue
+
+            self.rate_limiter.report_success(host, stage='crawl')
+            break
+
+        if response['status'] == 304:  # noqa: PLR2004
+            return 'not_modified'
+
+        if response['status'] != 200:  # noqa: PLR2004
+            print(f"Failed to download {url}: HTTP {response['status']}")
+            return 'failed'
+
+        write_atomic(out_path, response['body'])
+
+        self.validators.append(
+            out_path,
+            {
+                'url': url,
+                'etag': response['headers'].get('etag'),
+                'last_modified': response['headers'].get('last-modified'),
+            },
+        )
+        return 'downloaded'
+
+    async def _crawl(self, jobs):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        with ThreadPoolExecutor(self.concurrency) as executor:
+
+            async def _fetch(n, url, out_path):
+                async with semaphore:
+                    status = await loop.run_in_executor(executor, self.fetch, url, out_path)
+                self.stats[status] += 1
+                print(n, out_path, status)
+
+            await asyncio.gather(*[_fetch(n, url, out_path) for n, (url, out_path) in enumerate(jobs)])
+
+    def crawl(self, jobs):
+        """Crawl all jobs.
+
+        Args:
+          jobs: list of (url, out_path)
+
+        Returns:
+          stats: dict, e.g., {'downloaded': 10, 'not_modified': 18389, 'failed': 0}
+        """
+        bgn_time = time.time()
+        asyncio.run(self._crawl(jobs))
+        print(
+            f"Downloaded: {self.stats['downloaded']}, not modified: {self.stats['not_modified']}, "
+            f"failed: {self.stats['failed']}, time: {time.time() - bgn_time:.3f} s"
+        )
+        return self.stats
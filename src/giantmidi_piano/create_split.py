@@ -1,6 +1,8 @@
 import os
 
-from .dataset import read_csv_to_meta_dict, write_meta_dict_to_csv
+import numpy as np
+
+from .dataset import read_csv_to_meta_dict, read_meta_table, write_meta_dict_to_csv
 
 
 def create_piano_split(
@@ -96,20 +98,18 @@ def create_surname_checked_subset(
     os.makedirs(surname_checked_midis_dir, exist_ok=True)
 
     # Read csv file.
-    meta_dict = read_csv_to_meta_dict(csv_path)
-    audios_num = len(meta_dict['audio_name'])
+    meta_table = read_meta_table(csv_path)
+    indexes = np.flatnonzero(meta_table.flag('giant_midi_piano') & meta_table.flag('surname_in_youtube_title'))
 
     count = 0
 
-    for n in range(audios_num):
-        if meta_dict['giant_midi_piano'][n] != '' and int(meta_dict['giant_midi_piano'][n]) == 1:
-            if int(meta_dict['surname_in_youtube_title'][n]) == 1:
-                midi_name = f"{meta_dict['audio_name'][n]}.mid"
-                midi_path = os.path.join(midis_dir, midi_name)
-                surname_checked_midi_path = os.path.join(surname_checked_midis_dir, midi_name)
-                exec_str = f'cp "{midi_path}" "{surname_checked_midi_path}"'
-                print(count, exec_str)
-                os.system(exec_str)
-                count += 1
+    for n in indexes:
+        midi_name = f"{meta_table['audio_name'][n]}.mid"
+        midi_path = os.path.join(midis_dir, midi_name)
+        surname_checked_midi_path = os.path.join(surname_checked_midis_dir, midi_name)
+        exec_str = f'cp "{midi_path}" "{surname_checked_midi_path}"'
+        print(count, exec_str)
+        os.system(exec_str)
+        count += 1
 
     print(f'Copy {count} surname checked midi files to {surname_checked_midis_dir}')
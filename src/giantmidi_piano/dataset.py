@@ -1,18 +1,21 @@
-import glob
+import html
 import os
 import pathlib
 import re
 import string
+import subprocess
 import time
-
-import nltk
-from bs4 import BeautifulSoup
-from nltk.tokenize import RegexpTokenizer
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from urllib.parse import urljoin
 
 from .config import nationalities
-
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
+from .crawler import AsyncCrawler
+from .downloader import YOUTUBE_URL, download_meta_rows
+from .imslp import get_fetcher
+from .journal import Journal, make_key, read_journals
+from .meta_table import MetaTable, read_csv_columns, write_csv_columns
+from .rate_limit import RateLimitManager, get_host, get_rate_limit_controller, is_too_many_requests
 
 
 def space_to_underscore(s):
@@ -23,17 +26,49 @@ def underscore_to_space(s):
     return s.replace('_', ' ')
 
 
+def get_imslp_composer_link_path(name, htmls_dir):
+    """Get the IMSLP link and the html path of a composer, e.g., 'A., Jag' ->
+    ('https://imslp.org/wiki/Category:A.%2C_Jag', 'htmls/A., Jag.html')."""
+    surname_firstname = name.split(', ')
+
+    if len(surname_firstname) == 1:
+        surname = surname_firstname[0]
+        composer_link = f'https://imslp.org/wiki/Category:{space_to_underscore(surname)}'
+        html_path = os.path.join(htmls_dir, f'{surname}.html')
+
+    else:
+        [surname, firstname] = surname_firstname[:2]
+        composer_link = (
+            f'https://imslp.org/wiki/Category:{space_to_underscore(surname)}%2C_{space_to_underscore(firstname)}'
+        )
+        html_path = os.path.join(htmls_dir, f'{surname}, {firstname}.html')
+
+    return composer_link, html_path
+
+
 def download_imslp_htmls(
     workspace: str,
+    concurrency: int = 16,
 ):
-    """Download html pages of all composers on IMSLP. In total 18,399 html pages have been downloaded."""
+    """Download html pages of all composers on IMSLP. In total 18,399 html pages have been downloaded.
+
+    Pages are downloaded concurrently. Rerunning only downloads pages that have changed on IMSLP.
+    """
     # Paths
     htmls_dir = os.path.join(workspace, 'htmls')
     os.makedirs(htmls_dir, exist_ok=True)
 
+    validators_path = os.path.join(workspace, '_tmp', 'imslp_validators.jsonl')
+
+    crawler = AsyncCrawler(validators_path, concurrency=concurrency)
+
     # Download composer page
+    composers_url = 'https://imslp.org/wiki/Category:Composers'
     html_path = os.path.join(workspace, 'Category:Composers.html')
-    os.system(f'wget --quiet -O {html_path} https://imslp.org/wiki/Category:Composers')
+    stats = crawler.crawl([(composers_url, html_path)])
+
+    if stats['failed']:
+        raise OSError(f'Failed to download {composers_url}, cannot get the names of composers!')
 
     # Load html text
     text = pathlib.Path(html_path).read_text()
@@ -49,36 +84,17 @@ def download_imslp_htmls(
         substring = substring.encode('utf8').decode('unicode_escape')
         names += substring[1:-1].split('","')
 
-    bgn_time = time.time()
-
     # Download html pages of all composers
-    for n, name in enumerate(names):
-        surname_firstname = name.split(', ')
-        """E.g., ['A.', 'Jag']"""
-
-        if len(surname_firstname) == 1:
-            surname = surname_firstname[0]
-            composer_link = f'https://imslp.org/wiki/Category:{space_to_underscore(surname)}'
-            html_path = os.path.join(htmls_dir, f'{surname}.html')
-
-        elif len(surname_firstname) == 2:
-            [surname, firstname] = surname_firstname
-            composer_link = (
-                f'https://imslp.org/wiki/Category:{space_to_underscore(surname)}%2C_{space_to_underscore(firstname)}'
-            )
-            html_path = os.path.join(htmls_dir, f'{surname}, {firstname}.html')
-
-        os.system(f'wget --quiet -O "{html_path}" "{composer_link}"')
-        print(n, html_path, os.path.isfile(html_path))
-
-    print(f'Finish! {time.time() - bgn_time:.3f} s')
+    jobs = [get_imslp_composer_link_path(name, htmls_dir) for name in names]
+    crawler.crawl(jobs)
+    crawler.rate_limiter.print_metrics()
 
 
-def download_wikipedia_htmls(args):
+def download_wikipedia_htmls(
+    workspace: str,
+    concurrency: int = 16,
+):
     """Download wikipedia pages of composers if exist. In total 6,831 wikipedia pages are downloaded."""
-    # Arguments & parameters
-    workspace = args.workspace
-
     # Paths
     htmls_dir = os.path.join(workspace, 'htmls')
     html_names = sorted(os.listdir(htmls_dir))
@@ -86,68 +102,123 @@ def download_wikipedia_htmls(args):
     wikipedias_dir = os.path.join(workspace, 'wikipedias')
     os.makedirs(wikipedias_dir, exist_ok=True)
 
-    # Download wikipedia of composers
-    for n, html_name in enumerate(html_names):
-        print(n, html_name)  # E.g., 'A., Jag.html'
+    validators_path = os.path.join(workspace, '_tmp', 'wikipedia_validators.jsonl')
+
+    jobs = []
+
+    # Collect wikipedia links of composers
+    for html_name in html_names:
         html_path = os.path.join(htmls_dir, html_name)
 
         surname_firstname = html_name[:-5].split(', ')
-        if len(surname_firstname) == 2:
-            [surname, firstname] = surname_firstname
+        if len(surname_firstname) != 2:
+            continue
+        [surname, firstname] = surname_firstname
 
         text = pathlib.Path(html_path).read_text()
         tmp = re.search('Detailed biography: <a href="', text)
         if tmp:  # Only part of composer has wikipedia page
             text = text[tmp.end() : tmp.end() + 500]
-            wikipedia_link = text[: re.search('"', text).start()]
-            print(wikipedia_link)
+            wikipedia_link = html.unescape(text[: re.search('"', text).start()])
 
             out_path = os.path.join(wikipedias_dir, f'{surname}, {firstname}.html')
-            os.system(f'wget --quiet -O "{out_path}" "{wikipedia_link}"')
+            jobs.append((urljoin('https://imslp.org/', wikipedia_link), out_path))
 
+    # Download wikipedia of composers
+    crawler = AsyncCrawler(validators_path, concurrency=concurrency)
+    crawler.crawl(jobs)
+    crawler.rate_limiter.print_metrics()
 
-def create_meta_csv(args):
-    """Create GiantMIDI-Piano meta csv. This csv collects 144,079 music pieces from all composers."""
-    # Arguments & parameters
-    workspace = args.workspace
 
+# Rate limiter of the following IMSLP pages of a create_meta_csv worker process, shared by all workers
+_worker_rate_limiter = None
+
+
+def _init_parse_composer(rate_limiter):
+    global _worker_rate_limiter  # noqa: PLW0603
+    _worker_rate_limiter = rate_limiter
+
+
+def _parse_composer(workspace, html_name, backend):
+    """Parse nationality, birth, death and music names of a composer, e.g., html_name: 'A., Jag.html'."""
+    surname_firstname = html_name[:-5].split(', ')
+    if len(surname_firstname) != 2:
+        return None
+    [surname, firstname] = surname_firstname
+
+    # Parse nationality, birth and death from Wikipedia
+    wikipedia_path = os.path.join(workspace, 'wikipedias', f'{surname}, {firstname}.html')
+    (nationality, birth, death) = get_composer_info_from_wikipedia(wikipedia_path)
+
+    # Parse music pieces from IMSLP html
+    html_path = os.path.join(workspace, 'htmls', html_name)
+    fetcher = get_fetcher(os.path.join(workspace, '_tmp', 'imslp_pages'), backend, _worker_rate_limiter)
+    music_names = get_music_names_from_imslp(html_path, fetcher)
+    music_names = [remove_suffix(music_name, firstname, surname) for music_name in music_names]
+
+    return surname, firstname, nationality, birth, death, music_names
+
+
+def create_meta_csv(
+    workspace: str,
+    workers: int = 0,
+    backend: str = 'fast',
+):
+    """Create GiantMIDI-Piano meta csv. This csv collects 144,079 music pieces from all composers.
+
+    Composer pages are parsed by a pool of `workers` processes (0 uses all cores) and written in sorted order.
+    Following IMSLP pages of all processes are fetched through one rate limiter served by a RateLimitManager.
+    """
     # Paths
     htmls_dir = os.path.join(workspace, 'htmls')
-    wikipedias_dir = os.path.join(workspace, 'wikipedias')
     out_csv_path = os.path.join(workspace, 'full_music_pieces.csv')
 
-    html_names = sorted(os.listdir(htmls_dir))
+    html_names = sorted(html_name for html_name in os.listdir(htmls_dir) if html_name.endswith('.html'))
 
     meta_dict = {'surname': [], 'firstname': [], 'music': [], 'nationality': [], 'birth': [], 'death': []}
 
-    for n, html_name in enumerate(html_names):
-        print(n, html_name)  # E.g., 'A., Jag.html'
+    with RateLimitManager() as manager, ProcessPoolExecutor(
+        workers or None, initializer=_init_parse_composer, initargs=(manager.RateLimitController(),)
+    ) as executor:
+        composers = executor.map(
+            _parse_composer,
+            repeat(workspace),
+            html_names,
+            repeat(backend),
+            chunksize=16,
+        )
 
-        surname_firstname = html_name[:-5].split(', ')
-        if len(surname_firstname) == 2:
-            [surname, firstname] = surname_firstname
+        for n, (html_name, composer) in enumerate(zip(html_names, composers)):
+            print(n, html_name)  # E.g., 'A., Jag.html'
 
-        # Parse nationality, birth and death from Wikipedia
-        wikipedia_path = os.path.join(wikipedias_dir, f'{surname}, {firstname}.html')
-        (nationality, birth, death) = get_composer_info_from_wikipedia(wikipedia_path)
+            if composer is None:
+                continue
 
-        # Parse music pieces from IMSLP html
-        html_path = os.path.join(htmls_dir, html_name)
-        music_names = get_music_names_from_imslp(html_path)
-        music_names = [remove_suffix(music_name, firstname, surname) for music_name in music_names]
+            (surname, firstname, nationality, birth, death, music_names) = composer
 
-        for music_name in music_names:
-            meta_dict['surname'].append(surname)
-            meta_dict['firstname'].append(firstname)
-            meta_dict['music'].append(music_name)
-            meta_dict['nationality'].append(nationality)
-            meta_dict['birth'].append(birth)
-            meta_dict['death'].append(death)
+            for music_name in music_names:
+                meta_dict['surname'].append(surname)
+                meta_dict['firstname'].append(firstname)
+                meta_dict['music'].append(music_name)
+                meta_dict['nationality'].append(nationality)
+                meta_dict['birth'].append(birth)
+                meta_dict['death'].append(death)
 
     write_meta_dict_to_csv(meta_dict, out_csv_path)
     print(f'Write out to {out_csv_path}')
 
 
+# NLTK tokens are never multi-word, so only single-word nationalities can be matched. A token is delimited by
+# anything but word characters and hyphens, e.g., 'German-born' is one token and is not a nationality.
+NATIONALITY_PATTERN = re.compile(
+    r'(?<![\w-])({})(?![\w-])'.format(
+        '|'.join(sorted((re.escape(e) for e in nationalities if ' ' not in e), key=len, reverse=True))
+    )
+)
+# Tokens that begin with a year, e.g., '1685' in '1685 births' or '1750s'
+YEAR_PATTERN = re.compile(r'(?<![\w\-–.])([1-9]\d{3})(?![.,]\d)')
+
+
 def get_composer_info_from_wikipedia(wikipedia_path):
     """Get nationality, birth and death from wikipedia."""
     nationality = None
@@ -168,22 +239,14 @@ def get_composer_info_from_wikipedia(wikipedia_path):
         text = text[: fin - 1]
         text = text.split('","')
         sentence = ' '.join(text)
-        words = nltk.word_tokenize(sentence)
-        pairs = nltk.pos_tag(words)
-
-        for pair in pairs:
-            if pair[1] == 'JJ':  # Nationality
-                if not nationality and pair[0] in nationalities:
-                    nationality = pair[0]
-            elif pair[1] == 'CD':  # Birth or death year
-                try:
-                    year = int(pair[0][:4])
-                    if year >= 1000 and year <= 9999:
-                        years.append(year)
-                except:
-                    pass
-
-        years = sorted(years)
+
+        # Nationality
+        match = NATIONALITY_PATTERN.search(sentence)
+        if match:
+            nationality = match.group(1)
+
+        # Birth or death year
+        years = sorted(int(year) for year in YEAR_PATTERN.findall(sentence))
 
     if len(years) >= 2:
         birth = str(years[0])
@@ -198,44 +261,31 @@ def get_composer_info_from_wikipedia(wikipedia_path):
     return nationality, birth, death
 
 
-def get_music_names_from_imslp(ismlp_path):
-    """Get all music names of a composer by parsing his / her IMSLP html page."""
+def get_composers_info_from_wikipedia(wikipedia_paths, workers=0):
+    """Get nationality, birth and death of many composers with a pool of processes.
+
+    Args:
+      wikipedia_paths: list of str
+      workers: int, 0 uses all cores.
+
+    Returns:
+      composers_info: list of (nationality, birth, death), in the order of wikipedia_paths.
+    """
+    with ProcessPoolExecutor(workers or None) as executor:
+        return list(executor.map(get_composer_info_from_wikipedia, wikipedia_paths, chunksize=64))
+
+
+def get_music_names_from_imslp(ismlp_path, fetcher=None):
+    """Get all music names of a composer by parsing his / her IMSLP html page.
+
+    Following pages are fetched in-process by the fetcher, and cached in the _tmp directory of the workspace.
+    """
+    if fetcher is None:
+        workspace = os.path.dirname(os.path.dirname(os.path.abspath(ismlp_path)))
+        fetcher = get_fetcher(os.path.join(workspace, '_tmp', 'imslp_pages'))
+
     text = pathlib.Path(ismlp_path).read_text()
-    # All music pieces information are before catpagejs
-    obj = re.search(r"</div><script>if\(typeof catpagejs=='undefined'\)", text)
-    text = text[: obj.start()] if obj else text
-
-    soup = BeautifulSoup(text, 'html.parser')
-    links = soup.find_all('a')
-
-    music_names = []
-
-    for _link in links:
-        link = str(_link)
-        if 'categorypagelink' in link:
-            # link looks like: '<a class="categorypagelink" href="/wiki/Je_t%27aime_Juliette_(A.,_Jag)" title="Je t\'aime Juliette (A., Jag)">Je t\'aime Juliette (A., Jag)</a>'  # noqa: E501
-            bgn = re.search('title=', link).end()
-            link = link[bgn + 1 :]
-            fin = re.search('>', link).start()
-            music_name = link[: fin - 1]
-            music_names.append(music_name)
-
-    for _link in links:
-        link = str(_link)
-        if 'next 200' in link:
-            # link looks like: '<a class="categorypaginglink" href="/index.php?title=Category:Mozart,_Wolfgang_Amadeus&amp;pagefrom=Fantasia+in+f+minor%2C+k.0608%7E%7Emozart%2C+wolfgang+amadeus%0AFantasia+in+F+minor%2C+K.608+%28Mozart%2C+Wolfgang+Amadeus%29#mw-pages" title="Category:Mozart, Wolfgang Amadeus">next 200</a>'  # noqa: E501
-            bgn = re.search('href="', link).end()
-            link = link[bgn:]
-            fin = re.search('"', link).start()
-            link = link[:fin]
-            link = f'https://imslp.org{link}'
-            link = link.replace('&amp;', '&')
-            print(link)
-            os.system(f'wget --quiet -O _tmp.html "{link}"')
-            music_names += get_music_names_from_imslp('_tmp.html')
-            break
-
-    return music_names
+    return fetcher.get_music_names(text)
 
 
 def remove_suffix(music_name, firstname, surname):
@@ -246,107 +296,141 @@ def remove_suffix(music_name, firstname, surname):
 
 def write_meta_dict_to_csv(meta_dict, out_csv_path):
     """Write meta dict to csv path."""
-    with open(out_csv_path, 'w') as fw:
-        line = '\t'.join(list(meta_dict.keys()))
-        fw.write(f'{line}\n')
-
-        for n in range(len(meta_dict['firstname'])):
-            line = '\t'.join([str(meta_dict[key][n]) for key in meta_dict.keys()])
-            fw.write(f'{line}\n')
+    write_csv_columns(meta_dict, out_csv_path)
 
 
 def read_csv_to_meta_dict(csv_path):
-    """Read csv file to meta_dict."""
-    lines = []
-    with open(csv_path) as fr:
-        for line in fr:
-            _line = line.split('\n')[0].split('\t')
-            lines.append(_line)
+    """Read csv file to meta_dict. Use read_meta_table to get typed columns."""
+    return read_csv_columns(csv_path)
 
-    meta_dict = {key: [] for key in lines[0]}
 
-    lines = lines[1:]
-    for line in lines:
-        for k, key in enumerate(meta_dict.keys()):
-            meta_dict[key].append(line[k])
+def read_meta_table(csv_path):
+    """Read csv file to a MetaTable."""
+    return MetaTable.read_csv(csv_path)
 
-    return meta_dict
 
-
-def _read_title_id(path):
-    with open(path) as fr:
-        lines = fr.readlines()
+def _parse_title_id(stdout):
+    lines = stdout.splitlines()
 
     if len(lines) != 2:
         return 'none', 'none'
-    title = lines[0].split('\n')[0]
-    _id = lines[1].split('\n')[0]
+    title = lines[0]
+    _id = lines[1]
     return title, _id
 
 
-def _too_many_requests(path):
-    with open(path) as fr:
-        lines = fr.readlines()
+def _get_search_key(meta_dict, n):
+    return make_key(meta_dict['surname'][n], meta_dict['firstname'][n], meta_dict['music'][n])
 
-    for line in lines:
-        print(line)
-        if 'HTTP Error 429: Too Many Requests' in line:
-            return True
 
-    return False
+def search_youtube(  # noqa: PLR0913
+    workspace: str,
+    mini_data: bool = False,
+    requests_per_second: float = 0,
+    begin_index: int = 0,
+    end_index: int = 0,
+):
+    """Search music names on YouTube, and append searched YouTube titles and IDs to meta csv.
 
+    Finished queries are appended to a journal keyed by composer and music name, so a restarted search skips them.
+    Each [begin_index, end_index) shard writes its own journal, and the csv is built from all journals once every
+    query is finished. end_index=0 searches to the end of the csv.
+    """
+    # Arguments & parameters
+    prefix = 'minidata_' if mini_data else ''
+
+    # Paths
+    csv_path = os.path.join(workspace, 'full_music_pieces.csv')
+
+    journals_dir = os.path.join(workspace, '_tmp', f'{prefix}search_youtube_journals')
+
+    meta_dict = read_csv_to_meta_dict(csv_path)
 
-def search_youtube(
+    audios_num = 10 if mini_data else len(meta_dict['surname'])
+    end_index = min(end_index, audios_num) if end_index else audios_num
+
+    journal = Journal(os.path.join(journals_dir, f'{begin_index}_{end_index}.jsonl'))
+    finished = read_journals(journals_dir)
+
+    rate_limiter = get_rate_limit_controller(requests_per_second)
+    host = get_host(YOUTUBE_URL)
+
+    n = begin_index
+    while n < end_index:
+        key = _get_search_key(meta_dict, n)
+
+        if key in finished or key in journal:
+            n += 1
+            continue
+
+        print(n, meta_dict['surname'][n])
+        search_str = f"{meta_dict['firstname'][n]} {meta_dict['surname'][n]}, {meta_dict['music'][n]}"
+
+        rate_limiter.acquire(host, stage='search')
+        result = subprocess.run(
+            ['youtube-dl', '--get-id', '--get-title', f'ytsearch1:{search_str}'],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+        if is_too_many_requests(result.stderr):
+            backoff = rate_limiter.report_throttled(host, stage='search')
+            print(f'Too many requests! Back off for {backoff:.1f} s ...')
+            continue
+
+        rate_limiter.report_success(host, stage='search')
+
+        (title, id) = _parse_title_id(result.stdout)
+        journal.append(key, {'youtube_title': title, 'youtube_id': id})
+        print(f'{n}, {search_str}, {title}, {id}')
+
+        n += 1
+
+    rate_limiter.print_metrics()
+
+    merge_search_youtube(workspace, mini_data)
+
+
+def merge_search_youtube(
     workspace: str,
     mini_data: bool = False,
 ):
-    """Search music names on YouTube, and append searched YouTube titles and IDs to meta csv."""
+    """Build the YouTube meta csv from the journals of all search_youtube shards."""
     # Arguments & parameters
     prefix = 'minidata_' if mini_data else ''
 
     # Paths
     csv_path = os.path.join(workspace, 'full_music_pieces.csv')
 
-    stdout_path = os.path.join(workspace, '_tmp', 'stdout.txt')
-    error_path = os.path.join(workspace, '_tmp', 'error.txt')
-    os.makedirs(os.path.dirname(stdout_path), exist_ok=True)
+    journals_dir = os.path.join(workspace, '_tmp', f'{prefix}search_youtube_journals')
 
     youtube_csv_path = os.path.join(workspace, f'{prefix}full_music_pieces_youtube.csv')
 
     meta_dict = read_csv_to_meta_dict(csv_path)
+    finished = read_journals(journals_dir)
+
+    audios_num = 10 if mini_data else len(meta_dict['surname'])
 
-    youtube_meta_dict = {key: [] for key in meta_dict.keys()}
+    youtube_meta_dict = {key: meta_dict[key][:audios_num] for key in meta_dict.keys()}
     youtube_meta_dict['youtube_title'] = []
     youtube_meta_dict['youtube_id'] = []
 
-    n = 0
-    while n < len(meta_dict['surname']):
-        print(n, meta_dict['surname'][n])
-        search_str = f"{meta_dict['firstname'][n]} {meta_dict['surname'][n]}, {meta_dict['music'][n]}"
-
-        youtube_simulate_str = (
-            f'youtube-dl --get-id --get-title ytsearch$1:"{search_str}" 1>"{stdout_path}" 2>"{error_path}"'
-        )
+    unfinished_num = 0
 
-        os.system(youtube_simulate_str)
+    for n in range(audios_num):
+        record = finished.get(_get_search_key(meta_dict, n))
 
-        if _too_many_requests(error_path):
-            sleep_seconds = 3600
-            print(f'Too many requests! Sleep for {sleep_seconds} s ...')
-            time.sleep(sleep_seconds)
+        if record is None:
+            unfinished_num += 1
             continue
 
-        (title, id) = _read_title_id(stdout_path)
-        youtube_meta_dict['youtube_title'].append(title)
-        youtube_meta_dict['youtube_id'].append(id)
+        youtube_meta_dict['youtube_title'].append(record['youtube_title'])
+        youtube_meta_dict['youtube_id'].append(record['youtube_id'])
 
-        for key in meta_dict.keys():
-            youtube_meta_dict[key].append(meta_dict[key][n])
-        print(', '.join([youtube_meta_dict[key][n] for key in youtube_meta_dict]))
-
-        n += 1
-        if mini_data and n == 10:
-            break
+    if unfinished_num > 0:
+        print(f'{unfinished_num} out of {audios_num} queries are not finished! Skip writing {youtube_csv_path}')
+        return
 
     write_meta_dict_to_csv(youtube_meta_dict, youtube_csv_path)
     print(f'Write out to {youtube_csv_path}')
@@ -366,6 +450,8 @@ def calculate_similarity(
     mini_data: bool,
 ):
     """Calculate and append the similarity between YouTube titles and IMSLP music names to meta csv."""
+    from nltk.tokenize import RegexpTokenizer
+
     # Arguments & parameters
     prefix = 'minidata_' if mini_data else ''
 
@@ -406,7 +492,24 @@ def calculate_similarity(
     print(f'Write out to {similarity_csv_path}')
 
 
-def download_youtube(workspace: str, begin_index: int = 0, end_index: int = 0, mini_data: bool = False):
+def _select_by_similarity(meta_dict, n):
+    return float(meta_dict['similarity'][n]) > 0.6
+
+
+def _select_by_piano_solo_prob(meta_dict, n):
+    return float(meta_dict['piano_solo_prob'][n]) >= 0.5
+
+
+def download_youtube(  # noqa: PLR0913
+    workspace: str,
+    begin_index: int = 0,
+    end_index: int = 0,
+    mini_data: bool = False,
+    fetch_workers: int = 4,
+    transcode_workers: int = 2,
+    requests_per_second: float = 0,
+    downloader: str = 'youtube-dl',
+):
     """Download IMSLP music pieces from YouTube. 59,969 files are downloaded in Jan. 2020."""
     # Arguments & parameters
     prefix = 'minidata_' if mini_data else ''
@@ -415,68 +518,40 @@ def download_youtube(workspace: str, begin_index: int = 0, end_index: int = 0, m
     similarity_csv_path = os.path.join(workspace, f'{prefix}full_music_pieces_youtube_similarity.csv')
 
     mp3s_dir = os.path.join(workspace, 'mp3s')
-    os.makedirs(mp3s_dir, exist_ok=True)
-
-    stdout_path = os.path.join(workspace, '_tmp', 'stdout.txt')
-    error_path = os.path.join(workspace, '_tmp', 'error.txt')
-    os.makedirs(os.path.dirname(stdout_path), exist_ok=True)
+    state_path = os.path.join(workspace, '_tmp', 'download_youtube_state.txt')
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
 
     # Meta info to be downloaded
     meta_dict = read_csv_to_meta_dict(similarity_csv_path)
 
-    count = 0
     download_time = time.time()
 
-    n = begin_index
-    while n < min(end_index, len(meta_dict['surname'])):
-        print(
-            f"{n}; {meta_dict['firstname'][n]} {meta_dict['surname'][n]}; {meta_dict['music'][n]}; {meta_dict['youtube_title'][n]}"  # noqa: E501
-        )
-
-        if float(meta_dict['similarity'][n]) > 0.6:
-            count += 1
-
-            bare_name = os.path.join(
-                f"{meta_dict['surname'][n]}, {meta_dict['firstname'][n]}, {meta_dict['music'][n]}, {meta_dict['youtube_id'][n]}".replace(  # noqa: E501, E501
-                    '/', '_'
-                )
-            )
-
-            youtube_str = f"""youtube-dl -f bestaudio -o "{mp3s_dir}/{bare_name}.%(ext)s" https://www.youtube.com/watch?v={meta_dict['youtube_id'][n]} 1>"{stdout_path}" 2>"{error_path}\""""  # noqa: E501
-
-            os.system(youtube_str)
-
-            if _too_many_requests(error_path):
-                sleep_seconds = 3600
-                print(f'Too many requests! Sleep for {sleep_seconds} s ...')
-                time.sleep(sleep_seconds)
-                continue
-
-            # Convert to MP3
-            audio_paths = glob.glob(os.path.join(mp3s_dir, f'{bare_name}*'))
-            print(audio_paths)
-
-            if audio_paths:
-                audio_path = audio_paths[0]
-
-                mp3_path = os.path.join(mp3s_dir, f'{bare_name}.mp3')
-
-                os.system(f'ffmpeg -i "{audio_path}" -loglevel panic -y -ac 1 -ar 32000 "{mp3_path}" ')
-
-                if os.path.splitext(audio_path)[-1] != '.mp3':
-                    os.system(f'rm "{audio_path}"')
-
-        n += 1
+    count = download_meta_rows(
+        meta_dict,
+        mp3s_dir=mp3s_dir,
+        state_path=state_path,
+        begin_index=begin_index,
+        end_index=end_index,
+        select=_select_by_similarity,
+        fetch_workers=fetch_workers,
+        transcode_workers=transcode_workers,
+        requests_per_second=requests_per_second,
+        fetch_command=downloader,
+    )
 
     print(f'{count} out of {end_index - begin_index} audios are downloaded!')
     print(f'Time: {time.time() - download_time:.3f}')
 
 
-def download_youtube_piano_solo(
+def download_youtube_piano_solo(  # noqa: PLR0913
     workspace: str,
     begin_index: int,
     end_index: int,
     mini_data: bool,
+    fetch_workers: int = 4,
+    transcode_workers: int = 2,
+    requests_per_second: float = 0,
+    downloader: str = 'youtube-dl',
 ):
     """Download piano solo of GiantMIDI-Piano. 10,848 files can be downloaded in Jan. 2020."""
     # Arguments & parameters
@@ -486,58 +561,26 @@ def download_youtube_piano_solo(
     similarity_csv_path = os.path.join(workspace, f'{prefix}full_music_pieces_youtube_similarity_pianosoloprob.csv')
 
     mp3s_dir = os.path.join(workspace, 'mp3s_piano_solo')
-    os.makedirs(mp3s_dir, exist_ok=True)
-
-    stdout_path = os.path.join(workspace, '_tmp', 'stdout.txt')
-    error_path = os.path.join(workspace, '_tmp', 'error.txt')
-    os.makedirs(os.path.dirname(stdout_path), exist_ok=True)
+    state_path = os.path.join(workspace, '_tmp', 'download_youtube_piano_solo_state.txt')
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
 
     # Meta info to be downloaded
     meta_dict = read_csv_to_meta_dict(similarity_csv_path)
 
-    count = 0
     download_time = time.time()
 
-    n = begin_index
-    while n < min(end_index, len(meta_dict['surname'])):
-        print(
-            f"{n}; {meta_dict['firstname'][n]} {meta_dict['surname'][n]}; {meta_dict['music'][n]}; {meta_dict['youtube_title'][n]}"  # noqa: E501
-        )
-
-        if float(meta_dict['piano_solo_prob'][n]) >= 0.5:
-            count += 1
-
-            bare_name = os.path.join(
-                f"{meta_dict['surname'][n]}, {meta_dict['firstname'][n]}, {meta_dict['music'][n]}, {meta_dict['youtube_id'][n]}".replace(  # noqa: E501
-                    '/', '_'
-                )
-            )
-
-            youtube_str = f"""youtube-dl -f bestaudio -o "{mp3s_dir}/{bare_name}.%(ext)s" https://www.youtube.com/watch?v={meta_dict['youtube_id'][n]} 1>"{stdout_path}" 2>"{error_path}\""""  # noqa: E501
-
-            os.system(youtube_str)
-
-            if _too_many_requests(error_path):
-                sleep_seconds = 3600
-                print(f'Too many requests! Sleep for {sleep_seconds} s ...')
-                time.sleep(sleep_seconds)
-                continue
-
-            # Convert to MP3
-            audio_paths = glob.glob(os.path.join(mp3s_dir, f'{bare_name}*'))
-            print(audio_paths)
-
-            if audio_paths:
-                audio_path = audio_paths[0]
-
-                mp3_path = os.path.join(mp3s_dir, f'{bare_name}.mp3')
-
-                os.system(f'ffmpeg -i "{audio_path}" -loglevel panic -y -ac 1 -ar 32000 "{mp3_path}" ')
-
-                if os.path.splitext(audio_path)[-1] != '.mp3':
-                    os.system(f'rm "{audio_path}"')
-
-        n += 1
+    count = download_meta_rows(
+        meta_dict,
+        mp3s_dir=mp3s_dir,
+        state_path=state_path,
+        begin_index=begin_index,
+        end_index=end_index,
+        select=_select_by_piano_solo_prob,
+        fetch_workers=fetch_workers,
+        transcode_workers=transcode_workers,
+        requests_per_second=requests_per_second,
+        fetch_command=downloader,
+    )
 
     print(f'{count} out of {end_index - begin_index} audios are downloaded!')
     print(f'Time: {time.time() - download_time:.3f}')
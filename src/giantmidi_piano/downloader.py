@@ -0,0 +1,246 @@
+"""Concurrent YouTube downloader. Audios are fetched by a pool of youtube-dl workers and converted to mp3 by a
+separate pool of ffmpeg workers, so that network and transcoding overlap."""
+
+import glob
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .rate_limit import get_host, get_rate_limit_controller, is_too_many_requests
+
+YOUTUBE_URL = 'https://www.youtube.com/watch?v={}'
+
+# Suffix of mp3s being transcoded
+TMP_SUFFIX = '.tmp.mp3'
+
+
+def get_bare_name(surname, firstname, music, youtube_id):
+    """Get the file name (without extension) of a downloaded audio."""
+    return f'{surname}, {firstname}, {music}, {youtube_id}'.replace('/', '_')
+
+
+class DownloadState:
+    def __init__(self, state_path):
+        """Append-only record of finished downloads, so that an interrupted download can be resumed.
+
+        Args:
+          state_path: str, each line is the bare name of a finished audio.
+        """
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.finished = set()
+
+        if os.path.isfile(state_path):
+            with open(state_path) as fr:
+                self.finished = {line.rstrip('\n') for line in fr if line.strip()}
+
+    def is_finished(self, bare_name):
+        return bare_name in self.finished
+
+    def add(self, bare_name):
+        with self.lock:
+            if bare_name in self.finished:
+                return
+            self.finished.add(bare_name)
+            with open(self.state_path, 'a') as fw:
+                fw.write(f'{bare_name}\n')
+
+
+class YoutubeDownloader:
+    def __init__(  # noqa: PLR0913
+        self,
+        mp3s_dir,
+        state_path,
+        fetch_workers=4,
+        transcode_workers=2,
+        rate_limiter=None,
+        fetch_command='youtube-dl',
+        transcode_command='ffmpeg',
+        sample_rate=32000,
+    ):
+        """Download YouTube audios and convert them to mono mp3s.
+
+        Args:
+          mp3s_dir: str, directory to write mp3s.
+          state_path: str, path of the resumable download state.
+          fetch_workers: int, number of concurrent youtube-dl processes.
+          transcode_workers: int, number of concurrent ffmpeg processes.
+          rate_limiter: RateLimitController shared by all network stages.
+          fetch_command: str, youtube-dl compatible executable. A local stub can be used instead of youtube-dl.
+          transcode_command: str, ffmpeg compatible executable.
+          sample_rate: int, sample rate of output mp3s.
+        """
+        self.mp3s_dir = mp3s_dir
+        self.state = DownloadState(state_path)
+        self.fetch_workers = fetch_workers
+        self.transcode_workers = transcode_workers
+        self.rate_limiter = rate_limiter if rate_limiter else get_rate_limit_controller()
+        self.fetch_command = fetch_command
+        self.transcode_command = transcode_command
+        self.sample_rate = sample_rate
+
+        os.makedirs(mp3s_dir, exist_ok=True)
+
+    def fetch(self, job):
+        """Download the best audio of a YouTube video. Retry with backoff after HTTP 429.
+
+        Returns:
+          audio_path: str | None
+        """
+        url = YOUTUBE_URL.format(job['youtube_id'])
+        host = get_host(url)
+        out_template = os.path.join(self.mp3s_dir, f"{job['bare_name']}.%(ext)s")
+
+        while True:
+            self.rate_limiter.acquire(host, stage='download')
+            result = subprocess.run(
+                [self.fetch_command, '-f', 'bestaudio', '-o', out_template, url],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                check=False,
+            )
+
+            if is_too_many_requests(result.stderr):
+                backoff = self.rate_limiter.report_throttled(host, stage='download')
+                print(f'Too many requests! Back off {host} for {backoff:.1f} s ...')
+                continue
+
+            self.rate_limiter.report_success(host, stage='download')
+            break
+
+        # Partial downloads of youtube-dl and leftovers of a crashed transcode are not audios
+        audio_paths = [
+            path
+            for path in glob.glob(os.path.join(glob.escape(self.mp3s_dir), f"{glob.escape(job['bare_name'])}.*"))
+            if os.path.splitext(path)[-1] not in ['.part', '.ytdl'] and not path.endswith(TMP_SUFFIX)
+        ]
+        print(job['index'], audio_paths)
+
+        return audio_paths[0] if audio_paths else None
+
+    def transcode(self, job, audio_path):
+        """Convert a downloaded audio to mono mp3, and remove the original audio."""
+        mp3_path = os.path.join(self.mp3s_dir, f"{job['bare_name']}.mp3")
+        tmp_path = os.path.join(self.mp3s_dir, f"{job['bare_name']}{TMP_SUFFIX}")
+
+        result = subprocess.run(
+            [
+                self.transcode_command,
+                '-i',
+                audio_path,
+                '-loglevel',
+                'panic',
+                '-y',
+                '-ac',
+                '1',
+                '-ar',
+                str(self.sample_rate),
+                tmp_path,
+            ],
+            check=False,
+        )
+
+        if result.returncode != 0 or not os.path.isfile(tmp_path):
+            print(f'Failed to convert {audio_path}!')
+            return False
+
+        os.replace(tmp_path, mp3_path)
+
+        if audio_path != mp3_path:
+            os.remove(audio_path)
+
+        self.state.add(job['bare_name'])
+        return True
+
+    def run(self, jobs):
+        """Download and convert all jobs. Jobs finished in previous runs are skipped.
+
+        Args:
+          jobs: list of dict, e.g., [{'index': 3, 'bare_name': 'Bach, J. S., Air, xxx', 'youtube_id': 'xxx'}]
+
+        Returns:
+          count: int, number of mp3s available after this run.
+        """
+        jobs = [job for job in jobs if not self.state.is_finished(job['bare_name'])]
+        transcode_futures = []
+        lock = threading.Lock()
+
+        with ThreadPoolExecutor(self.transcode_workers) as transcode_pool:
+
+            def _fetch_and_queue(job):
+                audio_path = self.fetch(job)
+                if audio_path:
+                    future = transcode_pool.submit(self.transcode, job, audio_path)
+                    with lock:
+                        transcode_futures.append((job, future))
+
+            with ThreadPoolExecutor(self.fetch_workers) as fetch_pool:
+                for future in [fetch_pool.submit(_fetch_and_queue, job) for job in jobs]:
+                    future.result()
+
+        failed_num = 0
+
+        for job, future in transcode_futures:
+            try:
+                converted = future.result()
+            except Exception as e:  # noqa: BLE001
+                print(f"Failed to convert {job['bare_name']}: {e!r}")
+                converted = False
+
+            failed_num += not converted
+
+        if failed_num:
+            print(f'{failed_num} out of {len(transcode_futures)} downloaded audios failed to convert!')
+
+        return len(self.state.finished)
+
+
+def download_meta_rows(  # noqa: PLR0913
+    meta_dict,
+    mp3s_dir,
+    state_path,
+    begin_index,
+    end_index,
+    select,
+    fetch_workers=4,
+    transcode_workers=2,
+    requests_per_second=None,
+    fetch_command='youtube-dl',
+):
+    """Download the selected rows of a meta dict concurrently.
+
+    Args:
+      meta_dict: dict, read by read_csv_to_meta_dict.
+      select: function, select(meta_dict, n) returns True if the n-th row should be downloaded.
+
+    Returns:
+      count: int, number of selected rows.
+    """
+    jobs = []
+
+    for n in range(begin_index, min(end_index, len(meta_dict['surname']))):
+        print(
+            f"{n}; {meta_dict['firstname'][n]} {meta_dict['surname'][n]}; {meta_dict['music'][n]}; {meta_dict['youtube_title'][n]}"  # noqa: E501
+        )
+
+        if select(meta_dict, n):
+            bare_name = get_bare_name(
+                meta_dict['surname'][n], meta_dict['firstname'][n], meta_dict['music'][n], meta_dict['youtube_id'][n]
+            )
+            jobs.append({'index': n, 'bare_name': bare_name, 'youtube_id': meta_dict['youtube_id'][n]})
+
+    downloader = YoutubeDownloader(
+        mp3s_dir=mp3s_dir,
+        state_path=state_path,
+        fetch_workers=fetch_workers,
+        transcode_workers=transcode_workers,
+        rate_limiter=get_rate_limit_controller(requests_per_second),
+        fetch_command=fetch_command,
+    )
+
+    downloader.run(jobs)
+    downloader.rate_limiter.print_metrics()
+
+    return len(jobs)
@@ -1,9 +1,10 @@
 import os
+import time
 
-import matplotlib.pyplot as plt
 import numpy as np
 
-from .dataset import read_csv_to_meta_dict, write_meta_dict_to_csv
+from .dataset import read_csv_to_meta_dict, read_meta_table, write_meta_dict_to_csv
+from .meta_table import MetaTable
 
 
 def create_subset200_eval_csv(
@@ -25,32 +26,20 @@ def create_subset200_eval_csv(
     output_path = os.path.join('subset_csvs_for_evaluation', 'subset200_eval.csv')
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    meta_dict = read_csv_to_meta_dict(csv_path)
+    meta_table = read_meta_table(csv_path)
 
-    audios_num = len(meta_dict['surname'])
-    indexes = []
-
-    for n in range(audios_num):
-        if float(meta_dict['similarity'][n]) > 0.6:
-            indexes.append(n)
+    indexes = np.flatnonzero(meta_table['similarity'] > 0.6)
 
     skip_num = len(indexes) // eval_num
     eval_indexes = indexes[0::skip_num][0:eval_num]
 
-    new_meta_dict = {key: [] for key in meta_dict.keys()}
-    new_meta_dict['index_in_csv'] = []
+    eval_meta_table = meta_table.select(eval_indexes)
+    eval_meta_table['index_in_csv'] = eval_indexes
+    eval_meta_table['piano_solo'] = [''] * len(eval_indexes)
+    eval_meta_table['electronic_piano'] = [''] * len(eval_indexes)
+    eval_meta_table['sequenced'] = [''] * len(eval_indexes)
 
-    for index in eval_indexes:
-        for key in meta_dict.keys():
-            new_meta_dict[key].append(meta_dict[key][index])
-
-        new_meta_dict['index_in_csv'].append(index)
-
-    new_meta_dict['piano_solo'] = [''] * eval_num
-    new_meta_dict['electronic_piano'] = [''] * eval_num
-    new_meta_dict['sequenced'] = [''] * eval_num
-
-    write_meta_dict_to_csv(new_meta_dict, output_path)
+    eval_meta_table.write_csv(output_path)
     print(f'Write out to {output_path}')
 
 
@@ -67,6 +56,8 @@ def plot_piano_solo_p_r_f1(
     Returns:
         None
     """
+    import matplotlib.pyplot as plt
+
     # paths
     out_fig_path = os.path.join('results', 'piano_solo_p_r_f1.pdf')
 
@@ -327,3 +318,205 @@ def individual_composer_piano_solo_meta_accuracy(
     accuracy = tp / (tp + fp)
     print(f'Match: {tp}, Accuracy: {fp}')
     print(f'Accuracy: {accuracy:.3f}')
+
+
+def _precision_recall_f1(preds, targets):
+    tp = np.sum((preds == 1) & (targets == 1))
+    fp = np.sum((preds == 1) & (targets == 0))
+    fn = np.sum((preds == 0) & (targets == 1))
+
+    prec = tp / np.clip(tp + fp, 1e-8, np.inf)
+    recall = tp / np.clip(tp + fn, 1e-8, np.inf)
+    f1 = 2 * prec * recall / np.clip(prec + recall, 1e-8, np.inf)
+
+    return prec, recall, f1
+
+
+def piano_solo_precision_drift(
+    subset200_eval_with_labels_path: str,
+    mp3s_dir: str,
+    precisions: list,
+    channels_last: bool = False,
+):
+    r"""Compare the piano solo probabilities of reduced precision detectors with the fp32 detector on the manually
+    labelled subset.
+
+    For each precision, print the difference of probabilities to fp32, the number of decisions flipped at the
+    threshold 0.5, and the precision, recall and F1 on the manual labels. All detectors run in the same memory
+    format, so that the differences are those of the precisions. The int8 detector runs on CPU, the only device of
+    dynamic quantization.
+
+    Args:
+        subset200_eval_with_labels_path: str
+        mp3s_dir: str
+        precisions: list of str, e.g., ['int8', 'bf16']
+        channels_last: bool, run all detectors in the channels last memory format.
+
+    Returns:
+        None
+    """
+    import librosa
+
+    from . import piano_detection_model
+
+    threshold = 0.5
+    precisions = ['fp32'] + [precision for precision in precisions if precision != 'fp32']
+
+    # paths
+    out_csv_path = os.path.join('results', 'piano_solo_precision_drift.csv')
+
+    meta_table = read_meta_table(subset200_eval_with_labels_path)
+
+    detectors = {
+        precision: piano_detection_model.PianoSoloDetector(
+            channels_last=channels_last, precision=precision, device='cpu' if precision == 'int8' else None
+        )
+        for precision in precisions
+    }
+
+    indexes = []
+    probs_dict = {precision: [] for precision in precisions}
+
+    for n in range(len(meta_table)):
+        if meta_table['audio_name'][n] == '' or meta_table['piano_solo'][n] not in [0, 1]:
+            continue
+
+        mp3_path = os.path.join(mp3s_dir, f"{meta_table['audio_name'][n]}.mp3")
+
+        if not os.path.isfile(mp3_path):
+            print(f'{mp3_path} does not exist, skip.')
+            continue
+
+        (audio, _) = librosa.core.load(mp3_path, sr=piano_detection_model.SR, mono=True)
+
+        for precision, detector in detectors.items():
+            try:
+                prob = float(np.mean(detector.predict(audio)))
+            except ValueError:
+                prob = 0.0
+
+            probs_dict[precision].append(prob)
+
+        indexes.append(n)
+        print(n, mp3_path, ', '.join(f'{precision}: {probs_dict[precision][-1]:.4f}' for precision in precisions))
+
+    targets = meta_table['piano_solo'][indexes]
+    probs_dict = {precision: np.array(probs) for precision, probs in probs_dict.items()}
+
+    print(f'Total num: {len(indexes)}')
+
+    for precision in precisions:
+        preds = (probs_dict[precision] >= threshold).astype(np.int8)
+        (prec, recall, f1) = _precision_recall_f1(preds, targets)
+        line = f'{precision}: Precision: {prec:.3f}, Recall: {recall:.3f}, F1: {f1:.3f}'
+
+        if precision != 'fp32':
+            difference = np.abs(probs_dict[precision] - probs_dict['fp32'])
+            flipped = np.sum(preds != (probs_dict['fp32'] >= threshold))
+            line += (
+                f', max abs difference to fp32: {np.max(difference, initial=0):.4f}, '
+                f'mean abs difference to fp32: {np.mean(difference) if len(difference) else 0:.4f}, '
+                f'flipped decisions: {flipped}'
+            )
+
+        print(line)
+
+    drift_table = meta_table.select(indexes)
+    out_table = {key: drift_table[key] for key in ['audio_name', 'piano_solo', 'piano_solo_prob']}
+    out_table.update({f'piano_solo_prob_{precision}': probs_dict[precision] for precision in precisions})
+
+    os.makedirs(os.path.dirname(out_csv_path), exist_ok=True)
+    MetaTable(out_table).write_csv(out_csv_path)
+    print(f'Write out to {out_csv_path}')
+
+
+def piano_solo_sequential_agreement(
+    subset200_eval_with_labels_path: str,
+    mp3s_dir: str,
+):
+    r"""Compare the sequential piano solo probabilities of PianoSoloDetector.predict_sequential with the
+    probabilities of all segments on the manually labelled subset.
+
+    Print the number of decisions that differ at the threshold 0.5, the ratio of predicted segments, the speed up,
+    and the precision, recall and F1 of both on the manual labels.
+
+    Args:
+        subset200_eval_with_labels_path: str
+        mp3s_dir: str
+
+    Returns:
+        None
+    """
+    import librosa
+
+    from . import piano_detection_model
+
+    threshold = 0.5
+
+    # paths
+    out_csv_path = os.path.join('results', 'piano_solo_sequential_agreement.csv')
+
+    meta_table = read_meta_table(subset200_eval_with_labels_path)
+    detector = piano_detection_model.PianoSoloDetector()
+
+    indexes = []
+    (full_probs, sequential_probs, segs_nums, total_segs_nums) = ([], [], [], [])
+    (full_time, sequential_time) = (0.0, 0.0)
+
+    for n in range(len(meta_table)):
+        if meta_table['audio_name'][n] == '' or meta_table['piano_solo'][n] not in [0, 1]:
+            continue
+
+        mp3_path = os.path.join(mp3s_dir, f"{meta_table['audio_name'][n]}.mp3")
+
+        if not os.path.isfile(mp3_path):
+            print(f'{mp3_path} does not exist, skip.')
+            continue
+
+        (audio, _) = librosa.core.load(mp3_path, sr=piano_detection_model.SR, mono=True)
+
+        if len(audio) < piano_detection_model.SR:
+            print(f'{mp3_path} is shorter than a segment, skip.')
+            continue
+
+        bgn_time = time.time()
+        full_probs.append(float(np.mean(detector.predict(audio))))
+        full_time += time.time() - bgn_time
+
+        bgn_time = time.time()
+        (prob, segs_num) = detector.predict_sequential(audio, threshold)
+        sequential_time += time.time() - bgn_time
+
+        sequential_probs.append(prob)
+        segs_nums.append(segs_num)
+        total_segs_nums.append(int(len(audio) / piano_detection_model.SR))
+        indexes.append(n)
+        print(n, mp3_path, f'full: {full_probs[-1]:.4f}, sequential: {prob:.4f}, segments: {segs_num}')
+
+    targets = meta_table['piano_solo'][indexes]
+    full_preds = (np.array(full_probs) >= threshold).astype(np.int8)
+    sequential_preds = (np.array(sequential_probs) >= threshold).astype(np.int8)
+
+    print(f'Total num: {len(indexes)}')
+    print(f'Different decisions: {np.sum(full_preds != sequential_preds)}')
+    print(f'Predicted segments: {np.sum(segs_nums)} / {np.sum(total_segs_nums)}')
+    print(f'Time full: {full_time:.1f} s, sequential: {sequential_time:.1f} s')
+
+    for name, preds in [('full', full_preds), ('sequential', sequential_preds)]:
+        (prec, recall, f1) = _precision_recall_f1(preds, targets)
+        print(f'{name}: Precision: {prec:.3f}, Recall: {recall:.3f}, F1: {f1:.3f}')
+
+    agreement_table = meta_table.select(indexes)
+    out_table = {key: agreement_table[key] for key in ['audio_name', 'piano_solo']}
+    out_table.update(
+        {
+            'piano_solo_prob_full': np.array(full_probs),
+            'piano_solo_prob_sequential': np.array(sequential_probs),
+            'piano_solo_segs_num': np.array(segs_nums, dtype=np.int64),
+            'segs_num': np.array(total_segs_nums, dtype=np.int64),
+        }
+    )
+
+    os.makedirs(os.path.dirname(out_csv_path), exist_ok=True)
+    MetaTable(out_table).write_csv(out_csv_path)
+    print(f'Write out to {out_csv_path}')
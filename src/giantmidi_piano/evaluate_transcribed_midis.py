@@ -2,7 +2,6 @@ import csv
 import os
 import time
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 
@@ -107,6 +106,8 @@ def get_stats(csv_path):
 
 def plot_box_plot():
     """Plot box plot of aligned results."""
+    import matplotlib.pyplot as plt
+
     # Paths
     csv_path = 'midis_for_evaluation/groundtruth_maestro_giantmidi-piano.csv'
     fig_path = 'results/transcribed_metrics_box_plot.pdf'
@@ -0,0 +1,198 @@
+"""Parse music names from IMSLP composer category pages. Following pages ("next 200") are fetched in-process through
+a pooled connection and cached on disk, so many composers can be parsed in parallel."""
+
+import hashlib
+import html
+import http.client
+import os
+import pathlib
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from .crawler import ConnectionPool, write_atomic
+from .rate_limit import get_host, get_rate_limit_controller
+
+IMSLP_URL = 'https://imslp.org'
+CATPAGEJS_PATTERN = re.compile(r"</div><script>if\(typeof catpagejs=='undefined'\)")
+CATEGORY_ANCHOR_PATTERN = re.compile(r'<a\s(?=[^>]*class="([^"]*categorypa(?:ge|ging)link[^"]*)")([^>]*)>')
+TITLE_PATTERN = re.compile(r'\btitle="([^"]*)"')
+HREF_PATTERN = re.compile(r'\bhref="([^"]*)"')
+
+
+def escape_title(title):
+    """Escape a music name as the BeautifulSoup parser of earlier releases did, so that meta csvs and journal keys
+    keep matching, e.g., 'Duo for Violin & Piano' -> 'Duo for Violin &amp; Piano'. BeautifulSoup escapes &, <, >,
+    and a double quote only if the title also contains a single quote."""
+    title = html.escape(title, quote=False)
+
+    if '"' in title and "'" in title:
+        title = title.replace('"', '&quot;')
+
+    return title
+
+
+class CategoryPageParser(HTMLParser):
+    def __init__(self):
+        """Collect the titles of 'categorypagelink' anchors and the href of the 'next 200' paging link."""
+        super().__init__(convert_charrefs=True)
+        self.music_names = []
+        self.next_link = None
+        self._paging_href = None
+        self._paging_text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+
+        attrs = dict(attrs)
+        classes = attrs.get('class') or ''
+
+        if 'categorypagelink' in classes and attrs.get('title') is not None:
+            # E.g., <a class="categorypagelink" href="/wiki/Je_t%27aime_Juliette_(A.,_Jag)" title="Je t'aime Juliette (A., Jag)">  # noqa: E501
+            self.music_names.append(escape_title(attrs['title']))
+
+        elif 'categorypaginglink' in classes and self.next_link is None:
+            self._paging_href = attrs.get('href')
+            self._paging_text = []
+
+    def handle_data(self, data):
+        if self._paging_href is not None:
+            self._paging_text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._paging_href is not None:
+            if ''.join(self._paging_text).strip() == 'next 200':
+                self.next_link = urljoin(IMSLP_URL, self._paging_href)
+            self._paging_href = None
+
+
+def _parse_category_page_html_parser(text):
+    parser = CategoryPageParser()
+    parser.feed(text)
+    parser.close()
+
+    return parser.music_names, parser.next_link
+
+
+def _parse_category_page_fast(text):
+    music_names = []
+    next_link = None
+
+    # Only anchors whose class contains 'categorypa' are scanned, other tags are skipped by the regex engine
+    for match in CATEGORY_ANCHOR_PATTERN.finditer(text):
+        (classes, attrs) = match.groups()
+
+        if 'categorypagelink' in classes:
+            title = TITLE_PATTERN.search(attrs)
+            if title:
+                music_names.append(escape_title(html.unescape(title.group(1))))
+
+        elif next_link is None and 'categorypaginglink' in classes and text.startswith('next 200<', match.end()):
+            href = HREF_PATTERN.search(attrs)
+            if href:
+                next_link = urljoin(IMSLP_URL, html.unescape(href.group(1)))
+
+    return music_names, next_link
+
+
+PARSE_BACKENDS = {
+    'fast': _parse_category_page_fast,
+    'html.parser': _parse_category_page_html_parser,
+}
+
+
+def parse_category_page(text, backend='fast'):
+    """Parse music names and the next page link of an IMSLP category page.
+
+    Args:
+      text: str
+      backend: str, 'fast' scans anchors with precompiled regexes, 'html.parser' tokenizes the whole page.
+
+    Returns:
+      music_names: list of str, e.g., ["Je t'aime Juliette (A., Jag)", ...]
+      next_link: str | None
+    """
+    # All music pieces information are before catpagejs
+    obj = CATPAGEJS_PATTERN.search(text)
+    text = text[: obj.start()] if obj else text
+
+    return PARSE_BACKENDS[backend](text)
+
+
+class ImslpCategoryFetcher:
+    def __init__(self, cache_dir, pool=None, rate_limiter=None, backend='fast'):
+        """Fetch the following pages of IMSLP composer category pages.
+
+        Args:
+          cache_dir: str, directory to cache fetched pages.
+          pool: ConnectionPool shared by all threads.
+          rate_limiter: RateLimitController shared by all network stages.
+          backend: str, backend of parse_category_page.
+        """
+        self.cache_dir = cache_dir
+        self.backend = backend
+        self.pool = pool if pool else ConnectionPool()
+        self.rate_limiter = rate_limiter if rate_limiter else get_rate_limit_controller()
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def fetch_page(self, url):
+        """Get the text of a page from the cache, or download it.
+
+        Raises:
+          OSError: the page failed to download or its HTTP status is not 200, so that the music names of a composer
+            are never silently truncated.
+        """
+        cache_path = os.path.join(self.cache_dir, f'{hashlib.sha1(url.encode()).hexdigest()}.html')  # noqa: S324
+
+        if os.path.isfile(cache_path):
+            return pathlib.Path(cache_path).read_text()
+
+        host = get_host(url)
+
+        while True:
+            self.rate_limiter.acquire(host, stage='imslp_pages')
+            try:
+                response = self.pool.request(url)
+            except (OSError, http.client.HTTPException) as e:
+                raise OSError(f'Failed to download {url}: {e}') from e
+
+            if response['status'] == 429:  # noqa: PLR2004
+                backoff = self.rate_limiter.report_throttled(host, stage='imslp_pages')
+                print(f'Too many requests! Back off {host} for {backoff:.1f} s ...')
+                continue
+
+            self.rate_limiter.report_success(host, stage='imslp_pages')
+            break
+
+        if response['status'] != 200:  # noqa: PLR2004
+            raise OSError(f"Failed to download {url}: HTTP {response['status']}")
+
+        text = response['body'].decode('utf-8', errors='replace')
+        write_atomic(cache_path, text.encode('utf-8'))
+
+        return text
+
+    def get_music_names(self, text):
+        """Get all music names of a composer from the first category page and all following pages."""
+        (music_names, next_link) = parse_category_page(text, self.backend)
+
+        while next_link:
+            print(next_link)
+            (page_music_names, next_link) = parse_category_page(self.fetch_page(next_link), self.backend)
+            music_names += page_music_names
+
+        return music_names
+
+
+_fetchers = {}
+
+
+def get_fetcher(cache_dir, backend='fast', rate_limiter=None):
+    """Get the fetcher of this process, so that worker processes reuse their connection pools. The rate_limiter is
+    only used by the first call, e.g., a proxy of a RateLimitManager shared by all worker processes."""
+    if (cache_dir, backend) not in _fetchers:
+        _fetchers[(cache_dir, backend)] = ImslpCategoryFetcher(cache_dir, backend=backend, rate_limiter=rate_limiter)
+
+    return _fetchers[(cache_dir, backend)]
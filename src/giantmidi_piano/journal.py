@@ -0,0 +1,82 @@
+"""Append-only progress journals. Each line is a json object {'key': ..., 'record': {...}}, so a crashed stage can be
+resumed by skipping finished keys, and journals written by several shards can be merged into one csv."""
+
+import glob
+import json
+import os
+import threading
+
+
+def make_key(*values):
+    """Make a journal key from values, e.g., make_key('Bach', 'Johann Sebastian', 'Air') -> 'Bach\\tJohann...'."""
+    return '\t'.join(str(value) for value in values)
+
+
+def read_journal(journal_path):
+    """Read a journal to a dict of key -> record. A truncated last line of a killed process is ignored."""
+    records = {}
+
+    if not os.path.isfile(journal_path):
+        return records
+
+    with open(journal_path, encoding='utf-8') as fr:
+        for line in fr:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[entry['key']] = entry['record']
+
+    return records
+
+
+def read_journals(journals_dir):
+    """Read and merge all journals of a directory. Later journals overwrite earlier ones on duplicated keys."""
+    records = {}
+
+    for journal_path in sorted(glob.glob(os.path.join(glob.escape(journals_dir), '*.jsonl'))):
+        records.update(read_journal(journal_path))
+
+    return records
+
+
+class Journal:
+    def __init__(self, journal_path):
+        """Append-only journal of finished work of one shard.
+
+        Args:
+          journal_path: str
+        """
+        self.journal_path = journal_path
+        self.records = read_journal(journal_path)
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(journal_path) or '.', exist_ok=True)
+
+        # Terminate a truncated last line, so that new records are not appended to it
+        if os.path.isfile(journal_path) and os.path.getsize(journal_path) > 0:
+            with open(journal_path, 'rb+') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def append(self, key, record):
+        """Append a record and flush it to disk, so that it survives a crash."""
+        line = json.dumps({'key': key, 'record': record}, ensure_ascii=False)
+
+        with self.lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as fw:
+                fw.write(f'{line}\n')
+                fw.flush()
+                os.fsync(fw.fileno())
+
+            self.records[key] = record
@@ -0,0 +1,443 @@
+"""Columnar meta table. Each column of a meta csv is a NumPy array, numerical columns are parsed once at load time
+with their own dtype, so that stages filter rows with vectorized masks instead of parsing strings in Python loops.
+
+A binary sidecar of each meta csv is written to a cache directory the first time the csv is read, so that csvs in
+read-only locations, e.g., resources/, are cached as well. Later reads load the sidecar and decode columns on first
+access, until the size or mtime of the csv changes."""
+
+import hashlib
+import os
+import threading
+import zipfile
+from collections.abc import MutableMapping
+
+import numpy as np
+
+# Empty cells are NaN in float columns and -1 in flag columns
+MISSING_INT = -1
+
+COLUMN_DTYPES = {
+    'similarity': np.float64,
+    'piano_solo_prob': np.float64,
+    'audio_duration': np.float64,
+    'giant_midi_piano': np.int8,
+    'surname_in_youtube_title': np.int8,
+    'piano_solo': np.int8,
+    'electronic_piano': np.int8,
+    'sequenced': np.int8,
+    'meta_correct': np.int8,
+    'index_in_csv': np.int64,
+    'piano_solo_segs_num': np.int64,
+    'split': np.str_,
+}
+
+
+SIDECAR_VERSION = 1
+
+# Directory of sidecars, GIANTMIDI_PIANO_CACHE_DIR overrides it
+SIDECARS_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'giantmidi_piano', 'meta_sidecars')
+
+
+class LazyColumns(MutableMapping):
+    def __init__(self, keys, load_column):
+        """Dict of columns whose values are loaded on first access.
+
+        Args:
+          keys: list of str
+          load_column: function, key -> column
+        """
+        self._keys = list(keys)
+        self._columns = {}
+        self._load_column = load_column
+
+    def __getitem__(self, key):
+        if key not in self._columns:
+            if key not in self._keys:
+                raise KeyError(key)
+            self._columns[key] = self._load_column(key)
+
+        return self._columns[key]
+
+    def __setitem__(self, key, column):
+        if key not in self._keys:
+            self._keys.append(key)
+        self._columns[key] = column
+
+    def __delitem__(self, key):
+        self._keys.remove(key)
+        self._columns.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f'LazyColumns({self._keys})'
+
+
+def get_sidecar_path(csv_path):
+    """Get the sidecar path of a meta csv, named by the csv name and a hash of its absolute path, e.g.,
+    'full_music_pieces.csv.0123456789abcdef.npz'."""
+    sidecars_dir = os.environ.get('GIANTMIDI_PIANO_CACHE_DIR') or SIDECARS_DIR
+    csv_path = os.path.abspath(csv_path)
+    path_hash = hashlib.sha1(csv_path.encode()).hexdigest()[:16]  # noqa: S324
+
+    return os.path.join(sidecars_dir, f'{os.path.basename(csv_path)}.{path_hash}.npz')
+
+
+def _get_csv_signature(csv_path):
+    stat = os.stat(csv_path)
+    return np.array([SIDECAR_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def write_sidecar(csv_path, columns, signature):
+    """Write the columns of a meta csv to its sidecar. Each str column is stored as its '\\n' joined utf-8 bytes, and
+    typed columns are also stored as arrays.
+
+    Args:
+      csv_path: str
+      columns: dict, column name -> list of str
+      signature: 1darray, signature of the csv when the columns were read.
+    """
+    keys = list(columns.keys())
+    arrays = {
+        'signature': signature,
+        'keys': np.array(keys, dtype=np.str_),
+        'rows_num': np.array(len(columns[keys[0]]) if keys else 0, dtype=np.int64),
+    }
+
+    for k, key in enumerate(keys):
+        arrays[f'text_{k}'] = np.frombuffer('\n'.join(columns[key]).encode('utf-8'), dtype=np.uint8)
+
+        if key in COLUMN_DTYPES:
+            try:
+                arrays[f'typed_{k}'] = _parse_column(columns[key], COLUMN_DTYPES[key], key)
+            except ValueError:  # Raised again by MetaTable.read_csv
+                pass
+
+    sidecar_path = get_sidecar_path(csv_path)
+    tmp_path = f'{sidecar_path}.tmp{os.getpid()}_{threading.get_ident()}.npz'
+
+    try:
+        os.makedirs(os.path.dirname(sidecar_path), exist_ok=True)
+        with open(tmp_path, 'wb') as fw:
+            np.savez(fw, **arrays)
+        os.replace(tmp_path, sidecar_path)
+
+    except OSError as e:
+        print(f'Failed to write {sidecar_path}: {e}')
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_sidecar(csv_path):
+    """Load all arrays of the sidecar of a meta csv. The file is closed at once, text columns are still decoded on
+    first access.
+
+    Returns:
+      sidecar: dict | None, array name -> array, None if the sidecar does not exist, is broken, or is older than the
+        csv.
+    """
+    sidecar_path = get_sidecar_path(csv_path)
+
+    if not os.path.isfile(sidecar_path):
+        return None
+
+    try:
+        with np.load(sidecar_path) as npz:
+            if np.array_equal(npz['signature'], _get_csv_signature(csv_path)):
+                return {name: npz[name] for name in npz.files}
+
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+
+    return None
+
+
+def _load_text_column(sidecar, k):
+    if int(sidecar['rows_num']) == 0:
+        return []
+
+    return sidecar[f'text_{k}'].tobytes().decode('utf-8').split('\n')
+
+
+def read_csv_columns(csv_path, cache=True):
+    """Read a tab separated meta csv to a dict of lists of str.
+
+    Args:
+      csv_path: str
+      cache: bool, load columns lazily from the sidecar, and write the sidecar if it is missing or stale.
+
+    Returns:
+      columns: dict | LazyColumns, column name -> list of str
+    """
+    if not cache:
+        return _parse_csv_columns(csv_path)
+
+    sidecar = load_sidecar(csv_path)
+
+    if sidecar is not None:
+        keys = sidecar['keys'].tolist()
+        return LazyColumns(keys, lambda key: _load_text_column(sidecar, keys.index(key)))
+
+    signature = _get_csv_signature(csv_path)
+    columns = _parse_csv_columns(csv_path)
+    write_sidecar(csv_path, columns, signature)
+
+    return columns
+
+
+def _parse_csv_columns(csv_path):
+    """Split the whole file at once, columns are strided slices of the cells if every row has a field of each column.
+
+    Raises:
+      ValueError: a row has fewer fields than the header.
+    """
+    with open(csv_path) as fr:
+        text = fr.read()
+
+    (header, _, body) = text.partition('\n')
+    keys = header.split('\t')
+
+    if body.endswith('\n'):
+        body = body[:-1]
+
+    if not body:
+        return {key: [] for key in keys}
+
+    # Equal totals of cells do not tell that rows are aligned, e.g., a row with an extra field and a row with a missing
+    # one, so the fields of each row are counted
+    if all(line.count('\t') == len(keys) - 1 for line in body.split('\n')):
+        cells = body.replace('\n', '\t').split('\t')
+        return {key: cells[k :: len(keys)] for k, key in enumerate(keys)}
+
+    # Rows with more fields keep the fields of the columns
+    rows = [line.split('\t') for line in body.split('\n')]
+
+    for n, row in enumerate(rows):
+        if len(row) < len(keys):
+            raise ValueError(f'Line {n + 2} of {csv_path} has {len(row)} fields, expected {len(keys)}: {row}')
+
+    return {key: [row[k] for row in rows] for k, key in enumerate(keys)}
+
+
+def write_csv_columns(columns, out_csv_path):
+    """Write a dict of columns to a tab separated meta csv, values are formatted with str.
+
+    Raises:
+      ValueError: the columns have different lengths.
+    """
+    keys = list(columns.keys())
+    lengths = {key: len(columns[key]) for key in keys}
+
+    if len(set(lengths.values())) > 1:
+        raise ValueError(f'Columns have different lengths: {lengths}')
+
+    with open(out_csv_path, 'w') as fw:
+        fw.write('\t'.join(keys) + '\n')
+        fw.writelines('\t'.join(row) + '\n' for row in zip(*[map(str, columns[key]) for key in keys]))
+
+
+def _parse_column(values, dtype, key):
+    """Parse a list of str to an array of dtype.
+
+    Raises:
+      ValueError: a value cannot be parsed, with the column name and the row.
+    """
+    if dtype is np.str_:
+        return np.array(values, dtype=np.str_)
+
+    if np.issubdtype(dtype, np.floating):
+        (parse, missing) = (float, np.nan)
+    else:
+        (parse, missing) = (int, MISSING_INT)
+
+    try:
+        return np.fromiter((parse(value) if value != '' else missing for value in values), dtype, len(values))
+
+    except (ValueError, OverflowError):
+        for n, value in enumerate(values):
+            try:
+                np.array(parse(value) if value != '' else missing, dtype)
+            except (ValueError, OverflowError):
+                raise ValueError(f'Column {key} has {value!r} in row {n}, expected {np.dtype(dtype).name}.') from None
+        raise
+
+
+def _format_column(column, texts=None):
+    """Format an array to a list of str as written in meta csvs, missing values are formatted as ''.
+
+    Args:
+      column: 1darray
+      texts: 1darray of str | None, cells of the column in the csv it was read from. Values that are unchanged keep
+        their cells, so that a csv rewritten without edits keeps its text, e.g., '0.50' is not written as '0.5'.
+    """
+    if np.issubdtype(column.dtype, np.floating):
+        formatted = ['' if value != value else str(value) for value in column.tolist()]
+    elif np.issubdtype(column.dtype, np.integer):
+        formatted = ['' if value == MISSING_INT else str(value) for value in column.tolist()]
+    else:
+        return column.tolist()
+
+    if texts is None or len(texts) != len(column):
+        return formatted
+
+    try:
+        original = _parse_column(texts, column.dtype.type, None)
+    except ValueError:
+        return formatted
+
+    unchanged = original == column
+
+    if np.issubdtype(column.dtype, np.floating):
+        unchanged |= np.isnan(original) & np.isnan(column)
+
+    return [text if same else value for text, value, same in zip(texts.tolist(), formatted, unchanged.tolist())]
+
+
+class MetaTable:
+    def __init__(self, columns, texts=None):
+        """Meta table of music pieces.
+
+        Args:
+          columns: dict, column name -> 1darray, all columns have the same length.
+          texts: dict | None, column name -> 1darray of str, cells of typed columns in the csv they were read from,
+            see _format_column.
+        """
+        self.columns = columns if isinstance(columns, LazyColumns) else dict(columns)
+        self.texts = texts if isinstance(texts, LazyColumns) else dict(texts or {})
+
+    @classmethod
+    def from_meta_dict(cls, meta_dict):
+        """Build a table from a dict of lists. Values of typed columns may be str or numbers.
+
+        Raises:
+          ValueError: a value of a typed column cannot be parsed.
+        """
+        columns = {}
+        texts = {}
+
+        for key, values in meta_dict.items():
+            values = [value if isinstance(value, str) else str(value) for value in values]
+
+            if key in COLUMN_DTYPES:
+                columns[key] = _parse_column(values, COLUMN_DTYPES[key], key)
+                texts[key] = np.array(values, dtype=object)
+            else:
+                columns[key] = np.array(values, dtype=object)
+
+        return cls(columns, texts)
+
+    @classmethod
+    def read_csv(cls, csv_path, cache=True):
+        """Read a tab separated meta csv. Columns are loaded lazily if the sidecar of the csv is up to date."""
+        sidecar = load_sidecar(csv_path) if cache else None
+
+        if sidecar is None:
+            return cls.from_meta_dict(read_csv_columns(csv_path, cache))
+
+        keys = sidecar['keys'].tolist()
+        typed_keys = [key for key in keys if key in COLUMN_DTYPES]
+
+        def _load_column(key):
+            k = keys.index(key)
+
+            if f'typed_{k}' in sidecar:
+                return sidecar[f'typed_{k}']
+
+            values = _load_text_column(sidecar, k)
+
+            if key in COLUMN_DTYPES:
+                return _parse_column(values, COLUMN_DTYPES[key], key)
+
+            return np.array(values, dtype=object)
+
+        def _load_text(key):
+            return np.array(_load_text_column(sidecar, keys.index(key)), dtype=object)
+
+        return cls(LazyColumns(keys, _load_column), LazyColumns(typed_keys, _load_text))
+
+    def write_csv(self, out_csv_path):
+        """Write the table to a tab separated meta csv."""
+        write_csv_columns(self.to_meta_dict(), out_csv_path)
+
+    def to_meta_dict(self):
+        """Convert to a dict of lists of str, the format of read_csv_to_meta_dict."""
+        return {
+            key: _format_column(column, self.texts[key] if key in self.texts else None)
+            for key, column in self.columns.items()
+        }
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def __setitem__(self, key, values):
+        if self.columns and len(values) != len(self):
+            raise ValueError(f'Column {key} has {len(values)} rows, the table has {len(self)} rows.')
+
+        self.columns[key] = np.asarray(values)
+
+        if key in self.texts:
+            del self.texts[key]
+
+    def keys(self):
+        return self.columns.keys()
+
+    def select(self, indexes):
+        """Get the rows selected by a boolean mask or an array of indexes as a new table."""
+        return MetaTable(
+            {key: column[indexes] for key, column in self.columns.items()},
+            {key: self.texts[key][indexes] for key in self.texts if key in self.columns},
+        )
+
+    def is_missing(self, key):
+        """Boolean mask of empty cells of a column."""
+        column = self.columns[key]
+
+        if np.issubdtype(column.dtype, np.floating):
+            return np.isnan(column)
+
+        if np.issubdtype(column.dtype, np.integer):
+            return column == MISSING_INT
+
+        return column == ''
+
+    def flag(self, key):
+        """Boolean mask of rows whose flag column is 1, empty cells are False."""
+        column = self.columns[key]
+
+        if column.dtype.kind in 'OU':
+            return column == '1'
+
+        return column == 1
+
+    def piano_solo_mask(self, surname_in_youtube_title=False):
+        """Boolean mask of downloaded GiantMIDI-Piano pieces.
+
+        Args:
+          surname_in_youtube_title: bool, only select pieces whose YouTube titles contain the surnames of composers.
+        """
+        mask = ~self.is_missing('audio_name') & self.flag('giant_midi_piano')
+
+        if surname_in_youtube_title:
+            mask &= self.flag('surname_in_youtube_title')
+
+        return mask
+
+    def composer_names(self, indexes=None):
+        """Get 'surname, firstname' of all rows, or of the selected rows."""
+        surnames = self.columns['surname'] if indexes is None else self.columns['surname'][indexes]
+        firstnames = self.columns['firstname'] if indexes is None else self.columns['firstname'][indexes]
+
+        return np.array([f'{surname}, {firstname}' for surname, firstname in zip(surnames, firstnames)], dtype=object)
@@ -0,0 +1,131 @@
+"""Manifest of transcribed midi files. Each transcription writer appends {'mp3_hash', 'midi_hash', 'midi_size'} of a
+finished midi file to its own journal in midis_dir/_manifests, so that re-runs skip mp3s whose midi files are complete
+and whose mp3s are unchanged, and corrupt midi files can be found without transcribing again."""
+
+import hashlib
+import os
+import struct
+
+from .journal import Journal, read_journals
+
+MANIFESTS_DIR = '_manifests'
+
+
+def hash_file(path):
+    blake = hashlib.blake2b(digest_size=16)
+
+    with open(path, 'rb') as fr:
+        for chunk in iter(lambda: fr.read(1 << 20), b''):
+            blake.update(chunk)
+
+    return blake.hexdigest()
+
+
+def check_midi(midi_path):
+    """Check the chunk structure of a midi file without parsing its events: a MThd header followed by the declared
+    number of MTrk chunks, each within the file and ended by an end of track meta event.
+
+    Returns:
+      error: str | None, None if the midi file is valid.
+    """
+    try:
+        with open(midi_path, 'rb') as fr:
+            data = fr.read()
+    except OSError as e:
+        return str(e)
+
+    if len(data) < 14 or data[:4] != b'MThd':  # noqa: PLR2004
+        return 'no MThd header'
+
+    (header_len, _, tracks_num, _) = struct.unpack('>IHHH', data[4:14])
+    pos = 8 + header_len
+    found_num = 0
+
+    while pos < len(data):
+        if pos + 8 > len(data):
+            return f'truncated chunk header at byte {pos}'
+
+        (chunk_type, chunk_len) = struct.unpack('>4sI', data[pos : pos + 8])
+        end = pos + 8 + chunk_len
+
+        if end > len(data):
+            return f'truncated {chunk_type!r} chunk at byte {pos}'
+
+        if chunk_type == b'MTrk':
+            if data[end - 3 : end] != b'\xff\x2f\x00':
+                return f'track {found_num} has no end of track'
+            found_num += 1
+
+        pos = end
+
+    if found_num != tracks_num:
+        return f'{found_num} out of {tracks_num} tracks'
+
+    return None
+
+
+class MidiManifest:
+    def __init__(self, midis_dir, name):
+        """Manifest of the midi files of midis_dir, read from the journals of all writers.
+
+        Args:
+          midis_dir: str
+          name: str, name of the journal of this writer, e.g., the shard or the worker.
+        """
+        self.midis_dir = midis_dir
+        manifests_dir = os.path.join(midis_dir, MANIFESTS_DIR)
+
+        self.records = read_journals(manifests_dir)
+        self.journal = Journal(os.path.join(manifests_dir, f'{name}.jsonl'))
+
+    def is_done(self, audio_name, mp3_hash, midi_path):
+        """Whether the midi file of an mp3 is complete. A midi file transcribed before the manifest is adopted if its
+        chunk structure is valid. Use verify to check the hashes of midi files."""
+        record = self.records.get(audio_name)
+
+        if record is None:
+            if os.path.isfile(midi_path) and check_midi(midi_path) is None:
+                self.add(audio_name, mp3_hash, midi_path)
+                return True
+            return False
+
+        return (
+            record['mp3_hash'] == mp3_hash
+            and os.path.isfile(midi_path)
+            and os.path.getsize(midi_path) == record['midi_size']
+        )
+
+    def add(self, audio_name, mp3_hash, midi_path):
+        record = {'mp3_hash': mp3_hash, 'midi_hash': hash_file(midi_path), 'midi_size': os.path.getsize(midi_path)}
+        self.journal.append(audio_name, record)
+        self.records[audio_name] = record
+
+    def verify(self, audio_name, midi_path):
+        """Verify a midi file by its hash in the manifest and its chunk structure.
+
+        Returns:
+          error: str | None, None if the midi file is valid.
+        """
+        record = self.records.get(audio_name)
+
+        if not os.path.isfile(midi_path):
+            return 'missing'
+
+        if record is not None and hash_file(midi_path) != record['midi_hash']:
+            return 'hash differs from the manifest'
+
+        return check_midi(midi_path)
+
+
+def write_atomic(write, midi_path):
+    """Call write(path) on a temporary file and rename it to midi_path, so that a killed process leaves no truncated
+    midi file."""
+    tmp_path = f'{midi_path}.tmp{os.getpid()}'
+
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, midi_path)
+
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
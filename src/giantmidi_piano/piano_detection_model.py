@@ -1,5 +1,8 @@
 """This piano solo detection module is trained by Bochen Li in Feb. 2020, and then is cleaned up by Qiuqiang Kong in Jul. 2020."""
 
+import collections
+import time
+
 import librosa
 import numpy as np
 import torch
@@ -25,6 +28,18 @@ DIM_F = 256
 DIM_T = 64
 DIM_T_HOP = 64
 
+# A segment of PianoSoloDetector.predict is wav[i * SR : (i + 1) * SR + SEG_EXTRA]
+SEG_EXTRA = 1000
+SEG_LEN = SR + SEG_EXTRA
+SILENCE_RMS = 0.001
+
+# Window of the first DIM_T frames of a segment. The part of a frame before the segment is zeroed, as the zero padding
+# of wav2spec_mono (center=True).
+SEG_WIN = np.tile(WIN, (DIM_T, 1))
+for _t in range(DIM_T):
+    SEG_WIN[_t, : max(0, N_FFT // 2 - _t * FRAME_HOP)] = 0
+SEG_WIN = SEG_WIN.astype(np.float32)
+
 
 def read_audio_stereo(filename):
     wav, _ = librosa.core.load(filename, sr=SR, mono=None)
@@ -94,6 +109,166 @@ def spec2wav(mag, ang):
     return wav
 
 
+def iterate_segment_spectrograms(wav, scale=1.0, batch_size=32, seg_indexes=None):
+    """Compute the magnitude spectrograms of the 1-second segments of a recording batch by batch.
+
+    Equals wav2spec(wav_seg)[0][..., :DIM_T] of each segment. The frames of a batch are strided views of the whole
+    recording, and only the magnitudes of the first DIM_F bins of a single batched FFT are kept.
+
+    Args:
+      wav: (samples_num,)
+      scale: float, the recording is multiplied by scale.
+      batch_size: int
+      seg_indexes: (n,) | None, indexes of the segments to compute in this order, None computes all segments.
+
+    Yields:
+      segs_rms: (segs_num,), RMS of each scaled segment.
+      x: (segs_num, 1, DIM_T, DIM_F), input of PianoDetection.
+    """
+    pad = N_FFT // 2
+    segs_num = int(len(wav) / SR)
+
+    # Zero padding before the recording and after the last frame
+    padded = np.zeros(pad + max(len(wav), segs_num * SR + SEG_EXTRA) + N_FFT, dtype=np.float32)
+    np.multiply(wav, scale, out=padded[pad : pad + len(wav)], casting='unsafe')
+    step = padded.strides[0]
+
+    all_segs = np.lib.stride_tricks.as_strided(
+        padded[pad:], shape=(segs_num, SEG_LEN), strides=(SR * step, step), writeable=False
+    )
+
+    # Frame t of segment i starts at sample i * SR + t * FRAME_HOP - N_FFT // 2 of the recording
+    all_frames = np.lib.stride_tricks.as_strided(
+        padded, shape=(segs_num, DIM_T, N_FFT), strides=(SR * step, FRAME_HOP * step, step), writeable=False
+    )
+
+    total = segs_num if seg_indexes is None else len(seg_indexes)
+
+    for bgn in range(0, total, batch_size):
+        if seg_indexes is None:
+            idxs = np.arange(bgn, min(bgn + batch_size, segs_num))
+            batch = slice(idxs[0], idxs[-1] + 1)
+        else:
+            batch = idxs = np.asarray(seg_indexes[bgn : bgn + batch_size])
+
+        segs = all_segs[batch]
+        lens = np.minimum(SEG_LEN, len(wav) - idxs * SR)
+        segs_rms = np.sqrt(np.square(segs, dtype=np.float64).sum(axis=1) / lens)
+
+        mag = np.abs(np.fft.rfft(all_frames[batch] * SEG_WIN, axis=-1)[..., :DIM_F]).astype(np.float32)
+
+        yield segs_rms, mag[:, None, :, :]
+
+
+def iterate_segment_spectrograms_stream(blocks, scale=1.0, batch_size=32):
+    """Compute the magnitude spectrograms of the 1-second segments of a recording read block by block.
+
+    Each segment only depends on its own SEG_LEN samples, so a batch is computed by iterate_segment_spectrograms on
+    batch_size * SR + SEG_EXTRA samples of the recording, and the outputs are equal. At most one batch of samples and
+    one block are kept in memory.
+
+    Args:
+      blocks: iterable of (block_samples_num,), consecutive blocks of a recording.
+      scale: float, the recording is multiplied by scale.
+      batch_size: int
+
+    Yields:
+      segs_rms: (segs_num,), RMS of each scaled segment.
+      x: (segs_num, 1, DIM_T, DIM_F), input of PianoDetection.
+    """
+    batch_len = batch_size * SR + SEG_EXTRA
+    buffer = np.zeros(0, dtype=np.float32)
+
+    for block in blocks:
+        buffer = np.concatenate((buffer, np.asarray(block, dtype=np.float32)))
+
+        while len(buffer) >= batch_len:
+            yield from iterate_segment_spectrograms(buffer[:batch_len], scale, batch_size)
+            buffer = buffer[batch_size * SR :]
+
+    yield from iterate_segment_spectrograms(buffer, scale, batch_size)
+
+
+def iterate_audio_blocks(wav, block_len=SR * 32):
+    """Iterate a recording, e.g., a memory-mapped file, in float32 blocks."""
+    for bgn in range(0, len(wav), block_len):
+        yield np.asarray(wav[bgn : bgn + block_len], dtype=np.float32)
+
+
+def iterate_segment_spectrograms_torch(wav, scale=1.0, batch_size=32, device='cpu', seg_indexes=None):
+    """Compute the magnitude spectrograms of the 1-second segments of a recording with torch.stft on device.
+
+    Same as iterate_segment_spectrograms, but the recording is copied to device once, and all following steps stay
+    on device.
+
+    Args:
+      wav: (samples_num,)
+      scale: float, the recording is multiplied by scale.
+      batch_size: int
+      device: str | torch.device
+      seg_indexes: (n,) | None, indexes of the segments to compute in this order, None computes all segments.
+
+    Yields:
+      segs_rms: tensor, (segs_num,), RMS of each scaled segment.
+      x: tensor, (segs_num, 1, DIM_T, DIM_F), input of PianoDetection.
+    """
+    pad = N_FFT // 2
+    segs_num = int(len(wav) / SR)
+    window = torch.as_tensor(WIN, dtype=torch.float32, device=device)
+
+    # Samples of a segment read by its first DIM_T frames, including the zero padding before the segment
+    span = (DIM_T - 1) * FRAME_HOP + N_FFT
+
+    padded = torch.zeros(pad + max(len(wav), segs_num * SR + SEG_EXTRA) + N_FFT, dtype=torch.float32, device=device)
+    padded[pad : pad + len(wav)] = torch.as_tensor(wav, dtype=torch.float32).to(device) * scale
+
+    lens = torch.clamp(len(wav) - torch.arange(segs_num, device=device) * SR, max=SEG_LEN)
+
+    # Recordings shorter than a segment are shorter than the span of unfold
+    if segs_num == 0:
+        return
+
+    all_segs = padded[pad:].unfold(0, SEG_LEN, SR)[:segs_num]
+    all_frames = padded.unfold(0, span, SR)[:segs_num]
+
+    total = segs_num if seg_indexes is None else len(seg_indexes)
+
+    for bgn in range(0, total, batch_size):
+        if seg_indexes is None:
+            batch = slice(bgn, min(bgn + batch_size, segs_num))
+        else:
+            batch = torch.as_tensor(np.asarray(seg_indexes[bgn : bgn + batch_size]), device=device)
+
+        segs = all_segs[batch]
+        segs_rms = torch.sqrt(torch.sum(segs.double() ** 2, dim=1) / lens[batch])
+
+        frames = all_frames[batch].clone()
+        frames[:, :pad] = 0
+
+        spec = torch.stft(
+            frames,
+            n_fft=N_FFT,
+            hop_length=FRAME_HOP,
+            win_length=FRAME_LEN,
+            window=window,
+            center=False,
+            return_complex=True,
+        )  # (segs_num, N_FFT // 2 + 1, DIM_T)
+        x = spec[:, :DIM_F, :].abs().transpose(1, 2)[:, None, :, :]
+
+        yield segs_rms, x
+
+
+FRONT_ENDS = ['numpy', 'torch']
+COMPILE_MODES = ['none', 'torchscript', 'compile']
+PRECISIONS = ['fp32', 'int8', 'bf16']
+CHECKPOINT_PATH = 'resources/piano_solo_model_32k.pth'
+
+# Half width in standard errors of the confidence interval of PianoSoloDetector.predict_sequential. Wider than the 99%
+# interval, as the interval is tested after each batch.
+SEQUENTIAL_Z = 3.0
+
+
 class ConvBlock(nn.Module):
     def __init__(self, in_plane, out_plane, droprate=0.0):
         super(ConvBlock, self).__init__()
@@ -111,53 +286,280 @@ class ConvBlock(nn.Module):
         return out
 
 
+def get_scale(rms):
+    """Get the scale of a recording whose RMS is rms, as the recordings the detector is trained on.
+
+    Returns:
+      scale: float | None, None if the recording is silent or has non-finite samples, whose segments are all
+        predicted as not piano solo.
+    """
+    if rms == 0 or not np.isfinite(rms):
+        return None
+
+    return 1 / rms / 20
+
+
+def compute_segment_spectrograms(wav, batch_size=32):
+    """Compute the RMS and spectrograms of all segments of a recording, scaled as in PianoSoloDetector.predict.
+
+    Segments of a silent recording, or of a recording with non-finite samples, have zero RMS and spectrograms, so
+    that they are predicted as not piano solo.
+
+    Returns:
+      segs_rms: (segs_num,)
+      x: (segs_num, 1, DIM_T, DIM_F)
+    """
+    scale = get_scale(np.sqrt(np.mean(wav**2)))
+
+    if scale is None:
+        segs_num = int(len(wav) / SR)
+        return np.zeros(segs_num), np.zeros((segs_num, 1, DIM_T, DIM_F), dtype=np.float32)
+
+    batches = list(iterate_segment_spectrograms(wav, scale, batch_size))
+
+    if not batches:
+        return np.zeros(0), np.zeros((0, 1, DIM_T, DIM_F), dtype=np.float32)
+
+    return np.concatenate([segs_rms for segs_rms, _ in batches]), np.concatenate([x for _, x in batches])
+
+
+def stratified_segment_order(segs_num, strata_num=32, seed=1234):
+    """Order segments so that every strata_num consecutive segments are a stratified sample of a recording.
+
+    The segments are split into strata_num contiguous strata, and the n-th round of the order takes a random unused
+    segment of each stratum.
+
+    Returns:
+      seg_indexes: (segs_num,)
+    """
+    rng = np.random.RandomState(seed)
+    strata = [rng.permutation(stratum) for stratum in np.array_split(np.arange(segs_num), strata_num)]
+    rounds = max((len(stratum) for stratum in strata), default=0)
+
+    return np.array([stratum[r] for r in range(rounds) for stratum in strata if r < len(stratum)], dtype=np.int64)
+
+
 class PianoSoloDetector:
-    def __init__(self):
-        """Piano solo detector."""
-        self.model = PianoDetection()
+    def __init__(  # noqa: PLR0913
+        self,
+        front_end='numpy',
+        checkpoint_path=CHECKPOINT_PATH,
+        channels_last=False,
+        compile_mode='none',
+        precision='fp32',
+        device=None,
+    ):
+        """Piano solo detector.
 
-        if torch.cuda.is_available():
-            self.model = self.model.cuda()
+        Args:
+          front_end: str, 'numpy' computes spectrograms with NumPy on host, 'torch' computes spectrograms with
+            torch.stft on the device of the model.
+          checkpoint_path: str
+          channels_last: bool, see PianoDetectionInference.
+          compile_mode: str, see PianoDetectionInference.
+          precision: str, see PianoDetectionInference.
+          device: str | torch.device | None, see PianoDetectionInference.
+        """
+        if front_end not in FRONT_ENDS:
+            raise ValueError(f'Unknown front end {front_end}, expected one of {FRONT_ENDS}.')
 
-        self.model.load('resources/piano_solo_model_32k.pth')
+        self.front_end = front_end
+        self.model = PianoDetectionInference(
+            checkpoint_path, device=device, channels_last=channels_last, compile_mode=compile_mode, precision=precision
+        )
 
-    def predict(self, wav):
-        """Predict the probabilities of piano solo on 1-second segments."""
-        rms = np.sqrt(np.mean(wav**2))
-        wav = wav / rms / 20
-        duration = len(wav) / SR
+    def _iterate_batches(self, wav, scale, batch_size=32, seg_indexes=None):
+        if self.front_end == 'torch':
+            return iterate_segment_spectrograms_torch(wav, scale, batch_size, self.model.device, seg_indexes)
 
-        n_seg = int(duration / 1.00)
+        return iterate_segment_spectrograms(wav, scale, batch_size, seg_indexes)
+
+    def predict(self, wav):
+        """Predict the probabilities of piano solo on 1-second segments. The segments of a silent recording, or of a
+        recording with non-finite samples, are all 0."""
+        scale = get_scale(np.sqrt(np.mean(wav**2)))
 
-        mag_segs = []
-        batch_size = 32
+        if scale is None:
+            return np.zeros(int(len(wav) / SR), dtype=np.float32)
 
         all_probs = []
-        zero_locts = []
+        all_segs_rms = []
 
-        for i in np.arange(n_seg):
-            wav_seg = wav[i * SR : (i + 1) * SR + 1000]
+        # Probabilities stay on device until all segments are predicted
+        for segs_rms, x in self._iterate_batches(wav, scale):
+            all_probs.append(self.model(x))
+            all_segs_rms.append(torch.as_tensor(segs_rms))
 
-            if np.sqrt(np.mean(wav_seg**2)) < 0.001:
-                zero_locts.append(i)
+        if not all_probs:
+            return np.zeros(0, dtype=np.float32)
 
-            mag, ang = wav2spec(wav_seg)
-            mag = mag[..., :DIM_T]
+        all_probs = torch.cat(all_probs).cpu().numpy()
+        all_probs[torch.cat(all_segs_rms).cpu().numpy() < SILENCE_RMS] = 0
 
-            mag_segs.append(mag)
+        return all_probs
 
-            if len(mag_segs) == batch_size or i == n_seg - 1:
-                probs = self.predict_seg(np.array(mag_segs))
-                all_probs.append(probs)
-                mag_segs = []
+    def predict_files(self, items, batch_size=32):
+        """Predict the segments of many recordings in full batches that cross the boundaries of recordings.
 
-        all_probs = np.concatenate(all_probs)
-        zero_locts = np.array(zero_locts)
+        Args:
+          items: iterable of (key, segs_rms, x), segments of each recording, e.g., computed by
+            compute_segment_spectrograms in other processes.
+          batch_size: int
+
+        Yields:
+          key: key of a recording, in the order of items.
+          probs: (segs_num,), probabilities of piano solo of the recording, equals self.predict(wav).
+          inference_time: float, the share of the recording in the seconds of the batches of its segments.
+        """
+        # Recordings whose probabilities are not all predicted: [key, segs_rms, segments not predicted, probs, seconds]
+        files = collections.deque()
 
-        if len(zero_locts) > 0:
-            all_probs[zero_locts] = 0
+        # Segments waiting for a batch: (file, x)
+        chunks = collections.deque()
+        chunks_len = 0
 
-        return all_probs
+        def _predict_batch(n):
+            xs = []
+            owners = []
+
+            while n > 0:
+                (file, x) = chunks.popleft()
+
+                if len(x) > n:
+                    chunks.appendleft((file, x[n:]))
+                    x = x[:n]
+
+                xs.append(x)
+                owners.append(file)
+                n -= len(x)
+
+            bgn_time = time.time()
+            probs = self.model(np.concatenate(xs)).cpu().numpy()
+            elapsed = time.time() - bgn_time
+            batch_len = len(probs)
+            bgn = 0
+
+            for file, x in zip(owners, xs):
+                file[3].append(probs[bgn : bgn + len(x)])
+                file[2] -= len(x)
+                file[4] += elapsed * len(x) / batch_len
+                bgn += len(x)
+
+        def _pop_finished():
+            while files and files[0][2] == 0:
+                (key, segs_rms, _, probs, inference_time) = files.popleft()
+                probs = np.concatenate(probs) if probs else np.zeros(0, dtype=np.float32)
+                probs[segs_rms < SILENCE_RMS] = 0
+                yield key, probs, inference_time
+
+        for key, segs_rms, x in items:
+            file = [key, segs_rms, len(x), [], 0.0]
+            files.append(file)
+
+            if len(x):
+                chunks.append((file, x))
+                chunks_len += len(x)
+
+            while chunks_len >= batch_size:
+                _predict_batch(batch_size)
+                chunks_len -= batch_size
+
+            yield from _pop_finished()
+
+        if chunks_len:
+            _predict_batch(chunks_len)
+
+        yield from _pop_finished()
+
+    def predict_sequential(  # noqa: PLR0913
+        self, wav, threshold=0.5, z=SEQUENTIAL_Z, batch_size=32, min_segs_num=32, seed=1234
+    ):
+        """Estimate the mean piano solo probability of a recording from a stratified sample of its segments.
+
+        Segments are predicted batch by batch in the order of stratified_segment_order, so that each batch samples
+        every part of the recording. Prediction stops as soon as the confidence interval mean +- z * std / sqrt(n),
+        with the finite population correction, is above or below threshold. The interval of simple random sampling
+        is wider than the one of stratified sampling, so the test is conservative.
+
+        Args:
+          wav: (samples_num,)
+          threshold: float
+          z: float, half width of the confidence interval in standard errors.
+          batch_size: int
+          min_segs_num: int, minimum number of segments predicted before stopping.
+          seed: int, seed of the sampling order, the same recording is always sampled in the same order.
+
+        Returns:
+          prob: float, mean probability of the predicted segments, equals np.mean(self.predict(wav)) if all
+            segments are predicted.
+          segs_num: int, number of predicted segments, 0 for a silent recording or a recording with non-finite
+            samples, whose probability is 0.
+
+        Raises:
+          ValueError: the recording is shorter than a segment.
+        """
+        total = int(len(wav) / SR)
+
+        if total == 0:
+            raise ValueError('The recording is shorter than a segment.')
+
+        scale = get_scale(np.sqrt(np.mean(wav**2)))
+
+        if scale is None:
+            return 0.0, 0
+
+        seg_indexes = stratified_segment_order(total, batch_size, seed)
+        probs = np.zeros(0)
+
+        for segs_rms, x in self._iterate_batches(wav, scale, batch_size, seg_indexes):
+            batch_probs = self.model(x).cpu().numpy().astype(np.float64)
+            batch_probs[torch.as_tensor(segs_rms).cpu().numpy() < SILENCE_RMS] = 0
+            probs = np.concatenate((probs, batch_probs))
+
+            n = len(probs)
+
+            if n < min(min_segs_num, total) or n == total:
+                continue
+
+            half_width = z * np.std(probs, ddof=1) / np.sqrt(n) * np.sqrt((total - n) / (total - 1))
+
+            if np.mean(probs) - half_width > threshold or np.mean(probs) + half_width < threshold:
+                break
+
+        return float(np.mean(probs)), len(probs)
+
+    def predict_stream(self, wav, batch_size=32):
+        """Predict the probabilities of piano solo on 1-second segments of a long recording with bounded memory.
+
+        The recording is read in two passes, the first pass computes the RMS of the recording block by block, and the
+        second pass predicts segments batch by batch. The probabilities equal self.predict(wav), up to the rounding of
+        the RMS, which is accumulated in float64 here.
+
+        Args:
+          wav: (samples_num,), a recording that can be sliced, e.g., np.memmap of a decoded audio, see
+            audio_decoder.decode_audio_to_file.
+          batch_size: int
+
+        Yields:
+          probs: (segs_num,), probabilities of consecutive segments, batch by batch. An empty recording yields no
+            probabilities, as self.predict(wav) returns none. A silent recording, or a recording with non-finite
+            samples, yields zeros.
+        """
+        if len(wav) == 0:
+            return
+
+        sum_squares = sum(np.square(block, dtype=np.float64).sum() for block in iterate_audio_blocks(wav))
+        scale = get_scale(np.sqrt(sum_squares / len(wav)).astype(np.float32))
+
+        if scale is None:
+            if len(wav) >= SR:
+                yield np.zeros(int(len(wav) / SR), dtype=np.float32)
+            return
+
+        for segs_rms, x in iterate_segment_spectrograms_stream(iterate_audio_blocks(wav), scale, batch_size):
+            probs = self.model(x).cpu().numpy()
+            probs[segs_rms < SILENCE_RMS] = 0
+            yield probs
 
     def predict_seg(self, mag_seg):
         """Predict the probability of piano solo on each segment.
@@ -169,11 +571,122 @@ class PianoSoloDetector:
           probs: (batch_size,)
         """
         x = np.transpose(mag_seg, (0, 1, 3, 2))
-        y = self.model.predict_on_batch(x)  # (batch_size, classes_num)
-        probs = y[:, 1]
+        probs = self.model(x).cpu().numpy()
         return probs
 
 
+def fold_batch_norm(conv, bn):
+    """Fold an eval mode BatchNorm2d into the preceding Conv2d.
+
+    Returns:
+      fused: Conv2d with bias, fused(x) == bn(conv(x)).
+    """
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    bias = conv.bias if conv.bias is not None else torch.zeros_like(bn.running_mean)
+
+    fused = nn.Conv2d(
+        conv.in_channels,
+        conv.out_channels,
+        kernel_size=conv.kernel_size,
+        stride=conv.stride,
+        padding=conv.padding,
+        bias=True,
+    )
+    fused.weight.data = conv.weight.data * scale.data[:, None, None, None]
+    fused.bias.data = (bias.data - bn.running_mean) * scale.data + bn.bias.data
+
+    return fused
+
+
+class FusedCNN(nn.Module):
+    def __init__(self, cnn):
+        """CNN for inference, the BatchNorm of each ConvBlock is folded into its conv, and softmax is applied."""
+        super(FusedCNN, self).__init__()
+
+        blocks = [cnn.cnn1, cnn.cnn2, cnn.cnn3, cnn.cnn4]
+        self.convs = nn.ModuleList([fold_batch_norm(block.conv, block.bn) for block in blocks])
+        self.fn1 = cnn.fn1
+        self.fn2 = cnn.fn2
+
+    def forward(self, x):
+        for conv in self.convs:
+            x = F.avg_pool2d(F.relu(conv(x)), 2)
+
+        x = torch.flatten(x, 1)
+        x = F.relu(self.fn1(x))
+        x = self.fn2(x)
+
+        return F.softmax(x, dim=1)
+
+
+def load_cnn(checkpoint_path):
+    """Load the CNN of a PianoDetection checkpoint without the optimizer and loss of PianoDetection."""
+    state_dict = torch.load(checkpoint_path, map_location='cpu')
+
+    cnn = CNN()
+    cnn.load_state_dict({key[len('net.') :]: value for key, value in state_dict.items() if key.startswith('net.')})
+
+    return cnn.eval()
+
+
+class PianoDetectionInference:
+    def __init__(  # noqa: PLR0913
+        self, checkpoint_path=CHECKPOINT_PATH, device=None, channels_last=False, compile_mode='none', precision='fp32'
+    ):
+        """Inference of the piano solo CNN. BatchNorms are folded into convs, parameters do not require gradients,
+        and inputs are predicted under torch.inference_mode.
+
+        Args:
+          checkpoint_path: str
+          device: str | torch.device | None, None uses cuda if available.
+          channels_last: bool, use the channels last memory format, which is faster for convs on some CPUs.
+          compile_mode: str, 'none' | 'torchscript' (scripted and frozen) | 'compile' (torch.compile)
+          precision: str, 'fp32' | 'int8' (dynamic quantization of the fully connected layers, PyTorch does not
+            quantize convs dynamically, CPU only) | 'bf16' (convs and fully connected layers run in bfloat16 under
+            autocast, fast on CPUs with AVX512-BF16 or AMX)
+        """
+        if compile_mode not in COMPILE_MODES:
+            raise ValueError(f'Unknown compile mode {compile_mode}, expected one of {COMPILE_MODES}.')
+
+        if precision not in PRECISIONS:
+            raise ValueError(f'Unknown precision {precision}, expected one of {PRECISIONS}.')
+
+        self.device = torch.device(device if device else ('cuda' if torch.cuda.is_available() else 'cpu'))
+        self.memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        self.precision = precision
+
+        model = FusedCNN(load_cnn(checkpoint_path)).eval()
+        model.requires_grad_(False)
+
+        if precision == 'int8':
+            if self.device.type != 'cpu':
+                raise ValueError('int8 dynamic quantization runs on CPU only.')
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+        model = model.to(self.device, memory_format=self.memory_format)
+
+        if compile_mode == 'torchscript':
+            model = torch.jit.freeze(torch.jit.script(model))
+        elif compile_mode == 'compile':
+            model = torch.compile(model)
+
+        self.model = model
+
+    def __call__(self, x):
+        """Predict the probability of piano solo on each segment.
+
+        Args:
+          x: ndarray | tensor, (batch_size, 1, DIM_T, DIM_F)
+
+        Returns:
+          probs: tensor on device, (batch_size,)
+        """
+        with torch.inference_mode(), torch.autocast(self.device.type, torch.bfloat16, self.precision == 'bf16'):
+            x = torch.as_tensor(x, dtype=torch.float32).to(self.device)
+            x = x.contiguous(memory_format=self.memory_format)
+            return self.model(x)[:, 1].float()
+
+
 class PianoDetection(nn.Module):
     def __init__(self):
         super(PianoDetection, self).__init__()
@@ -0,0 +1,214 @@
+import random
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from urllib.parse import urlsplit
+
+TOO_MANY_REQUESTS = 'Too Many Requests'
+DEFAULT_MAX_REQUESTS_PER_SECOND = 10.0
+
+
+def get_host(url):
+    """Get the host of an url, e.g., 'www.youtube.com'."""
+    return urlsplit(url).netloc
+
+
+def is_too_many_requests(text):
+    """Return True if the stderr of youtube-dl or wget reports HTTP 429."""
+    return TOO_MANY_REQUESTS in text
+
+
+class RateLimitController:
+    def __init__(  # noqa: PLR0913
+        self,
+        requests_per_second=None,
+        max_requests_per_second=None,
+        min_requests_per_second=0.01,
+        increase=0.05,
+        decrease=0.5,
+        base_backoff=1.0,
+        max_backoff=600.0,
+        burst=1,
+    ):
+        """Rate limit controller shared by all network stages. Each host has a token bucket.
+
+        The rate of a bucket is learned from observed HTTP 429: it is multiplied by `decrease` on each 429, and
+        increased by `increase` on each success (AIMD), but never above the configured rate. A 429 also pauses the
+        host for an exponential backoff with full jitter, so a short throttle costs seconds instead of a fixed hour.
+
+        Args:
+          requests_per_second: float, initial rate of each host. 0 or None means unlimited until the first 429.
+          max_requests_per_second: float | None, upper bound of the learned rate. None bounds it by
+            `requests_per_second`, or by 10 requests/s if the initial rate is unlimited. A value above
+            `requests_per_second` lets the rate grow beyond the configured one.
+          min_requests_per_second: float, lower bound of the learned rate.
+          increase: float, additive increase of the rate after a success.
+          decrease: float, multiplicative decrease of the rate after a 429.
+          base_backoff: float, backoff seconds of the first 429.
+          max_backoff: float, upper bound of backoff seconds.
+          burst: int, capacity of each bucket.
+        """
+        self.requests_per_second = requests_per_second
+        self.max_requests_per_second = max_requests_per_second
+        self.min_requests_per_second = min_requests_per_second
+        self.increase = increase
+        self.decrease = decrease
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.burst = burst
+
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.stage_metrics = {}
+
+    def set_requests_per_second(self, requests_per_second):
+        """Set the initial rate of each host, including hosts already requested."""
+        with self.lock:
+            self.requests_per_second = requests_per_second
+
+            for bucket in self.buckets.values():
+                bucket['rate'] = requests_per_second or None
+
+    def _max_rate(self):
+        if self.max_requests_per_second is not None:
+            return self.max_requests_per_second
+        return self.requests_per_second or DEFAULT_MAX_REQUESTS_PER_SECOND
+
+    def _bucket(self, host):
+        if host not in self.buckets:
+            self.buckets[host] = {
+                'rate': self.requests_per_second or None,
+                'tokens': float(self.burst),
+                'time': time.monotonic(),
+                'paused_until': 0.0,
+                'consecutive_429': 0,
+            }
+        return self.buckets[host]
+
+    def _metrics(self, stage):
+        if stage not in self.stage_metrics:
+            self.stage_metrics[stage] = {'requests': 0, 'successes': 0, 'throttled': 0, 'wait_seconds': 0.0}
+        return self.stage_metrics[stage]
+
+    def acquire(self, host, stage='default'):
+        """Block until a request to the host is allowed."""
+        while True:
+            with self.lock:
+                bucket = self._bucket(host)
+                now = time.monotonic()
+
+                if now < bucket['paused_until']:
+                    wait_seconds = bucket['paused_until'] - now
+
+                elif bucket['rate'] is None:
+                    self._metrics(stage)['requests'] += 1
+                    return
+
+                else:
+                    elapsed = now - bucket['time']
+                    bucket['tokens'] = min(self.burst, bucket['tokens'] + elapsed * bucket['rate'])
+                    bucket['time'] = now
+
+                    if bucket['tokens'] >= 1:
+                        bucket['tokens'] -= 1
+                        self._metrics(stage)['requests'] += 1
+                        return
+
+                    wait_seconds = (1 - bucket['tokens']) / bucket['rate']
+
+                self._metrics(stage)['wait_seconds'] += wait_seconds
+
+            time.sleep(wait_seconds)
+
+    def report_success(self, host, stage='default'):
+        """Additively increase the rate of the host after a successful request."""
+        with self.lock:
+            bucket = self._bucket(host)
+            bucket['consecutive_429'] = 0
+            if bucket['rate'] is not None:
+                bucket['rate'] = min(self._max_rate(), bucket['rate'] + self.increase)
+            self._metrics(stage)['successes'] += 1
+
+    def report_throttled(self, host, stage='default'):
+        """Decrease the rate of the host and pause it after HTTP 429.
+
+        Returns:
+          backoff: float, seconds the host is paused.
+        """
+        with self.lock:
+            bucket = self._bucket(host)
+            rate = bucket['rate'] if bucket['rate'] is not None else self._max_rate()
+            bucket['rate'] = max(self.min_requests_per_second, rate * self.decrease)
+
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** bucket['consecutive_429'])
+            backoff = random.uniform(0, backoff)  # noqa: S311
+            bucket['consecutive_429'] += 1
+            bucket['paused_until'] = max(bucket['paused_until'], time.monotonic() + backoff)
+            bucket['tokens'] = 0.0
+
+            self._metrics(stage)['throttled'] += 1
+
+        return backoff
+
+    def get_metrics(self):
+        """Get per-stage metrics, e.g., {'search': {'requests': 10, 'successes': 9, 'throttled': 1, ...}}."""
+        with self.lock:
+            metrics = {stage: dict(stage_metrics) for stage, stage_metrics in self.stage_metrics.items()}
+            rates = {host: bucket['rate'] for host, bucket in self.buckets.items()}
+
+        return {'stages': metrics, 'rates': rates}
+
+    def print_metrics(self):
+        metrics = self.get_metrics()
+
+        for stage, stage_metrics in metrics['stages'].items():
+            print(
+                f"{stage}: requests: {stage_metrics['requests']}, successes: {stage_metrics['successes']}, "
+                f"throttled: {stage_metrics['throttled']}, wait: {stage_metrics['wait_seconds']:.3f} s"
+            )
+
+        for host, rate in metrics['rates'].items():
+            print(f'{host}: {rate if rate is not None else "unlimited"} requests/s')
+
+
+class RateLimitManager(BaseManager):
+    """Serve one RateLimitController to many processes, e.g.,
+
+    with RateLimitManager() as manager:
+        rate_limiter = manager.RateLimitController(requests_per_second=1.0)
+
+    The proxy rate_limiter can be passed to worker processes, whose requests then share the buckets of hosts. A
+    controller per process would allow the configured rate in each process.
+    """
+
+
+RateLimitManager.register('RateLimitController', RateLimitController)
+
+_shared_controller = None
+
+
+def get_rate_limit_controller(requests_per_second=None):
+    """Get the controller shared by all network stages of this process.
+
+    Args:
+      requests_per_second: float | None, initial rate of each host, 0 means unlimited. None keeps the rate of the
+        shared controller. A rate different from the one the shared controller was given raises ValueError.
+    """
+    global _shared_controller  # noqa: PLW0603
+
+    if _shared_controller is None:
+        _shared_controller = RateLimitController(requests_per_second=requests_per_second)
+
+    elif requests_per_second is not None:
+        current = _shared_controller.requests_per_second
+
+        if current is None:
+            _shared_controller.set_requests_per_second(requests_per_second)
+
+        elif (current or None) != (requests_per_second or None):
+            raise ValueError(
+                f'The shared rate limit controller runs at {current} requests/s, cannot change it to '
+                f'{requests_per_second} requests/s!'
+            )
+
+    return _shared_controller
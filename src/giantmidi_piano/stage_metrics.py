@@ -0,0 +1,120 @@
+"""Per-file metrics of the piano solo detection and the transcription stages. Each writer appends a json line of each
+finished mp3 to its own file in workspace/_tmp/metrics, with the seconds spent in each stage of the mp3, the audio
+duration, and the real time factor, i.e., seconds of processing per second of audio."""
+
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+# Seconds spent in each stage of an mp3, a stage which does not apply to a run is None
+TIME_KEYS = ['decode_time', 'features_time', 'inference_time', 'postprocess_time', 'write_time']
+
+PERCENTILES = [50, 90, 99]
+
+
+def get_metrics_dir(workspace):
+    return os.path.join(workspace, '_tmp', 'metrics')
+
+
+class MetricsWriter:
+    def __init__(self, metrics_path):
+        """Append-only json lines of per-file metrics. A None metrics_path disables the metrics.
+
+        Args:
+          metrics_path: str | None
+        """
+        self.metrics_path = metrics_path
+
+        if metrics_path:
+            os.makedirs(os.path.dirname(metrics_path), exist_ok=True)
+
+    def write(self, stage, audio_name, audio_duration, **times):
+        """Append the metrics of an mp3.
+
+        Args:
+          stage: str, 'piano_solo_prob' | 'transcribe'
+          audio_name: str
+          audio_duration: float, in seconds.
+          times: float | None, seconds of TIME_KEYS, and other seconds which are not part of the total, e.g.,
+            decode_wait_time.
+        """
+        if not self.metrics_path:
+            return
+
+        total_time = sum(times.get(key) or 0.0 for key in TIME_KEYS)
+        record = {
+            'stage': stage,
+            'audio_name': audio_name,
+            'audio_duration': audio_duration,
+            **times,
+            'total_time': total_time,
+            'real_time_factor': total_time / audio_duration if audio_duration else None,
+            'finish_time': time.time(),
+        }
+
+        with open(self.metrics_path, 'a', encoding='utf-8') as fw:
+            fw.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def read_metrics(metrics_dir, stage=None):
+    """Read the metrics of all writers. Truncated lines of killed processes are ignored."""
+    records = []
+
+    for metrics_path in sorted(glob.glob(os.path.join(glob.escape(metrics_dir), '*.jsonl'))):
+        with open(metrics_path, encoding='utf-8') as fr:
+            for line in fr:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+                if stage is None or record['stage'] == stage:
+                    records.append(record)
+
+    return records
+
+
+def summarize_metrics(workspace, stage=None, slowest_num=10):
+    """Print percentiles of the seconds of each stage, totals, and the slowest mp3s by real time factor."""
+    records = read_metrics(get_metrics_dir(workspace), stage)
+    stages = sorted({record['stage'] for record in records})
+
+    if not records:
+        print(f'No metrics in {get_metrics_dir(workspace)}')
+
+    for stage_name in stages:
+        stage_records = [record for record in records if record['stage'] == stage_name]
+        audio_duration = sum(record['audio_duration'] or 0.0 for record in stage_records)
+        total_time = sum(record['total_time'] for record in stage_records)
+
+        print(f'------ {stage_name} ------')
+        (audio_hours, processing_hours) = (audio_duration / 3600, total_time / 3600)
+        print(f'Files: {len(stage_records)}, audio: {audio_hours:.2f} h, processing: {processing_hours:.2f} h')
+
+        if total_time > 0:
+            print(f'Audio hours per processing hour: {audio_duration / total_time:.2f}')
+
+        keys = [*TIME_KEYS, 'decode_wait_time', 'total_time', 'real_time_factor', 'audio_duration']
+        header = ''.join(f'p{percentile:<9}' for percentile in PERCENTILES)
+        print(f"{'':<20}{header}{'max':<10}{'mean':<10}")
+
+        for key in keys:
+            values = np.array([record[key] for record in stage_records if record.get(key) is not None], dtype=float)
+
+            if len(values) == 0:
+                continue
+
+            percentiles = ''.join(f'{value:<10.3f}' for value in np.percentile(values, PERCENTILES))
+            print(f'{key:<20}{percentiles}{np.max(values):<10.3f}{np.mean(values):<10.3f}')
+
+        slowest = sorted(stage_records, key=lambda record: record['real_time_factor'] or 0.0, reverse=True)
+        print(f'Slowest {min(slowest_num, len(slowest))} files by real time factor:')
+
+        for record in slowest[:slowest_num]:
+            print(
+                f"  {record['real_time_factor'] or 0.0:.3f}, {record['total_time']:.1f} s for "
+                f"{record['audio_duration'] or 0.0:.1f} s, {record['audio_name']}"
+            )
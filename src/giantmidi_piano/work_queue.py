@@ -0,0 +1,174 @@
+"""SQLite work queue shared by worker processes. A worker leases a job, renews the lease while it works, and completes
+or fails the job. Jobs of crashed workers are leased again when their leases expire, and failed jobs are retried up to
+max_attempts times. Jobs with larger weights are leased first, so that long jobs do not finish last.
+
+The queue is a single SQLite file, which is safe for processes of one machine. SQLite locks are not reliable on some
+network file systems."""
+
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    def __init__(self, job_id, key, payload, attempts):
+        self.job_id = job_id
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f'Job({self.job_id}, {self.key!r}, attempts={self.attempts})'
+
+
+class WorkQueue:
+    def __init__(self, db_path, lease_seconds=1800, max_attempts=3):
+        """SQLite work queue.
+
+        Args:
+          db_path: str
+          lease_seconds: float, a leased job is given to another worker if its lease is not renewed in time.
+          max_attempts: int, a job failed max_attempts times is not retried.
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'job_id INTEGER PRIMARY KEY, key TEXT UNIQUE, payload TEXT, weight REAL, state TEXT, '
+                'attempts INTEGER DEFAULT 0, owner TEXT, lease_expires REAL, error TEXT)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_state_weight ON jobs (state, weight)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A connection per call, so that the queue can be used by threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def add_jobs(self, jobs):
+        """Add jobs, jobs whose keys are already in the queue are ignored.
+
+        Args:
+          jobs: iterable of (key, payload, weight), key: str, payload: json serializable, weight: float
+
+        Returns:
+          added_num: int
+        """
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO jobs (key, payload, weight, state) VALUES (?, ?, ?, ?)',
+                ((key, json.dumps(payload), float(weight), PENDING) for key, payload, weight in jobs),
+            )
+            return conn.total_changes - before
+
+    def acquire(self, owner):
+        """Lease the pending job with the largest weight, or a job whose lease has expired. A job whose lease expires
+        after max_attempts attempts, e.g., one that kills its worker each time, is marked as failed.
+
+        Returns:
+          job: Job | None, None if no job is available.
+        """
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET state = ?, lease_expires = NULL, error = ? '
+                'WHERE state = ? AND lease_expires < ? AND attempts >= ?',
+                (FAILED, 'lease expired', LEASED, now, self.max_attempts),
+            )
+            row = conn.execute(
+                'SELECT job_id, key, payload, attempts FROM jobs '
+                'WHERE state = ? OR (state = ? AND lease_expires < ?) ORDER BY weight DESC LIMIT 1',
+                (PENDING, LEASED, now),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            (job_id, key, payload, attempts) = row
+            conn.execute(
+                'UPDATE jobs SET state = ?, owner = ?, lease_expires = ?, attempts = ? WHERE job_id = ?',
+                (LEASED, owner, now + self.lease_seconds, attempts + 1, job_id),
+            )
+
+        return Job(job_id, key, json.loads(payload), attempts + 1)
+
+    def renew(self, job, owner):
+        """Extend the lease of a job. Returns False if the job is no longer leased by owner."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND state = ? AND owner = ?',
+                (time.time() + self.lease_seconds, job.job_id, LEASED, owner),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job, owner):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET state = ?, lease_expires = NULL, error = NULL WHERE job_id = ? AND owner = ?',
+                (DONE, job.job_id, owner),
+            )
+
+    def fail(self, job, owner, error):
+        """Return a failed job to the queue, or mark it as failed after max_attempts attempts."""
+        state = FAILED if job.attempts >= self.max_attempts else PENDING
+
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET state = ?, lease_expires = NULL, error = ? WHERE job_id = ? AND owner = ?',
+                (state, str(error), job.job_id, owner),
+            )
+
+    def reset_failed(self):
+        """Return all failed jobs to the queue with their attempts reset."""
+        with self._connect() as conn:
+            return conn.execute('UPDATE jobs SET state = ?, attempts = 0 WHERE state = ?', (PENDING, FAILED)).rowcount
+
+    def counts(self):
+        """Get the number and the total weight of jobs of each state.
+
+        Returns:
+          counts: dict, state -> (jobs_num, weight)
+        """
+        with self._connect() as conn:
+            rows = conn.execute('SELECT state, COUNT(*), SUM(weight) FROM jobs GROUP BY state').fetchall()
+
+        return {state: (num, weight or 0.0) for state, num, weight in rows}
+
+    @contextlib.contextmanager
+    def keep_alive(self, job, owner):
+        """Renew the lease of a job in a background thread while the job is running."""
+        stopped = threading.Event()
+
+        def _renew():
+            while not stopped.wait(self.lease_seconds / 3):
+                self.renew(job, owner)
+
+        thread = threading.Thread(target=_renew, daemon=True)
+        thread.start()
+
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
@@ -0,0 +1,196 @@
+import glob
+import os
+import shutil
+import stat
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from giantmidi_piano import audio_decoder
+from giantmidi_piano.audio_decoder import PIPE_CHUNK, AudioCache, decode_audio
+
+
+def _audio(seconds, seed=0, peak=0.5):
+    return np.random.RandomState(seed).uniform(-peak, peak, int(seconds * 16000)).astype(np.float32)
+
+
+def test_cached_audio_is_not_clipped(tmp_path):
+    cache = AudioCache(str(tmp_path))
+    audio = _audio(1, peak=1.5)
+    cache.save(('piece', '0'), 16000, audio)
+
+    loaded = cache.load(('piece', '0'), 16000)
+
+    assert loaded.dtype == np.float32
+    assert np.max(np.abs(loaded)) > 1.4
+    np.testing.assert_allclose(loaded, audio, rtol=1e-3, atol=1e-4)
+    assert cache.load(('piece', '1'), 16000) is None
+
+
+def _seed_int16_cache(cache, key, sample_rate):
+    path = cache.get_path(key, sample_rate)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, np.array([0, 16384, -32767], dtype=np.int16))
+    return path
+
+
+def test_caches_of_other_dtypes_are_decoded_again(tmp_path, monkeypatch):
+    cache = AudioCache(str(tmp_path))
+    audio = _audio(1)
+    mp3_path = tmp_path / 'piece.mp3'
+    mp3_path.write_bytes(b'mp3')
+    key = cache.get_key(str(mp3_path))
+
+    # int16 caches of an earlier version, at the sample rate and at a higher one
+    path = _seed_int16_cache(cache, key, 16000)
+    higher_path = _seed_int16_cache(cache, key, 32000)
+
+    decoded = []
+    monkeypatch.setattr(audio_decoder, '_decode_audio', lambda *args: decoded.append(args[1:3]) or audio.copy())
+
+    np.testing.assert_allclose(decode_audio(str(mp3_path), 16000, cache=cache), audio, rtol=1e-3, atol=1e-4)
+    assert decoded == [(16000, 'librosa')]
+    assert np.load(path).dtype == np.float16
+
+    os.remove(path)
+    assert cache.load(key, 16000) is None
+    assert not os.path.exists(higher_path)
+
+
+def test_least_recently_used_audios_are_evicted(tmp_path, monkeypatch):
+    scans = []
+    evict = AudioCache.evict
+    monkeypatch.setattr(AudioCache, 'evict', lambda self: scans.append(self) or evict(self))
+
+    # Each audio is 32 kB, the cache holds 3 of them
+    cache = AudioCache(str(tmp_path), max_bytes=3 * 32200)
+
+    for n in range(5):
+        cache.save((f'piece{n}', '0'), 16000, _audio(1, seed=n))
+        os.utime(cache.get_path((f'piece{n}', '0'), 16000), ns=(n * 10**9, n * 10**9))
+
+    names = sorted(os.path.basename(path) for path in glob.glob(str(tmp_path / '16000' / '*.npy')))
+
+    assert names == ['piece2.0.npy', 'piece3.0.npy', 'piece4.0.npy']
+    assert cache.total_bytes == sum(os.path.getsize(tmp_path / '16000' / name) for name in names)
+
+    # The first save and the saves over the cap scan the cache, the others count their bytes
+    assert len(scans) == 3
+
+
+@pytest.fixture(scope='module')
+def mp3_path(tmp_path_factory):
+    """A 2-second mp3 at 44.1 kHz."""
+    soundfile = pytest.importorskip('soundfile')
+
+    if 'MP3' not in soundfile.available_formats():
+        pytest.skip('libsndfile cannot write mp3s')
+
+    path = str(tmp_path_factory.mktemp('mp3s') / 'piece.mp3')
+    audio = 0.3 * np.sin(2 * np.pi * 440 * np.arange(2 * 44100) / 44100)
+    soundfile.write(path, audio, 44100, format='MP3')
+
+    return path
+
+
+def _load_librosa(mp3_path, sample_rate):
+    import librosa
+
+    return librosa.core.load(mp3_path, sr=sample_rate, mono=True)[0]
+
+
+@pytest.mark.parametrize('sample_rate', [16000, 44100])
+def test_soundfile_decoder_equals_librosa(mp3_path, sample_rate):
+    audio = decode_audio(mp3_path, sample_rate, decoder='soundfile')
+
+    assert audio.dtype == np.float32
+    assert len(audio) == 2 * sample_rate
+    np.testing.assert_allclose(audio, _load_librosa(mp3_path, sample_rate), atol=1e-5)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg is not installed')
+@pytest.mark.parametrize('sample_rate', [16000, 32000])
+def test_ffmpeg_decoder_equals_librosa(mp3_path, sample_rate):
+    audio = decode_audio(mp3_path, sample_rate, decoder='ffmpeg')
+    expected = _load_librosa(mp3_path, sample_rate)
+
+    # Resamplers of ffmpeg and soxr differ
+    assert audio.dtype == np.float32
+    assert len(audio) == len(expected) == 2 * sample_rate
+    np.testing.assert_allclose(audio, expected, atol=0.05)
+
+
+# ffmpeg stub: writes the samples of $FFMPEG_STUB_SAMPLES as f32le to stdout in uneven writes, or fails. A noisy input
+# writes an error of each of its bad packets to stderr first
+FFMPEG_STUB = """#!{python}
+import os
+import sys
+
+import numpy as np
+
+if 'noisy' in sys.argv[sys.argv.index('-i') + 1]:
+    for n in range(4096):
+        sys.stderr.write(f'[mp3float] Header missing in packet {{n}}\\n')
+
+if 'broken' in sys.argv[sys.argv.index('-i') + 1]:
+    sys.stderr.write('Invalid data found when processing input')
+    sys.exit(1)
+
+data = np.arange(int(os.environ['FFMPEG_STUB_SAMPLES']), dtype='<f4').tobytes()
+for bgn in range(0, len(data), 300001):
+    sys.stdout.buffer.write(data[bgn : bgn + 300001])
+"""
+
+
+@pytest.fixture
+def ffmpeg_stub(tmp_path):
+    path = tmp_path / 'ffmpeg'
+    path.write_text(FFMPEG_STUB.format(python=sys.executable))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='stub commands are scripts')
+@pytest.mark.parametrize('samples_num', [0, 1000, PIPE_CHUNK // 4, 3 * PIPE_CHUNK + 7])
+def test_ffmpeg_pipe_is_read_to_the_end(ffmpeg_stub, monkeypatch, samples_num):
+    monkeypatch.setenv('FFMPEG_STUB_SAMPLES', str(samples_num))
+
+    audio = audio_decoder._decode_ffmpeg('piece.mp3', 16000, ffmpeg_command=ffmpeg_stub)
+
+    assert audio.dtype == np.float32
+    np.testing.assert_array_equal(audio, np.arange(samples_num, dtype=np.float32))
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='stub commands are scripts')
+def test_ffmpeg_failure_raises(ffmpeg_stub, monkeypatch):
+    monkeypatch.setenv('FFMPEG_STUB_SAMPLES', '0')
+
+    with pytest.raises(OSError, match='failed to decode broken.mp3: Invalid data found'):
+        audio_decoder._decode_ffmpeg('broken.mp3', 16000, ffmpeg_command=ffmpeg_stub)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='stub commands are scripts')
+@pytest.mark.parametrize('audio_path', ['noisy.mp3', 'noisy_broken.mp3'])
+def test_ffmpeg_errors_beyond_the_pipe_buffer_do_not_block(ffmpeg_stub, monkeypatch, audio_path):
+    monkeypatch.setenv('FFMPEG_STUB_SAMPLES', str(3 * PIPE_CHUNK))
+    result = []
+
+    def _decode():
+        try:
+            result.append(audio_decoder._decode_ffmpeg(audio_path, 16000, ffmpeg_command=ffmpeg_stub))
+        except OSError as e:
+            result.append(e)
+
+    # Over 64 KiB of errors, which fill a stderr pipe
+    thread = threading.Thread(target=_decode, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+
+    assert not thread.is_alive()
+
+    if 'broken' in audio_path:
+        assert str(result[0]).count('Header missing') == 4096
+    else:
+        np.testing.assert_array_equal(result[0], np.arange(3 * PIPE_CHUNK, dtype=np.float32))
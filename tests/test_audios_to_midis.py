@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from giantmidi_piano import piano_detection_model
+from giantmidi_piano.audios_to_midis import (
+    _format_piano_solo_prob,
+    _iterate_in_order,
+    _load_piano_solo_input,
+    calculate_piano_solo_prob,
+    merge_piano_solo_prob,
+)
+from giantmidi_piano.journal import Journal, make_key
+from giantmidi_piano.piano_detection_model import CHECKPOINT_PATH, SR, PianoSoloDetector
+
+
+class SyncExecutor:
+    """Run each task when it is submitted, so that the submitted tasks are deterministic."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, *args):
+        self.submitted.append(args)
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+def _decode(n, seconds):
+    return seconds, n
+
+
+def test_iterate_in_order_bounds_pending_audio():
+    executor = SyncExecutor()
+    tasks = [(n, 600) for n in range(8)]
+    results = _iterate_in_order(executor, _decode, tasks, 4, lambda result: result[0], 1800)
+
+    # 3 finished results of 600 s stop the submission, each consumed result allows one more
+    assert next(results) == (600, 0)
+    assert len(executor.submitted) == 4
+    assert next(results) == (600, 1)
+    assert len(executor.submitted) == 5
+    assert [n for _, n in results] == [2, 3, 4, 5, 6, 7]
+
+
+def test_format_piano_solo_prob():
+    probs = np.array([0.9, 0.7, 0.123], dtype=np.float32)
+
+    assert _format_piano_solo_prob(np.mean(probs)) == str(np.mean(probs)) == '0.5743333'
+    assert _format_piano_solo_prob(float(np.mean(probs))) == '0.5743333'
+    assert _format_piano_solo_prob(0) == '0'
+
+
+def test_merge_piano_solo_prob_keeps_the_csv_format(tmp_path):
+    rows = [('Bach', 'J. S.', 'Air', 'a'), ('Chopin', 'F.', 'Ballade', 'b'), ('Liszt', 'F.', 'Etude', 'c')]
+    (tmp_path / 'full_music_pieces_youtube_similarity.csv').write_text(
+        'surname\tfirstname\tmusic\tyoutube_id\n' + ''.join('\t'.join(row) + '\n' for row in rows)
+    )
+
+    journal = Journal(os.path.join(tmp_path, '_tmp', 'piano_solo_prob_journals', '0_3.jsonl'))
+    # Journals written before record floats
+    prob = 0.5743333101272583
+    journal.append(make_key(*rows[0]), {'piano_solo_prob': prob, 'audio_name': 'a', 'audio_duration': 2.5})
+    journal.append(make_key(*rows[1]), {'piano_solo_prob': '0', 'audio_name': 'b', 'audio_duration': 0.1})
+    journal.append(make_key(*rows[2]), {'piano_solo_prob': '', 'audio_name': '', 'audio_duration': ''})
+
+    merge_piano_solo_prob(str(tmp_path))
+
+    lines = (tmp_path / 'full_music_pieces_youtube_similarity_pianosoloprob.csv').read_text().splitlines()
+    assert [line.split('\t')[4:] for line in lines[1:]] == [['0.5743333', 'a', '2.5'], ['0', 'b', '0.1'], ['', '', '']]
+
+
+def _raise_on_bad_audio(predict):
+    def _predict(self, audio, *args, **kwargs):
+        if len(audio) == 3 * SR:
+            raise RuntimeError('bad audio')
+        return predict(self, audio, *args, **kwargs)
+
+    return _predict
+
+
+@pytest.mark.skipif(not os.path.isfile(CHECKPOINT_PATH), reason='run from the repository root')
+@pytest.mark.parametrize('sequential', [False, True])
+def test_failed_and_silent_mp3s_are_predicted_as_zero(tmp_path, monkeypatch, sequential):
+    soundfile = pytest.importorskip('soundfile')
+
+    rows = [('Bach', 'J. S.', 'Air', 'a'), ('Chopin', 'F.', 'Ballade', 'b'), ('Liszt', 'F.', 'Etude', 'c')]
+    audios = [np.random.RandomState(0).uniform(-0.1, 0.1, 2 * SR), np.zeros(2 * SR), np.full(3 * SR, 0.1)]
+    (tmp_path / 'full_music_pieces_youtube_similarity.csv').write_text(
+        'surname\tfirstname\tmusic\tyoutube_id\n' + ''.join('\t'.join(row) + '\n' for row in rows)
+    )
+
+    # Wav files named as mp3s, which soundfile reads by their content
+    mp3s_dir = tmp_path / 'mp3s'
+    mp3s_dir.mkdir()
+    for row, audio in zip(rows, audios):
+        soundfile.write(str(mp3s_dir / f'{", ".join(row)}.mp3'), audio, SR, format='WAV', subtype='FLOAT')
+
+    for method in ['predict', 'predict_sequential']:
+        monkeypatch.setattr(PianoSoloDetector, method, _raise_on_bad_audio(getattr(PianoSoloDetector, method)))
+
+    calculate_piano_solo_prob(
+        str(tmp_path), str(mp3s_dir), False, front_end='torch', sequential=sequential, workers=1, decoder='soundfile'
+    )
+
+    lines = (tmp_path / 'full_music_pieces_youtube_similarity_pianosoloprob.csv').read_text().splitlines()
+    probs = [line.split('\t')[4] for line in lines[1:]]
+
+    assert np.isfinite(float(probs[0]))
+    assert probs[1:] == ['0.0', '0']
+
+
+def test_failed_spectrograms_are_no_segments(tmp_path, monkeypatch):
+    soundfile = pytest.importorskip('soundfile')
+
+    mp3_path = str(tmp_path / 'a.mp3')
+    soundfile.write(mp3_path, np.zeros(2 * SR), SR, format='WAV', subtype='FLOAT')
+
+    def _raise(audio):
+        raise RuntimeError('bad audio')
+
+    monkeypatch.setattr(piano_detection_model, 'compute_segment_spectrograms', _raise)
+
+    (duration, (segs_rms, x), _) = _load_piano_solo_input(mp3_path, True, 'soundfile', None)
+
+    assert duration == 2
+    assert len(segs_rms) == len(x) == 0
+    assert x.shape[1:] == (1, piano_detection_model.DIM_T, piano_detection_model.DIM_F)
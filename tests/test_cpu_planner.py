@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+
+from giantmidi_piano.cpu_planner import _get_results, _parse_cpulist, get_available_memory, get_candidates, plan_cpus
+
+
+def test_parse_cpulist():
+    assert _parse_cpulist('0-3,8-11\n') == [0, 1, 2, 3, 8, 9, 10, 11]
+    assert _parse_cpulist('5') == [5]
+    assert _parse_cpulist('0,2,4-5') == [0, 2, 4, 5]
+    assert _parse_cpulist('\n') == []
+
+
+def test_get_candidates():
+    assert get_candidates(1) == [1]
+    assert get_candidates(8) == [1, 2, 4, 8]
+    assert get_candidates(12) == [1, 2, 4, 8, 12]
+
+
+def test_plan_cpus_keeps_instances_within_nodes():
+    nodes = [list(range(0, 8)), list(range(8, 12))]
+
+    for instances_num in range(2, 13):
+        plan = plan_cpus(instances_num, nodes)
+
+        assert len(plan) == instances_num
+        assert sorted(cpu for cpus in plan for cpu in cpus) == list(range(12))
+        assert all(set(cpus) <= set(nodes[0]) or set(cpus) <= set(nodes[1]) for cpus in plan)
+
+    # Instances are spread over nodes in proportion to their cpus
+    assert plan_cpus(3, nodes) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11]]
+
+
+def test_plan_cpus_with_fewer_instances_than_nodes():
+    nodes = [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+    assert plan_cpus(1, nodes) == [list(range(8))]
+    assert plan_cpus(2, nodes) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert plan_cpus(100, nodes) == [[cpu] for cpu in range(8)]
+
+
+def test_get_available_memory():
+    available = get_available_memory()
+
+    assert available is None or available > 0
+
+
+def test_get_results_stops_at_a_dead_process():
+    mp_context = multiprocessing.get_context('spawn')
+    results = mp_context.Queue()
+    process = mp_context.Process(target=os._exit, args=(1,))
+    process.start()
+
+    try:
+        assert _get_results([process], results, timeout=60) is None
+    finally:
+        process.join()
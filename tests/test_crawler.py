@@ -0,0 +1,125 @@
+import http.server
+import threading
+
+import pytest
+
+from giantmidi_piano.crawler import AsyncCrawler, write_atomic
+from giantmidi_piano.rate_limit import RateLimitController
+
+ETAG = '"v1"'
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+
+        if self.path == '/page':
+            if self.headers.get('If-None-Match') == ETAG:
+                self._respond(304)
+            else:
+                self._respond(200, b'<html>page</html>', {'ETag': ETAG})
+
+        elif self.path == '/throttled':
+            if self.server.throttles > 0:
+                self.server.throttles -= 1
+                self._respond(429)
+            else:
+                self._respond(200, b'<html>throttled</html>')
+
+        else:
+            self._respond(500, b'Internal Server Error')
+
+    def _respond(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.requests = []
+    server.throttles = 2
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server, path):
+    return f'http://127.0.0.1:{server.server_address[1]}{path}'
+
+
+def _crawler(tmp_path):
+    rate_limiter = RateLimitController(base_backoff=0.0)
+    return AsyncCrawler(str(tmp_path / 'validators.jsonl'), concurrency=2, rate_limiter=rate_limiter)
+
+
+def test_unchanged_page_is_not_modified(tmp_path, server):
+    out_path = str(tmp_path / 'page.html')
+
+    assert _crawler(tmp_path).crawl([(_url(server, '/page'), out_path)]) == {
+        'downloaded': 1,
+        'not_modified': 0,
+        'failed': 0,
+    }
+
+    # A new crawler sends the ETag from the validators journal
+    crawler = _crawler(tmp_path)
+    assert crawler.fetch(_url(server, '/page'), out_path) == 'not_modified'
+    assert server.requests[-1][1]['If-None-Match'] == ETAG
+
+    with open(out_path, 'rb') as fr:
+        assert fr.read() == b'<html>page</html>'
+
+
+def test_missing_file_is_downloaded_again(tmp_path, server):
+    out_path = tmp_path / 'page.html'
+    _crawler(tmp_path).fetch(_url(server, '/page'), str(out_path))
+    out_path.unlink()
+
+    assert _crawler(tmp_path).fetch(_url(server, '/page'), str(out_path)) == 'downloaded'
+    assert 'If-None-Match' not in server.requests[-1][1]
+    assert out_path.read_bytes() == b'<html>page</html>'
+
+
+def test_throttled_page_is_backed_off_and_retried(tmp_path, server):
+    out_path = tmp_path / 'throttled.html'
+    crawler = _crawler(tmp_path)
+
+    assert crawler.fetch(_url(server, '/throttled'), str(out_path)) == 'downloaded'
+    assert out_path.read_bytes() == b'<html>throttled</html>'
+    assert len(server.requests) == 3
+
+    metrics = crawler.rate_limiter.get_metrics()
+    assert metrics['stages']['crawl']['throttled'] == 2
+    # Unlimited, halved on each 429 from 10 requests/s, then increased after the success
+    assert metrics['rates'][f'127.0.0.1:{server.server_address[1]}'] == pytest.approx(2.55)
+
+
+def test_failed_page_keeps_the_old_file(tmp_path, server):
+    out_path = tmp_path / 'error.html'
+    out_path.write_bytes(b'old')
+
+    assert _crawler(tmp_path).crawl([(_url(server, '/error'), str(out_path))])['failed'] == 1
+    assert out_path.read_bytes() == b'old'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['error.html']
+
+
+def test_write_atomic_replaces_the_file_without_leftovers(tmp_path):
+    out_path = tmp_path / 'page.html'
+    out_path.write_bytes(b'old')
+
+    write_atomic(str(out_path), b'new')
+
+    assert out_path.read_bytes() == b'new'
+    assert [path.name for path in tmp_path.iterdir()] == ['page.html']
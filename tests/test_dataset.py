@@ -0,0 +1,148 @@
+import csv
+import os
+
+import pytest
+
+from giantmidi_piano import dataset
+from giantmidi_piano.config import nationalities
+from giantmidi_piano.crawler import AsyncCrawler
+from giantmidi_piano.dataset import download_imslp_htmls, get_composer_info_from_wikipedia
+from giantmidi_piano.rate_limit import RateLimitController
+
+COMPOSERS_CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'resources', 'composers_manually_checked.csv')
+
+
+def _read_composers():
+    """Composers of resources whose nationality, birth and death are known."""
+    with open(COMPOSERS_CSV_PATH, encoding='utf-8-sig') as fr:
+        rows = list(csv.DictReader(fr, delimiter='\t'))
+
+    return [
+        row
+        for row in rows
+        if row['nationality'] in nationalities
+        and ' ' not in row['nationality']
+        and row['birth'].isdigit()
+        and row['death'].isdigit()
+        and 1000 <= int(row['birth']) < int(row['death'])
+    ]
+
+
+def _get_categories(row):
+    """Wikipedia categories of a composer, as in the pages downloaded by download_wikipedia_htmls."""
+    return [
+        f"{row['birth']} births",
+        f"{row['death']} deaths",
+        f"{row['nationality']} classical composers",
+        f"{row['nationality']} male classical composers",
+        '20th-century classical composers',
+        'Articles with short description',
+        'Wikipedia articles with VIAF identifiers',
+    ]
+
+
+def _write_wikipedia(path, categories):
+    categories = '", "'.join(categories)
+    path.write_text(f'<script>RLCONF={{"wgCategories": ["{categories}"], "wgBreakFrames": false}};</script>')
+    return str(path)
+
+
+def _get_composer_info_nltk(wikipedia_path):
+    """get_composer_info_from_wikipedia of earlier releases, which POS tags the categories with NLTK."""
+    import nltk
+
+    text = open(wikipedia_path).read().replace(': ', ':').replace('", "', '","')
+    text = text[text.index('wgCategories":[') + len('wgCategories":[') + 1 :]
+    sentence = ' '.join(text[: text.index(']') - 1].split('","'))
+
+    nationality = None
+    years = []
+
+    for word, tag in nltk.pos_tag(nltk.word_tokenize(sentence)):
+        if tag == 'JJ':
+            if not nationality and word in nationalities:
+                nationality = word
+        elif tag == 'CD':
+            try:
+                year = int(word[:4])
+                if 1000 <= year <= 9999:  # noqa: PLR2004
+                    years.append(year)
+            except ValueError:
+                pass
+
+    years = sorted(years)
+    (birth, death) = (str(years[0]), str(years[1])) if len(years) >= 2 else ('unknown', 'unknown')  # noqa: PLR2004
+
+    return nationality or 'unknown', birth, death
+
+
+def _has_nltk_data():
+    try:
+        import nltk
+
+        nltk.data.find('tokenizers/punkt')
+        nltk.data.find('taggers/averaged_perceptron_tagger')
+    except (ImportError, LookupError):
+        return False
+
+    return True
+
+
+def test_composer_info_of_resources(tmp_path):
+    mismatches = []
+
+    for n, row in enumerate(_read_composers()):
+        wikipedia_path = _write_wikipedia(tmp_path / f'{n}.html', _get_categories(row))
+        info = get_composer_info_from_wikipedia(wikipedia_path)
+
+        if info != (row['nationality'], row['birth'], row['death']):
+            mismatches.append((row['composer_name'], info))
+
+    assert not mismatches
+
+
+@pytest.mark.parametrize(
+    ('categories', 'expected'),
+    [
+        (['1685 births', '1750 deaths', 'German Baroque composers'], ('German', '1685', '1750')),
+        (['German-born American composers', '1900 births', '1990 deaths'], ('American', '1900', '1990')),
+        (['1810 births', '1849 deaths', 'Polish composers', 'French people'], ('Polish', '1810', '1849')),
+        (['1950s births', 'Living people', 'Use dmy dates from March 2019'], ('unknown', '1950', '2019')),
+        (['Composers for piano', '1.5 million'], ('unknown', 'unknown', 'unknown')),
+    ],
+)
+def test_composer_info_of_categories(tmp_path, categories, expected):
+    assert get_composer_info_from_wikipedia(_write_wikipedia(tmp_path / 'a.html', categories)) == expected
+
+
+def test_missing_wikipedia(tmp_path):
+    assert get_composer_info_from_wikipedia(str(tmp_path / 'missing.html')) == ('unknown', 'unknown', 'unknown')
+
+
+@pytest.mark.skipif(not _has_nltk_data(), reason='NLTK punkt and averaged_perceptron_tagger are not installed')
+def test_composer_info_matches_nltk(tmp_path):
+    mismatches = []
+
+    for n, row in enumerate(_read_composers()):
+        wikipedia_path = _write_wikipedia(tmp_path / f'{n}.html', _get_categories(row))
+        (info, expected) = (get_composer_info_from_wikipedia(wikipedia_path), _get_composer_info_nltk(wikipedia_path))
+
+        if info != expected:
+            mismatches.append((row['composer_name'], info, expected))
+
+    assert not mismatches
+
+
+class _FailingPool:
+    def request(self, url, headers=None):
+        raise ConnectionRefusedError('refused')
+
+
+def test_failed_composers_page_raises(tmp_path, monkeypatch):
+    def _crawler(validators_path, concurrency):
+        return AsyncCrawler(validators_path, concurrency, pool=_FailingPool(), rate_limiter=RateLimitController())
+
+    monkeypatch.setattr(dataset, 'AsyncCrawler', _crawler)
+
+    with pytest.raises(OSError, match='Failed to download https://imslp.org/wiki/Category:Composers'):
+        download_imslp_htmls(str(tmp_path))
@@ -0,0 +1,103 @@
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+from giantmidi_piano.downloader import TMP_SUFFIX, YoutubeDownloader
+from giantmidi_piano.rate_limit import RateLimitController
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='stub commands are shell scripts')
+
+FETCH_SECONDS = 0.2
+
+# youtube-dl stub: -f bestaudio -o out_template url, sleeps as a network download and writes a webm
+FETCH_STUB = f"""#!/bin/sh
+sleep {FETCH_SECONDS}
+out=$(printf '%s' "$4" | sed 's/%(ext)s/webm/')
+printf audio > "$out"
+"""
+
+# ffmpeg stub: -i audio_path ... out_path, fails on audios whose names contain "broken"
+TRANSCODE_STUB = """#!/bin/sh
+case "$2" in *broken*) exit 1 ;; esac
+for out; do :; done
+cp "$2" "$out"
+"""
+
+
+def _write_script(path, text):
+    with open(path, 'w') as fw:
+        fw.write(text)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+@pytest.fixture
+def stubs(tmp_path):
+    return (
+        _write_script(tmp_path / 'fetch.sh', FETCH_STUB),
+        _write_script(tmp_path / 'transcode.sh', TRANSCODE_STUB),
+    )
+
+
+def _jobs(num, prefix='piece'):
+    return [{'index': n, 'bare_name': f'{prefix} {n}', 'youtube_id': f'id{n}'} for n in range(num)]
+
+
+def _run(tmp_path, stubs, fetch_workers, jobs):
+    (fetch_command, transcode_command) = stubs
+    mp3s_dir = tmp_path / f'mp3s_{fetch_workers}'
+    downloader = YoutubeDownloader(
+        mp3s_dir=str(mp3s_dir),
+        state_path=str(tmp_path / f'state_{fetch_workers}.txt'),
+        fetch_workers=fetch_workers,
+        transcode_workers=2,
+        rate_limiter=RateLimitController(),
+        fetch_command=fetch_command,
+        transcode_command=transcode_command,
+    )
+
+    bgn_time = time.time()
+    count = downloader.run(jobs)
+
+    return count, time.time() - bgn_time, mp3s_dir
+
+
+def test_throughput_scales_with_fetch_workers(tmp_path, stubs):
+    jobs = _jobs(16)
+
+    (count, serial_time, mp3s_dir) = _run(tmp_path, stubs, 1, jobs)
+    assert count == len(jobs)
+    assert sorted(os.listdir(mp3s_dir)) == sorted(f"{job['bare_name']}.mp3" for job in jobs)
+
+    (count, parallel_time, _) = _run(tmp_path, stubs, 8, jobs)
+    assert count == len(jobs)
+    assert serial_time >= len(jobs) * FETCH_SECONDS
+    assert parallel_time < serial_time / 3
+
+
+def test_transcode_failures_are_reported(tmp_path, stubs, capsys):
+    jobs = _jobs(3) + _jobs(2, prefix='broken')
+
+    (count, _, mp3s_dir) = _run(tmp_path, stubs, 4, jobs)
+
+    assert count == 3
+    assert '2 out of 5 downloaded audios failed to convert!' in capsys.readouterr().out
+    assert not any(name.endswith(TMP_SUFFIX) for name in os.listdir(mp3s_dir))
+
+
+def test_fetch_ignores_leftover_tmp_mp3(tmp_path, stubs):
+    (fetch_command, transcode_command) = stubs
+    downloader = YoutubeDownloader(
+        mp3s_dir=str(tmp_path),
+        state_path=str(tmp_path / 'state.txt'),
+        rate_limiter=RateLimitController(),
+        fetch_command=_write_script(tmp_path / 'noop.sh', '#!/bin/sh\n'),
+        transcode_command=transcode_command,
+    )
+    job = _jobs(1)[0]
+    (tmp_path / f"{job['bare_name']}{TMP_SUFFIX}").write_bytes(b'truncated')
+
+    assert downloader.fetch(job) is None
@@ -0,0 +1,84 @@
+import http.client
+
+import pytest
+
+from giantmidi_piano.imslp import ImslpCategoryFetcher, parse_category_page
+from giantmidi_piano.rate_limit import RateLimitController
+
+# Titles as written in IMSLP pages, and music names as parsed by the BeautifulSoup parser of earlier releases
+TITLES = [
+    ('Je t&#039;aime Juliette (A., Jag)', "Je t'aime Juliette (A., Jag)"),
+    ('Duo for Violin &amp; Piano', 'Duo for Violin &amp; Piano'),
+    ('a &lt;b&gt; c', 'a &lt;b&gt; c'),
+    ('say &quot;hi&quot;', 'say "hi"'),
+    ('it&#39;s &quot;x&quot;', "it's &quot;x&quot;"),
+    ('Caf&eacute; &amp;c', 'Café &amp;c'),
+]
+
+NEXT_LINK = (
+    '<a class="categorypaginglink" href="/index.php?title=Category:Mozart,_Wolfgang_Amadeus&amp;pagefrom=K.608'
+    '#mw-pages" title="Category:Mozart, Wolfgang Amadeus">next 200</a>'
+)
+
+
+def _page(titles, next_link=''):
+    links = ''.join(f'<li><a class="categorypagelink" href="/wiki/{n}" title="{t}">{t}</a></li>' for n, t in titles)
+    return f'<ul>{links}</ul>{next_link}'
+
+
+class FakePool:
+    def __init__(self, responses):
+        self.responses = responses
+        self.urls = []
+
+    def request(self, url, headers=None):
+        self.urls.append(url)
+        response = self.responses.pop(0)
+
+        if isinstance(response, Exception):
+            raise response
+
+        return response
+
+
+@pytest.mark.parametrize('backend', ['fast', 'html.parser'])
+def test_music_names_match_earlier_releases(backend):
+    page = _page([(n, title) for n, (title, _) in enumerate(TITLES)], NEXT_LINK)
+    (music_names, next_link) = parse_category_page(page, backend)
+
+    assert music_names == [music_name for _, music_name in TITLES]
+    assert next_link == (
+        'https://imslp.org/index.php?title=Category:Mozart,_Wolfgang_Amadeus&pagefrom=K.608#mw-pages'
+    )
+
+
+def _fetcher(tmp_path, responses):
+    return ImslpCategoryFetcher(str(tmp_path), pool=FakePool(responses), rate_limiter=RateLimitController())
+
+
+def test_following_pages_are_fetched_and_cached(tmp_path):
+    second_page = _page([(0, 'Requiem')]).encode()
+    fetcher = _fetcher(tmp_path, [{'status': 200, 'body': second_page}])
+
+    assert fetcher.get_music_names(_page([(0, 'Air')], NEXT_LINK)) == ['Air', 'Requiem']
+    assert fetcher.get_music_names(_page([(0, 'Air')], NEXT_LINK)) == ['Air', 'Requiem']
+    assert len(fetcher.pool.urls) == 1
+
+
+def test_throttled_page_is_retried(tmp_path):
+    fetcher = _fetcher(tmp_path, [{'status': 429, 'body': b''}, {'status': 200, 'body': b'page'}])
+    fetcher.rate_limiter.base_backoff = 0.0
+
+    assert fetcher.fetch_page('https://imslp.org/page') == 'page'
+
+
+@pytest.mark.parametrize(
+    'response', [{'status': 503, 'body': b'Service Unavailable'}, http.client.RemoteDisconnected('closed')]
+)
+def test_failed_page_raises_and_is_not_cached(tmp_path, response):
+    fetcher = _fetcher(tmp_path, [response])
+
+    with pytest.raises(OSError, match='Failed to download'):
+        fetcher.get_music_names(_page([(0, 'Air')], NEXT_LINK))
+
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,50 @@
+import json
+
+from giantmidi_piano.journal import Journal, make_key, read_journal, read_journals
+
+
+def test_make_key():
+    assert make_key('Bach', 'Johann Sebastian', 'Air') == 'Bach\tJohann Sebastian\tAir'
+    assert make_key('Cage', 'John', 4.33) == 'Cage\tJohn\t4.33'
+
+
+def test_records_survive_a_restart(tmp_path):
+    journal_path = str(tmp_path / 'journals' / '0_10.jsonl')
+    journal = Journal(journal_path)
+    journal.append(make_key('Bach', 'Air'), {'youtube_id': 'a'})
+    journal.append(make_key('Chopin', 'Ballade'), {'youtube_id': 'b'})
+
+    journal = Journal(journal_path)
+
+    assert len(journal) == 2
+    assert make_key('Bach', 'Air') in journal
+    assert journal.get(make_key('Chopin', 'Ballade')) == {'youtube_id': 'b'}
+    assert journal.get(make_key('Liszt', 'Etude')) is None
+
+
+def test_truncated_last_line_is_ignored_and_terminated(tmp_path):
+    journal_path = tmp_path / '0_10.jsonl'
+    line = json.dumps({'key': 'Bach', 'record': {'youtube_id': 'a'}})
+    journal_path.write_text(f'{line}\n{line[:10]}', encoding='utf-8')
+
+    journal = Journal(str(journal_path))
+    journal.append('Chopin', {'youtube_id': 'b'})
+
+    assert read_journal(str(journal_path)) == {'Bach': {'youtube_id': 'a'}, 'Chopin': {'youtube_id': 'b'}}
+
+
+def test_non_ascii_keys(tmp_path):
+    journal_path = str(tmp_path / '0_10.jsonl')
+    Journal(journal_path).append(make_key('Dvořák', 'Humoreska'), {'youtube_title': 'Дворжак'})
+
+    assert read_journal(journal_path) == {'Dvořák\tHumoreska': {'youtube_title': 'Дворжак'}}
+
+
+def test_read_journals_merges_shards(tmp_path):
+    Journal(str(tmp_path / '0_10.jsonl')).append('Bach', {'youtube_id': 'a'})
+    Journal(str(tmp_path / '10_20.jsonl')).append('Chopin', {'youtube_id': 'b'})
+    Journal(str(tmp_path / '20_30.jsonl')).append('Bach', {'youtube_id': 'c'})
+    (tmp_path / 'notes.txt').write_text('not a journal')
+
+    assert read_journals(str(tmp_path)) == {'Bach': {'youtube_id': 'c'}, 'Chopin': {'youtube_id': 'b'}}
+    assert read_journals(str(tmp_path / 'missing')) == {}
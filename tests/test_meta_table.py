@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+import pytest
+
+from giantmidi_piano.meta_table import (
+    MISSING_INT,
+    LazyColumns,
+    MetaTable,
+    get_sidecar_path,
+    read_csv_columns,
+    write_csv_columns,
+)
+
+CSV_TEXT = (
+    'surname\tmusic\tsimilarity\tgiant_midi_piano\taudio_name\tsplit\n'
+    'Bach\tAir\t0.50\t1\tBach, Air\ttrain\n'
+    'Chopin\tBallade\t\t\t\t\n'
+    'Liszt\tEtude\t1e-05\t0\tLiszt, Etude\ttest\n'
+)
+
+
+@pytest.fixture(autouse=True)
+def _sidecars_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('GIANTMIDI_PIANO_CACHE_DIR', str(tmp_path / 'sidecars'))
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'meta.csv'
+    path.write_text(CSV_TEXT)
+    return str(path)
+
+
+def test_read_csv_columns(csv_path):
+    columns = read_csv_columns(csv_path, cache=False)
+
+    assert list(columns) == ['surname', 'music', 'similarity', 'giant_midi_piano', 'audio_name', 'split']
+    assert columns['similarity'] == ['0.50', '', '1e-05']
+    assert columns['split'] == ['train', '', 'test']
+
+
+def test_typed_columns(csv_path):
+    meta_table = MetaTable.read_csv(csv_path, cache=False)
+
+    assert meta_table['similarity'].dtype == np.float64
+    assert np.isnan(meta_table['similarity'][1])
+    assert meta_table['giant_midi_piano'].tolist() == [1, MISSING_INT, 0]
+    assert meta_table.is_missing('similarity').tolist() == [False, True, False]
+    assert meta_table.piano_solo_mask().tolist() == [True, False, False]
+    assert np.flatnonzero(meta_table['similarity'] > 0.3).tolist() == [0]
+
+
+def test_unparsable_value_raises_with_column_and_row(tmp_path):
+    csv_path = tmp_path / 'meta.csv'
+    csv_path.write_text(CSV_TEXT.replace('1e-05', 'high'))
+
+    with pytest.raises(ValueError, match="Column similarity has 'high' in row 2"):
+        MetaTable.read_csv(str(csv_path), cache=False)
+
+
+def test_rewritten_csv_keeps_its_text(csv_path, tmp_path):
+    out_csv_path = tmp_path / 'out.csv'
+    MetaTable.read_csv(csv_path, cache=False).write_csv(str(out_csv_path))
+
+    assert out_csv_path.read_text() == CSV_TEXT
+
+
+def test_ragged_rows_raise_with_their_line(tmp_path):
+    csv_path = tmp_path / 'meta.csv'
+    # An extra field in row 1 and a missing one in row 2 add up to the number of cells of the columns
+    csv_path.write_text(CSV_TEXT.replace('\ttrain\n', '\ttrain\textra\n').replace('Chopin\tBallade\t', 'Chopin\t'))
+
+    with pytest.raises(ValueError, match='Line 3 of .*meta.csv has 5 fields, expected 6'):
+        read_csv_columns(str(csv_path), cache=False)
+
+
+def test_extra_fields_are_ignored(csv_path, tmp_path):
+    extra_csv_path = tmp_path / 'extra.csv'
+    extra_csv_path.write_text(CSV_TEXT.replace('\ttrain\n', '\ttrain\textra\n'))
+
+    assert read_csv_columns(str(extra_csv_path), cache=False) == read_csv_columns(csv_path, cache=False)
+
+
+def test_columns_of_different_lengths_raise(tmp_path):
+    out_csv_path = tmp_path / 'out.csv'
+
+    with pytest.raises(ValueError, match='different lengths'):
+        write_csv_columns({'surname': ['Bach', 'Chopin'], 'music': ['Air']}, str(out_csv_path))
+
+    assert not out_csv_path.exists()
+
+
+def test_edited_values_are_formatted(csv_path, tmp_path):
+    meta_table = MetaTable.read_csv(csv_path, cache=False)
+    meta_table['similarity'][2] = 0.25
+    meta_table = meta_table.select([2, 0])
+    meta_table['giant_midi_piano'] = np.array([1, 1], dtype=np.int8)
+
+    columns = meta_table.to_meta_dict()
+
+    assert columns['similarity'] == ['0.25', '0.50']
+    assert columns['giant_midi_piano'] == ['1', '1']
+    assert columns['surname'] == ['Liszt', 'Bach']
+
+
+def test_from_meta_dict_with_numbers(tmp_path):
+    meta_table = MetaTable.from_meta_dict({'surname': ['Bach', 'Chopin'], 'piano_solo_prob': [0.5, '']})
+    write_csv_columns(meta_table.to_meta_dict(), str(tmp_path / 'out.csv'))
+
+    assert (tmp_path / 'out.csv').read_text() == 'surname\tpiano_solo_prob\nBach\t0.5\nChopin\t\n'
+
+
+def _open_fds_num():
+    return len(os.listdir('/proc/self/fd'))
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason='open files are listed in /proc')
+def test_sidecar_is_cached_and_closed(csv_path, tmp_path):
+    assert not isinstance(read_csv_columns(csv_path), LazyColumns)
+    assert os.path.dirname(get_sidecar_path(csv_path)) == str(tmp_path / 'sidecars')
+    assert os.path.isfile(get_sidecar_path(csv_path))
+
+    fds_num = _open_fds_num()
+    columns = read_csv_columns(csv_path)
+    meta_table = MetaTable.read_csv(csv_path)
+
+    assert isinstance(columns, LazyColumns)
+    assert columns['similarity'] == ['0.50', '', '1e-05']
+    assert meta_table['giant_midi_piano'].tolist() == [1, MISSING_INT, 0]
+    assert _open_fds_num() == fds_num
+
+    meta_table.write_csv(str(tmp_path / 'out.csv'))
+    assert (tmp_path / 'out.csv').read_text() == CSV_TEXT
+
+
+def test_stale_sidecar_is_rebuilt(csv_path):
+    read_csv_columns(csv_path)
+
+    with open(csv_path, 'a') as fw:
+        fw.write('Mozart\tRequiem\t0.9\t1\tMozart, Requiem\tvalidation\n')
+
+    assert not isinstance(read_csv_columns(csv_path), LazyColumns)
+    assert read_csv_columns(csv_path)['surname'] == ['Bach', 'Chopin', 'Liszt', 'Mozart']
+
+
+@pytest.mark.skipif(os.name != 'posix' or os.geteuid() == 0, reason='root can write to read-only directories')
+def test_read_only_csv_directory(tmp_path, capsys):
+    resources_dir = tmp_path / 'resources'
+    resources_dir.mkdir()
+    (resources_dir / 'meta.csv').write_text(CSV_TEXT)
+    os.chmod(resources_dir, 0o555)
+
+    try:
+        read_csv_columns(str(resources_dir / 'meta.csv'))
+        assert isinstance(read_csv_columns(str(resources_dir / 'meta.csv')), LazyColumns)
+    finally:
+        os.chmod(resources_dir, 0o755)
+
+    assert 'Failed to write' not in capsys.readouterr().out
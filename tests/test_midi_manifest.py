@@ -0,0 +1,116 @@
+import os
+import struct
+
+import pytest
+
+from giantmidi_piano.midi_manifest import MidiManifest, check_midi, hash_file, write_atomic
+
+END_OF_TRACK = b'\x00\xff\x2f\x00'
+
+
+def _midi_bytes(tracks_num=1):
+    data = b'MThd' + struct.pack('>IHHH', 6, 1, tracks_num, 384)
+    track = b'\x00\x90\x3c\x40\x60\x80\x3c\x00' + END_OF_TRACK
+
+    return data + (b'MTrk' + struct.pack('>I', len(track)) + track) * tracks_num
+
+
+def _write_midi(path, data=None):
+    with open(path, 'wb') as fw:
+        fw.write(_midi_bytes() if data is None else data)
+
+
+def test_check_midi(tmp_path):
+    midi_path = str(tmp_path / 'a.mid')
+
+    _write_midi(midi_path)
+    assert check_midi(midi_path) is None
+
+    _write_midi(midi_path, _midi_bytes(2))
+    assert check_midi(midi_path) is None
+
+    _write_midi(midi_path, _midi_bytes()[:-6])
+    assert check_midi(midi_path).startswith('truncated')
+
+    _write_midi(midi_path, _midi_bytes()[:-4] + b'\x00\x00\x00\x00')
+    assert check_midi(midi_path) == 'track 0 has no end of track'
+
+    _write_midi(midi_path, b'RIFF' + _midi_bytes()[4:])
+    assert check_midi(midi_path) == 'no MThd header'
+
+    assert check_midi(str(tmp_path / 'missing.mid')) is not None
+
+
+def test_finished_midi_is_done_after_a_restart(tmp_path):
+    midis_dir = str(tmp_path)
+    midi_path = os.path.join(midis_dir, 'a.mid')
+    _write_midi(midi_path)
+
+    manifest = MidiManifest(midis_dir, '0_10')
+    manifest.add('a', 'hash_a', midi_path)
+
+    manifest = MidiManifest(midis_dir, '10_20')
+
+    assert manifest.records['a']['midi_hash'] == hash_file(midi_path)
+    assert manifest.is_done('a', 'hash_a', midi_path)
+    assert not manifest.is_done('a', 'changed_mp3', midi_path)
+
+    with open(midi_path, 'ab') as fw:
+        fw.write(b'\x00')
+
+    assert not manifest.is_done('a', 'hash_a', midi_path)
+
+
+def test_midi_without_a_record_is_adopted_if_valid(tmp_path):
+    midis_dir = str(tmp_path)
+    (valid_path, truncated_path) = (os.path.join(midis_dir, 'a.mid'), os.path.join(midis_dir, 'b.mid'))
+    _write_midi(valid_path)
+    _write_midi(truncated_path, _midi_bytes()[:-2])
+
+    manifest = MidiManifest(midis_dir, '0_10')
+
+    assert manifest.is_done('a', 'hash_a', valid_path)
+    assert not manifest.is_done('b', 'hash_b', truncated_path)
+    assert not manifest.is_done('c', 'hash_c', os.path.join(midis_dir, 'c.mid'))
+
+    # The adopted midi file is in the journal of the writer
+    assert set(MidiManifest(midis_dir, '10_20').records) == {'a'}
+
+
+def test_verify(tmp_path):
+    midis_dir = str(tmp_path)
+    midi_path = os.path.join(midis_dir, 'a.mid')
+    _write_midi(midi_path)
+
+    manifest = MidiManifest(midis_dir, '0_10')
+    manifest.add('a', 'hash_a', midi_path)
+
+    assert manifest.verify('a', midi_path) is None
+    assert manifest.verify('b', os.path.join(midis_dir, 'b.mid')) == 'missing'
+
+    _write_midi(midi_path, _midi_bytes()[:-1] + b'\x01')
+    assert manifest.verify('a', midi_path) == 'hash differs from the manifest'
+
+
+def test_write_atomic(tmp_path):
+    midi_path = str(tmp_path / 'a.mid')
+    write_atomic(_write_midi, midi_path)
+
+    assert check_midi(midi_path) is None
+    assert os.listdir(str(tmp_path)) == ['a.mid']
+
+
+def test_write_atomic_leaves_no_file_on_failure(tmp_path):
+    midi_path = str(tmp_path / 'a.mid')
+    _write_midi(midi_path)
+    midi_hash = hash_file(midi_path)
+
+    def _write_and_fail(path):
+        _write_midi(path, _midi_bytes()[:10])
+        raise RuntimeError('killed')
+
+    with pytest.raises(RuntimeError):
+        write_atomic(_write_and_fail, midi_path)
+
+    assert os.listdir(str(tmp_path)) == ['a.mid']
+    assert hash_file(midi_path) == midi_hash
@@ -0,0 +1,171 @@
+import os
+
+import numpy as np
+import pytest
+
+from giantmidi_piano.piano_detection_model import (
+    CHECKPOINT_PATH,
+    DIM_T,
+    SEG_EXTRA,
+    SR,
+    PianoDetection,
+    PianoDetectionInference,
+    PianoSoloDetector,
+    compute_segment_spectrograms,
+    iterate_segment_spectrograms,
+    iterate_segment_spectrograms_torch,
+    stratified_segment_order,
+    wav2spec,
+)
+
+pytestmark = pytest.mark.skipif(not os.path.isfile(CHECKPOINT_PATH), reason='run from the repository root')
+
+
+@pytest.fixture(scope='module')
+def detector():
+    return PianoSoloDetector()
+
+
+@pytest.fixture(scope='module')
+def piano_detection():
+    model = PianoDetection()
+    model.load(CHECKPOINT_PATH)
+    return model
+
+
+def _synthesize_notes(seconds, notes_num, seed):
+    """Decaying sinusoids at random onsets and semitones, which the detector predicts as piano solo."""
+    rng = np.random.RandomState(seed)
+    t = np.arange(2 * SR) / SR
+    wav = np.zeros(seconds * SR + len(t))
+
+    for _ in range(notes_num):
+        onset = rng.randint(seconds * SR)
+        freq = 440 * 2 ** (rng.randint(-30, 30) / 12)
+        wav[onset : onset + len(t)] += np.exp(-3 * t) * np.sin(2 * np.pi * freq * t)
+
+    return wav[: seconds * SR].astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def segments():
+    """Segments of notes in a growing noise, whose probabilities are spread over [0, 1]."""
+    rng = np.random.RandomState(1234)
+    noise = rng.standard_normal(20 * SR) * np.repeat(np.linspace(0, 0.005, 20), SR)
+    return compute_segment_spectrograms((_synthesize_notes(20, 40, seed=1234) + noise).astype(np.float32))[1]
+
+
+def _wav2spec_segments(wav):
+    """Spectrograms of the segments of a recording as PianoSoloDetector.predict of earlier releases."""
+    return np.array([wav2spec(wav[i * SR : (i + 1) * SR + SEG_EXTRA])[0][..., :DIM_T] for i in range(len(wav) // SR)])
+
+
+@pytest.mark.parametrize('front_end', ['numpy', 'torch'])
+@pytest.mark.parametrize('samples_num', [3 * SR, 3 * SR + 100, 40 * SR + SR // 2])
+def test_front_ends_equal_wav2spec(front_end, samples_num):
+    wav = np.random.RandomState(1234).uniform(-1, 1, samples_num).astype(np.float32)
+    iterate = iterate_segment_spectrograms if front_end == 'numpy' else iterate_segment_spectrograms_torch
+
+    x = np.concatenate([np.asarray(x) for _, x in iterate(wav, batch_size=32)])
+    expected = np.transpose(_wav2spec_segments(wav), (0, 1, 3, 2))
+
+    # Magnitudes are up to about 60, float32 FFTs differ from the float64 FFT of librosa by about 1e-5
+    assert x.shape == expected.shape
+    assert np.allclose(x, expected, rtol=1e-5, atol=1e-4)
+
+
+@pytest.mark.parametrize('samples_num', [0, SR // 2, 3 * SR + 100])
+def test_predict_stream_equals_predict(detector, samples_num):
+    wav = np.random.RandomState(1234).uniform(-0.1, 0.1, samples_num).astype(np.float32)
+    probs = list(detector.predict_stream(wav))
+
+    expected = detector.predict(wav)
+    assert np.allclose(np.concatenate(probs) if probs else np.zeros(0), expected, atol=1e-5)
+
+
+def test_predict_files_splits_batch_time_by_segments(detector):
+    rng = np.random.RandomState(1234)
+    wavs = [rng.uniform(-0.1, 0.1, samples_num).astype(np.float32) for samples_num in [5 * SR, SR // 2, 2 * SR]]
+    items = [(n, *compute_segment_spectrograms(wav)) for n, wav in enumerate(wavs)]
+
+    results = list(detector.predict_files(items, batch_size=4))
+
+    assert [key for key, _, _ in results] == [0, 1, 2]
+
+    for (_, probs, _), wav in zip(results, wavs):
+        assert np.allclose(probs, detector.predict(wav), atol=1e-5)
+
+    # A recording without segments has no inference time, the others share the batches of their segments
+    inference_times = [inference_time for _, _, inference_time in results]
+    assert inference_times[1] == 0
+    assert inference_times[0] > 0 and inference_times[2] > 0
+
+
+@pytest.mark.parametrize('value', [0.0, np.nan])
+def test_silent_or_non_finite_recording_is_not_piano_solo(detector, value):
+    wav = np.full(3 * SR, value, dtype=np.float32)
+
+    assert detector.predict(wav).tolist() == [0, 0, 0]
+    assert np.concatenate(list(detector.predict_stream(wav))).tolist() == [0, 0, 0]
+    assert detector.predict_sequential(wav) == (0, 0)
+
+    [(_, probs, _)] = detector.predict_files([(0, *compute_segment_spectrograms(wav))])
+    assert probs.tolist() == [0, 0, 0]
+
+
+def test_fused_model_equals_piano_detection(piano_detection, segments):
+    expected = piano_detection.predict_on_batch(segments)[:, 1]
+    assert 0.1 < np.std(expected)
+
+    probs = PianoDetectionInference(CHECKPOINT_PATH, device='cpu')(segments).numpy()
+    assert np.allclose(probs, expected, atol=1e-5)
+
+
+# bfloat16 rounding depends on the CPU, e.g., AMX or emulated, so tolerances are looser than the drift on one CPU
+@pytest.mark.parametrize(('precision', 'atol', 'mean_atol'), [('int8', 0.02, 0.005), ('bf16', 0.05, 0.01)])
+def test_reduced_precision_is_close_to_fp32(segments, precision, atol, mean_atol):
+    expected = PianoDetectionInference(CHECKPOINT_PATH, device='cpu')(segments).numpy()
+    probs = PianoDetectionInference(CHECKPOINT_PATH, device='cpu', precision=precision)(segments).numpy()
+
+    assert probs.dtype == np.float32
+    assert np.allclose(probs, expected, atol=atol)
+    assert abs(np.mean(probs) - np.mean(expected)) < mean_atol
+
+
+@pytest.mark.parametrize('segs_num', [0, 5, 32, 33, 100])
+def test_stratified_segment_order_is_a_permutation(segs_num):
+    seg_indexes = stratified_segment_order(segs_num, strata_num=32)
+
+    assert sorted(seg_indexes.tolist()) == list(range(segs_num))
+
+    # The first round takes one segment of each stratum
+    strata_num = min(segs_num, 32)
+    seg_strata = np.concatenate(
+        [np.full(len(stratum), k) for k, stratum in enumerate(np.array_split(np.arange(segs_num), 32))]
+    )
+    assert sorted(seg_strata[seg_indexes[:strata_num]].tolist()) == list(range(strata_num))
+
+
+@pytest.mark.parametrize('piano', [True, False])
+def test_predict_sequential_stops_early_with_the_decision_of_predict(detector, piano):
+    if piano:
+        wav = _synthesize_notes(120, 240, seed=1234)
+    else:
+        wav = np.random.RandomState(1234).uniform(-0.1, 0.1, 120 * SR).astype(np.float32)
+
+    (prob, segs_num) = detector.predict_sequential(wav)
+
+    assert segs_num < 120
+    assert (prob > 0.5) == (np.mean(detector.predict(wav)) > 0.5) == piano
+
+
+def test_predict_sequential_of_short_recordings(detector):
+    wav = _synthesize_notes(10, 20, seed=1234)
+
+    # Recordings shorter than min_segs_num are predicted in full
+    (prob, segs_num) = detector.predict_sequential(wav)
+    assert segs_num == 10
+    assert np.isclose(prob, np.mean(detector.predict(wav)), atol=1e-6)
+
+    with pytest.raises(ValueError, match='shorter than a segment'):
+        detector.predict_sequential(wav[: SR // 2])
@@ -0,0 +1,91 @@
+import multiprocessing
+import time
+
+import pytest
+
+from giantmidi_piano import rate_limit
+from giantmidi_piano.rate_limit import RateLimitController, RateLimitManager, get_rate_limit_controller
+
+
+@pytest.fixture(autouse=True)
+def _reset_shared_controller(monkeypatch):
+    monkeypatch.setattr(rate_limit, '_shared_controller', None)
+
+
+def test_shared_controller_takes_the_first_rate():
+    controller = get_rate_limit_controller()
+    controller.acquire('imslp.org')
+
+    assert get_rate_limit_controller(2.0) is controller
+    assert controller.requests_per_second == 2.0
+    assert controller.buckets['imslp.org']['rate'] == 2.0
+    assert get_rate_limit_controller() is controller
+    assert get_rate_limit_controller(2.0) is controller
+
+
+def test_shared_controller_rejects_a_conflicting_rate():
+    get_rate_limit_controller(2.0)
+
+    with pytest.raises(ValueError, match='2.0 requests/s'):
+        get_rate_limit_controller(5.0)
+
+
+def test_unlimited_rates_do_not_conflict():
+    get_rate_limit_controller(0)
+
+    assert get_rate_limit_controller(0).requests_per_second == 0
+
+
+def test_throttled_host_is_paused_and_slowed_down():
+    controller = RateLimitController(requests_per_second=4.0, base_backoff=0.0)
+    controller.acquire('www.youtube.com', stage='download')
+    controller.report_throttled('www.youtube.com', stage='download')
+
+    metrics = controller.get_metrics()
+    assert metrics['rates']['www.youtube.com'] == 2.0
+    assert metrics['stages']['download']['throttled'] == 1
+
+
+def _acquire(rate_limiter, num):
+    for _ in range(num):
+        rate_limiter.acquire('imslp.org', stage='imslp_pages')
+
+
+def test_manager_controller_is_shared_by_processes():
+    with RateLimitManager() as manager:
+        rate_limiter = manager.RateLimitController(requests_per_second=20.0)
+        processes = [multiprocessing.Process(target=_acquire, args=(rate_limiter, 5)) for _ in range(4)]
+
+        bgn_time = time.time()
+
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+
+        elapsed = time.time() - bgn_time
+
+        # 20 requests at 20 requests/s from a full bucket of 1 token, instead of 5 requests per process
+        assert rate_limiter.get_metrics()['stages']['imslp_pages']['requests'] == 20
+        assert elapsed > 0.9
+
+
+def test_successes_do_not_raise_the_rate_above_the_configured_one():
+    controller = RateLimitController(requests_per_second=1.0)
+
+    for _ in range(100):
+        controller.report_success('www.youtube.com')
+
+    assert controller.get_metrics()['rates']['www.youtube.com'] == 1.0
+
+
+def test_successes_recover_the_rate_up_to_an_opted_in_ceiling():
+    controller = RateLimitController(requests_per_second=1.0, max_requests_per_second=2.0, base_backoff=0.0)
+    controller.report_throttled('www.youtube.com')
+    assert controller.get_metrics()['rates']['www.youtube.com'] == 0.5
+
+    for _ in range(100):
+        controller.report_success('www.youtube.com')
+
+    assert controller.get_metrics()['rates']['www.youtube.com'] == 2.0
@@ -0,0 +1,120 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from giantmidi_piano.stage_metrics import PERCENTILES, MetricsWriter, get_metrics_dir, read_metrics, summarize_metrics
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    metrics_dir = get_metrics_dir(str(tmp_path))
+
+    metrics = MetricsWriter(os.path.join(metrics_dir, 'transcribe_0.jsonl'))
+    metrics.write(
+        'transcribe',
+        'a',
+        10.0,
+        decode_time=1.0,
+        features_time=None,
+        inference_time=2.0,
+        postprocess_time=0.5,
+        write_time=0.5,
+        decode_wait_time=3.0,
+    )
+    # Mp3s which fail to be decoded have no duration
+    metrics.write('transcribe', 'b', None, decode_time=0.5, features_time=None, inference_time=None)
+
+    metrics = MetricsWriter(os.path.join(metrics_dir, 'transcribe_1.jsonl'))
+    metrics.write('transcribe', 'c', 20.0, decode_time=None, inference_time=30.0)
+    metrics.write('piano_solo_prob', 'd', 5.0, decode_time=0.25, features_time=0.25)
+
+    # Killed while writing
+    with open(os.path.join(metrics_dir, 'transcribe_1.jsonl'), 'a', encoding='utf-8') as fw:
+        fw.write('{"stage": "transcribe", "audio_name": "e", "audio_dur')
+
+    return str(tmp_path)
+
+
+def test_write_metrics(workspace):
+    records = read_metrics(get_metrics_dir(workspace), 'transcribe')
+
+    assert [record['audio_name'] for record in records] == ['a', 'b', 'c']
+    assert [record['total_time'] for record in records] == [4.0, 0.5, 30.0]
+    assert [record['real_time_factor'] for record in records] == [0.4, None, 1.5]
+    assert records[0]['decode_wait_time'] == 3.0
+    assert records[1]['inference_time'] is None
+
+    assert len(read_metrics(get_metrics_dir(workspace))) == 4
+
+
+def test_disabled_metrics_are_not_written(tmp_path):
+    MetricsWriter(None).write('transcribe', 'a', 10.0, decode_time=1.0)
+
+    assert os.listdir(tmp_path) == []
+
+
+def _parse_rows(lines):
+    """Rows of the percentile table, key -> [*percentiles, max, mean]."""
+    rows = {}
+
+    for line in lines:
+        fields = line.split()
+
+        if len(fields) == len(PERCENTILES) + 3 and fields[0].endswith(('_time', '_factor', '_duration')):
+            rows[fields[0]] = [float(field) for field in fields[1:]]
+
+    return rows
+
+
+def test_summarize_metrics(workspace, capsys):
+    summarize_metrics(workspace, 'transcribe', slowest_num=2)
+    lines = capsys.readouterr().out.splitlines()
+
+    assert lines[0] == '------ transcribe ------'
+    assert lines[1] == 'Files: 3, audio: 0.01 h, processing: 0.01 h'
+    assert lines[2] == f'Audio hours per processing hour: {30 / 34.5:.2f}'
+
+    rows = _parse_rows(lines)
+
+    # Stages without seconds in any record are not listed, None seconds are not part of the percentiles
+    assert 'features_time' not in rows
+    assert rows['decode_time'] == [0.75, 0.95, 0.995, 1.0, 0.75]
+    assert rows['decode_wait_time'] == [3.0, 3.0, 3.0, 3.0, 3.0]
+    assert rows['real_time_factor'] == [0.95, 1.39, 1.489, 1.5, 0.95]
+
+    total_times = [4.0, 0.5, 30.0]
+    expected = [*np.percentile(total_times, PERCENTILES), np.max(total_times), np.mean(total_times)]
+    np.testing.assert_allclose(rows['total_time'], expected, atol=5e-4)
+
+    assert lines[-3:] == [
+        'Slowest 2 files by real time factor:',
+        '  1.500, 30.0 s for 20.0 s, c',
+        '  0.400, 4.0 s for 10.0 s, a',
+    ]
+
+
+def test_summarize_metrics_of_all_stages(workspace, capsys):
+    summarize_metrics(workspace)
+    out = capsys.readouterr().out
+
+    assert out.index('------ piano_solo_prob ------') < out.index('------ transcribe ------')
+    # Files without a real time factor are the fastest
+    assert out.rstrip().endswith('  0.000, 0.5 s for 0.0 s, b')
+
+
+def test_summarize_empty_metrics(tmp_path, capsys):
+    summarize_metrics(str(tmp_path))
+
+    assert capsys.readouterr().out == f'No metrics in {get_metrics_dir(str(tmp_path))}\n'
+
+
+def test_truncated_lines_are_ignored(workspace):
+    with open(os.path.join(get_metrics_dir(workspace), 'transcribe_1.jsonl'), encoding='utf-8') as fr:
+        lines = fr.read().split('\n')
+
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(lines[-1])
+
+    assert 'e' not in [record['audio_name'] for record in read_metrics(get_metrics_dir(workspace))]
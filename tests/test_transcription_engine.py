@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+piano_transcription_inference = pytest.importorskip('piano_transcription_inference')
+
+from giantmidi_piano.transcription_engine import BatchTranscriber
+
+SAMPLE_RATE = 16000
+HOP_SAMPLES = SAMPLE_RATE // 100
+CLASSES_NUM = 88
+
+
+class StandInModel(torch.nn.Module):
+    """Maps each frame of a segment to note and pedal outputs with a fixed random projection. Like the CRNN of
+    piano_transcription_inference, segments of a batch are independent, and a segment of segment_samples has
+    segment_samples // HOP_SAMPLES + 1 frames."""
+
+    def __init__(self):
+        super().__init__()
+        generator = torch.Generator().manual_seed(1234)
+        self.weight = torch.nn.Parameter(torch.randn(HOP_SAMPLES, 4 * CLASSES_NUM + 3, generator=generator) / 2)
+
+    def forward(self, x):
+        x = torch.nn.functional.pad(x.float(), (HOP_SAMPLES // 2, HOP_SAMPLES // 2))
+        frames = x.unfold(1, HOP_SAMPLES, HOP_SAMPLES)
+        out = torch.sigmoid(frames @ self.weight - 1)
+        (notes, pedals) = (out[..., : 4 * CLASSES_NUM], out[..., 4 * CLASSES_NUM :])
+        (onset, offset, frame, velocity) = torch.split(notes, CLASSES_NUM, dim=-1)
+
+        return {
+            'reg_onset_output': onset,
+            'reg_offset_output': offset,
+            'frame_output': frame,
+            'velocity_output': velocity,
+            'reg_pedal_onset_output': pedals[..., 0:1],
+            'reg_pedal_offset_output': pedals[..., 1:2],
+            'pedal_frame_output': pedals[..., 2:3],
+        }
+
+
+class StandInTranscription(piano_transcription_inference.PianoTranscription):
+    """PianoTranscription with StandInModel, so that no checkpoint is loaded."""
+
+    def __init__(self, segment_samples=2 * SAMPLE_RATE):
+        self.segment_samples = segment_samples
+        self.frames_per_second = 100
+        self.classes_num = CLASSES_NUM
+        self.onset_threshold = 0.3
+        self.offset_threshod = 0.3
+        self.frame_threshold = 0.1
+        self.pedal_offset_threshold = 0.2
+        self.model = StandInModel()
+
+
+@pytest.fixture(scope='module')
+def transcriptor():
+    return StandInTranscription()
+
+
+def _audios():
+    rng = np.random.RandomState(1234)
+    durations = [0.5, 7.3, 2, 0, 3.1, 1.99, 12]
+    return [(0.1 * rng.standard_normal(int(duration * SAMPLE_RATE))).astype(np.float32) for duration in durations]
+
+
+@pytest.fixture(scope='module')
+def expected(transcriptor):
+    """PianoTranscription.transcribe of each non-empty audio."""
+    return [transcriptor.transcribe(audio, None) if len(audio) else None for audio in _audios()]
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 16])
+def test_transcribe_files_equals_transcribe(transcriptor, expected, batch_size):
+    results = list(BatchTranscriber(transcriptor, batch_size).transcribe_files(enumerate(_audios())))
+
+    assert [key for key, _, _ in results] == list(range(len(expected)))
+
+    for (_, transcribed_dict, _), expected_dict in zip(results, expected):
+        if expected_dict is None:
+            # Empty audios are not transcribed
+            assert transcribed_dict is None
+            continue
+
+        for key, output in expected_dict['output_dict'].items():
+            assert transcribed_dict['output_dict'][key].shape == output.shape
+            np.testing.assert_allclose(transcribed_dict['output_dict'][key], output, atol=1e-6)
+
+        assert transcribed_dict['est_note_events'] == expected_dict['est_note_events']
+        assert transcribed_dict['est_pedal_events'] == expected_dict['est_pedal_events']
+
+
+def test_stand_in_model_transcribes_notes(expected):
+    assert all(len(transcribed_dict['est_note_events']) > 0 for transcribed_dict in expected if transcribed_dict)
+
+
+def test_inference_time_is_shared_by_the_audios_of_a_batch(transcriptor):
+    results = list(BatchTranscriber(transcriptor, 16).transcribe_files(enumerate(_audios())))
+    inference_times = [times['inference_time'] for _, _, times in results]
+
+    assert inference_times[3] == 0
+    assert all(inference_time > 0 for n, inference_time in enumerate(inference_times) if n != 3)
+
+
+def test_audios_of_a_failed_batch_fail(transcriptor, expected, monkeypatch):
+    engine = BatchTranscriber(transcriptor, 3)
+    forward = engine._forward
+    calls = []
+
+    def _forward(x):
+        calls.append(len(x))
+
+        # The 3rd batch holds the last 2 segments of audio 1 and the segment of audio 2
+        if len(calls) == 3:
+            raise RuntimeError('CUDA out of memory')
+
+        return forward(x)
+
+    monkeypatch.setattr(engine, '_forward', _forward)
+    results = list(engine.transcribe_files(enumerate(_audios())))
+
+    assert [key for key, _, _ in results] == list(range(len(expected)))
+    assert [n for n, (_, transcribed_dict, _) in enumerate(results) if transcribed_dict is None] == [1, 2, 3]
+    assert all(results[n][2]['inference_time'] > 0 for n in [1, 2])
+
+    for n in [0, 4, 5, 6]:
+        assert results[n][1]['est_note_events'] == expected[n]['est_note_events']
@@ -0,0 +1,83 @@
+import time
+
+from giantmidi_piano import work_queue
+from giantmidi_piano.work_queue import DONE, FAILED, LEASED, PENDING, WorkQueue
+
+
+def _expire_leases(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(work_queue.time, 'time', lambda: now)
+
+
+def test_jobs_are_leased_by_weight(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+
+    assert queue.add_jobs([('a', {'n': 1}, 1.0), ('b', {'n': 2}, 3.0), ('c', {'n': 3}, 2.0)]) == 3
+    assert queue.add_jobs([('a', {'n': 1}, 1.0)]) == 0
+
+    keys = [queue.acquire('worker').key for _ in range(3)]
+
+    assert keys == ['b', 'c', 'a']
+    assert queue.acquire('worker') is None
+
+
+def test_complete_and_counts(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+    queue.add_jobs([('a', {'n': 1}, 1.0), ('b', {'n': 2}, 2.0)])
+
+    job = queue.acquire('worker')
+    assert job.payload == {'n': 2}
+    assert job.attempts == 1
+
+    queue.complete(job, 'worker')
+
+    assert queue.counts() == {DONE: (1, 2.0), PENDING: (1, 1.0)}
+
+
+def test_failed_job_is_retried_up_to_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+    queue.add_jobs([('a', {}, 1.0)])
+
+    queue.fail(queue.acquire('worker'), 'worker', 'error 1')
+    job = queue.acquire('worker')
+    assert job.attempts == 2
+
+    queue.fail(job, 'worker', 'error 2')
+
+    assert queue.acquire('worker') is None
+    assert queue.counts() == {FAILED: (1, 1.0)}
+
+    assert queue.reset_failed() == 1
+    assert queue.acquire('worker').attempts == 1
+
+
+def test_expired_lease_is_leased_again(tmp_path, monkeypatch):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=60)
+    queue.add_jobs([('a', {}, 1.0)])
+
+    job = queue.acquire('crashed')
+    assert queue.acquire('worker') is None
+
+    _expire_leases(monkeypatch, 61)
+    retried = queue.acquire('worker')
+
+    assert (retried.key, retried.attempts) == ('a', 2)
+    assert not queue.renew(job, 'crashed')
+    assert queue.renew(retried, 'worker')
+
+    # A crashed worker cannot complete a job leased by another worker
+    queue.complete(job, 'crashed')
+    assert queue.counts() == {LEASED: (1, 1.0)}
+
+
+def test_expired_lease_at_max_attempts_fails(tmp_path, monkeypatch):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=60, max_attempts=2)
+    queue.add_jobs([('a', {}, 1.0), ('b', {}, 0.5)])
+
+    assert queue.acquire('crashed').key == 'a'
+    _expire_leases(monkeypatch, 61)
+    assert queue.acquire('crashed').key == 'a'
+    _expire_leases(monkeypatch, 122)
+
+    assert queue.acquire('worker').key == 'b'
+    assert queue.counts() == {FAILED: (1, 1.0), LEASED: (1, 0.5)}